@@ -15,14 +15,19 @@ Core Features:
 """
 
 import asyncio
+import concurrent.futures
 import json
 import time
 import logging
+from collections import deque
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple, Any
-from dataclasses import dataclass, asdict
+from typing import Any, AsyncIterator, Dict, List, Optional, Set, Tuple
+from dataclasses import dataclass, field
 from enum import Enum
+from functools import lru_cache
 import numpy as np
+import orjson
 import pandas as pd
 from pathlib import Path
 
@@ -31,15 +36,18 @@ import torch
 import torch.nn as nn
 from transformers import pipeline
 import cv2
+from numba import njit
 from PIL import Image
 
 # Web framework
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 
 # Data processing
-import requests
+import aiohttp
+import ijson
 from bs4 import BeautifulSoup
 import yfinance as yf
 
@@ -53,6 +61,24 @@ class GameStatus(Enum):
     FINISHED = "finished"
     CANCELLED = "cancelled"
 
+# Raw status strings (lower-cased) -> GameStatus, including ESPN's STATUS_* names
+_STATUS_MAP: Dict[str, GameStatus] = {
+    "scheduled": GameStatus.SCHEDULED,
+    "status_scheduled": GameStatus.SCHEDULED,
+    "live": GameStatus.LIVE,
+    "in": GameStatus.LIVE,
+    "status_in_progress": GameStatus.LIVE,
+    "status_halftime": GameStatus.LIVE,
+    "status_end_period": GameStatus.LIVE,
+    "final": GameStatus.FINISHED,
+    "finished": GameStatus.FINISHED,
+    "status_final": GameStatus.FINISHED,
+    "cancelled": GameStatus.CANCELLED,
+    "canceled": GameStatus.CANCELLED,
+    "status_canceled": GameStatus.CANCELLED,
+    "status_postponed": GameStatus.CANCELLED
+}
+
 class PlayType(Enum):
     RUN = "run"
     PASS = "pass"
@@ -64,7 +90,41 @@ class PlayType(Enum):
     TIMEOUT = "timeout"
     PENALTY = "penalty"
 
-@dataclass
+# Index -> PlayType mapping for ids returned by the JIT scoring kernel
+_PLAY_TYPES = tuple(PlayType)
+
+def parse_clock(time_str: str) -> int:
+    """Parse a MM:SS clock string to seconds"""
+    try:
+        minutes, seconds = time_str.split(":")
+        return int(minutes) * 60 + int(seconds)
+    except (AttributeError, ValueError):
+        return 0
+
+@njit(cache=True)
+def _score(down, distance, yard_line, quarter, time_s, score_diff):
+    """Numeric core of the play predictor: returns (play type id, confidence)"""
+    # Placeholder for actual ML model
+    if down == 1:
+        return 0, 0.75
+    if (down == 2 or down == 3) and distance <= 3:
+        return 0, 0.75
+    return 1, 0.75
+
+@njit(cache=True)
+def _score_batch(down, distance, yard_line, quarter, time_s, score_diff):
+    """Apply the scoring kernel over whole feature columns"""
+    n = down.shape[0]
+    play_type_ids = np.empty(n, dtype=np.int8)
+    confidences = np.empty(n, dtype=np.float32)
+    for i in range(n):
+        play_type_id, confidence = _score(down[i], distance[i], yard_line[i], quarter[i],
+                                          time_s[i], score_diff[i])
+        play_type_ids[i] = play_type_id
+        confidences[i] = confidence
+    return play_type_ids, confidences
+
+@dataclass(slots=True)
 class Team:
     id: str
     name: str
@@ -75,8 +135,22 @@ class Team:
     colors: Dict[str, str]
     coach: str
     record: Dict[str, int]  # wins, losses, ties
+    
+    def to_primitive(self) -> Dict[str, Any]:
+        """Return a flat dict ready for orjson, without the recursive asdict walk"""
+        return {
+            "id": self.id,
+            "name": self.name,
+            "abbreviation": self.abbreviation,
+            "conference": self.conference,
+            "division": self.division,
+            "home_field": self.home_field,
+            "colors": self.colors,
+            "coach": self.coach,
+            "record": self.record
+        }
 
-@dataclass
+@dataclass(slots=True)
 class Player:
     id: str
     name: str
@@ -88,7 +162,7 @@ class Player:
     experience: int
     stats: Dict[str, Any]
 
-@dataclass
+@dataclass(slots=True)
 class Game:
     id: str
     home_team: Team
@@ -104,8 +178,54 @@ class Game:
     distance: int
     yard_line: int
     play_clock: int
+    time_remaining_s: int = field(init=False, default=0)
+    
+    def __post_init__(self):
+        # Parse the clock once so the prediction hot path never splits strings
+        self.time_remaining_s = parse_clock(self.time_remaining)
+    
+    def to_primitive(self) -> Dict[str, Any]:
+        """Return a plain dict with enums and datetimes already stringified"""
+        return {
+            "id": self.id,
+            "home_team": self.home_team.to_primitive(),
+            "away_team": self.away_team.to_primitive(),
+            "date": self.date.isoformat(),
+            "status": self.status.value,
+            "quarter": self.quarter,
+            "time_remaining": self.time_remaining,
+            "home_score": self.home_score,
+            "away_score": self.away_score,
+            "possession": self.possession,
+            "down": self.down,
+            "distance": self.distance,
+            "yard_line": self.yard_line,
+            "play_clock": self.play_clock
+        }
+    
+    def to_snapshot(self) -> Dict[str, Any]:
+        """Return the fields that stay fixed during a game (teams and metadata)"""
+        return {
+            "type": "snapshot",
+            "teams": {
+                "home": self.home_team.to_primitive(),
+                "away": self.away_team.to_primitive()
+            },
+            "game_meta": {
+                "id": self.id,
+                "date": self.date.isoformat(),
+                "status": self.status.value
+            }
+        }
+    
+    def to_delta(self) -> List[Any]:
+        """Return the per-play state as a compact positional list"""
+        return [
+            self.quarter, self.time_remaining, self.home_score, self.away_score,
+            self.down, self.distance, self.yard_line, self.possession, self.play_clock
+        ]
 
-@dataclass
+@dataclass(slots=True)
 class Play:
     id: str
     game_id: str
@@ -120,21 +240,93 @@ class Play:
     description: str
 
 @dataclass
+class PlayFeaturesSoA:
+    """Column-oriented play features for vectorized historical analysis"""
+    down: np.ndarray        # int8
+    distance: np.ndarray    # int8
+    yard_line: np.ndarray   # int8
+    quarter: np.ndarray     # int8
+    time_s: np.ndarray      # int16
+    score_diff: np.ndarray  # int8
+    
+    COLUMNS = ("down", "distance", "yard_line", "quarter", "time_s", "score_diff")
+    DTYPES = (np.int8, np.int8, np.int8, np.int8, np.int16, np.int8)
+    
+    def __len__(self) -> int:
+        return len(self.down)
+    
+    @classmethod
+    def empty(cls) -> "PlayFeaturesSoA":
+        """Create a feature set with no rows"""
+        return cls(*(np.empty(0, dtype=dtype) for dtype in cls.DTYPES))
+    
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "PlayFeaturesSoA":
+        """Convert a play-by-play DataFrame into typed column arrays in one pass"""
+        if df.empty:
+            return cls.empty()
+        return cls(*(df[column].to_numpy(dtype=dtype) for column, dtype in zip(cls.COLUMNS, cls.DTYPES)))
+    
+    def to_pandas(self) -> pd.DataFrame:
+        """Expose the columns as a DataFrame without copying"""
+        return pd.DataFrame({column: getattr(self, column) for column in self.COLUMNS}, copy=False)
+
+@dataclass(slots=True, frozen=True)
 class Prediction:
     play_type: PlayType
     confidence: float
     reasoning: str
     alternatives: List[Tuple[PlayType, float]]
     timestamp: datetime
+    
+    def to_primitive(self) -> Dict[str, Any]:
+        """Return a plain dict with enums and datetimes already stringified"""
+        return {
+            "play_type": self.play_type.value,
+            "confidence": self.confidence,
+            "reasoning": self.reasoning,
+            "alternatives": [(play_type.value, probability) for play_type, probability in self.alternatives],
+            "timestamp": self.timestamp.isoformat()
+        }
+
+def _format_reasoning(down: int, distance: int, play_type: PlayType) -> str:
+    """Build the reasoning sentence for a down, distance and predicted play"""
+    if play_type == PlayType.RUN:
+        if down == 1:
+            return "First down - likely to run to establish the ground game"
+        elif distance <= 3:
+            return f"Short distance ({distance} yards) - high probability run play"
+        else:
+            return "Down and distance suggest a run play"
+    else:
+        return f"Passing situation - {distance} yards needed on {down}rd down"
+
+# Every realistic (down, distance, play type) reasoning string, built once at import
+_REASONS: Dict[Tuple[int, int, PlayType], str] = {
+    (down, distance, play_type): _format_reasoning(down, distance, play_type)
+    for down in range(1, 5)
+    for distance in range(0, 100)
+    for play_type in PlayType
+}
 
 class ComputerVisionAnalyzer:
     """Real-time computer vision analysis for live game feeds"""
     
+    BATCH_SIZE = 8
+    BATCH_TIMEOUT = 0.05  # seconds to wait for a batch to fill
+    INPUT_SIZE = (416, 416)
+    PERSON_CLASS_ID = 0
+    CONFIDENCE_THRESHOLD = 0.5
+    
     def __init__(self):
         self.player_detection_model = None
         self.formation_detection_model = None
         self.fatigue_detection_model = None
-        self.load_models()
+        self._output_layers: List[str] = []
+        self._frame_batch: List[Tuple[np.ndarray, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        # Strong references to in-flight batches so they aren't garbage collected mid-run
+        self._batch_tasks: Set[asyncio.Task] = set()
     
     def load_models(self):
         """Load pre-trained computer vision models"""
@@ -143,10 +335,26 @@ class ComputerVisionAnalyzer:
             self.player_detection_model = cv2.dnn.readNetFromDarknet(
                 "models/yolo-cfg", "models/yolo-weights"
             )
+            self._output_layers = list(self.player_detection_model.getUnconnectedOutLayersNames())
+            self._select_backend(self.player_detection_model)
             logger.info("Computer vision models loaded successfully")
         except Exception as e:
             logger.warning(f"Could not load CV models: {e}")
     
+    def _select_backend(self, net):
+        """Run the network in FP16 on CUDA when available, otherwise on CPU"""
+        try:
+            if cv2.cuda.getCudaEnabledDeviceCount() > 0:
+                net.setPreferableBackend(cv2.dnn.DNN_BACKEND_CUDA)
+                net.setPreferableTarget(cv2.dnn.DNN_TARGET_CUDA_FP16)
+                logger.info("Computer vision models using CUDA FP16")
+                return
+        except cv2.error as e:
+            logger.warning(f"CUDA backend unavailable for CV models: {e}")
+        
+        net.setPreferableBackend(cv2.dnn.DNN_BACKEND_OPENCV)
+        net.setPreferableTarget(cv2.dnn.DNN_TARGET_CPU)
+    
     def analyze_frame(self, frame: np.ndarray) -> Dict[str, Any]:
         """Analyze a single frame for player positions and formations"""
         if self.player_detection_model is None:
@@ -155,27 +363,122 @@ class ComputerVisionAnalyzer:
         try:
             # Detect players
             players = self.detect_players(frame)
-            
-            # Analyze formation
-            formation = self.analyze_formation(players)
-            
-            # Detect fatigue indicators
-            fatigue = self.detect_fatigue(frame, players)
-            
-            return {
-                "players": players,
-                "formation": formation,
-                "fatigue_indicators": fatigue,
-                "timestamp": datetime.now().isoformat()
-            }
+            return self._build_analysis(frame, players)
         except Exception as e:
             logger.error(f"Frame analysis error: {e}")
             return {"error": str(e)}
     
+    async def analyze_frame_batched(self, frame: np.ndarray) -> Dict[str, Any]:
+        """Queue a frame for batched detection and await its analysis"""
+        if self.player_detection_model is None:
+            return {"error": "Models not loaded"}
+        
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._frame_batch.append((frame, future))
+        
+        if len(self._frame_batch) >= self.BATCH_SIZE:
+            self._flush_batch()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.BATCH_TIMEOUT, self._flush_batch)
+        
+        return await future
+    
+    def _flush_batch(self):
+        """Hand the pending frames to a single batched forward pass"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        batch, self._frame_batch = self._frame_batch, []
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+    
+    async def close(self):
+        """Drop queued frames and cancel in-flight batches"""
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        
+        batch, self._frame_batch = self._frame_batch, []
+        for _, future in batch:
+            future.cancel()
+        
+        tasks = list(self._batch_tasks)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+    
+    async def _run_batch(self, batch: List[Tuple[np.ndarray, asyncio.Future]]):
+        """Run detection for a batch off the event loop and resolve each frame's future"""
+        frames = [frame for frame, _ in batch]
+        try:
+            players_per_frame = await asyncio.to_thread(self.detect_players_batch, frames)
+            results = [self._build_analysis(frame, players)
+                       for frame, players in zip(frames, players_per_frame)]
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            logger.error(f"Frame analysis error: {e}")
+            results = [{"error": str(e)}] * len(batch)
+        
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+    
+    def _build_analysis(self, frame: np.ndarray, players: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Combine detections with formation and fatigue analysis"""
+        # Analyze formation
+        formation = self.analyze_formation(players)
+        
+        # Detect fatigue indicators
+        fatigue = self.detect_fatigue(frame, players)
+        
+        return {
+            "players": players,
+            "formation": formation,
+            "fatigue_indicators": fatigue,
+            "timestamp": datetime.now().isoformat()
+        }
+    
     def detect_players(self, frame: np.ndarray) -> List[Dict[str, Any]]:
         """Detect players in the frame"""
-        # Placeholder for YOLO player detection
-        return []
+        return self.detect_players_batch([frame])[0]
+    
+    def detect_players_batch(self, frames: List[np.ndarray]) -> List[List[Dict[str, Any]]]:
+        """Detect players in several frames with one YOLO forward pass"""
+        if not frames:
+            return []
+        
+        blob = cv2.dnn.blobFromImages(frames, 1 / 255.0, self.INPUT_SIZE, swapRB=True, crop=False)
+        self.player_detection_model.setInput(blob)
+        outputs = self.player_detection_model.forward(self._output_layers)
+        
+        detections: List[List[Dict[str, Any]]] = [[] for _ in frames]
+        for output in outputs:
+            # Rows are [cx, cy, w, h, objectness, class scores...], grouped per frame
+            output = output.reshape(len(frames), -1, output.shape[-1])
+            for index, rows in enumerate(output):
+                scores = rows[:, 5:]
+                class_ids = scores.argmax(axis=1)
+                confidences = scores[np.arange(len(rows)), class_ids]
+                keep = (class_ids == self.PERSON_CLASS_ID) & (confidences > self.CONFIDENCE_THRESHOLD)
+                if not keep.any():
+                    continue
+                
+                height, width = frames[index].shape[:2]
+                boxes = rows[keep, :4] * np.array([width, height, width, height], dtype=rows.dtype)
+                for (cx, cy, w, h), confidence in zip(boxes, confidences[keep]):
+                    detections[index].append({
+                        "bbox": [int(cx - w / 2), int(cy - h / 2), int(w), int(h)],
+                        "confidence": float(confidence)
+                    })
+        
+        return detections
     
     def analyze_formation(self, players: List[Dict[str, Any]]) -> Dict[str, Any]:
         """Analyze offensive/defensive formation"""
@@ -196,6 +499,7 @@ class DataIngestionEngine:
             "sportradar": "https://api.sportradar.us/nfl/official/trial/v7/en"
         }
         self.api_keys = {}
+        self._session: Optional[aiohttp.ClientSession] = None
         self.load_api_keys()
     
     def load_api_keys(self):
@@ -208,25 +512,43 @@ class DataIngestionEngine:
             "sportradar": "your_sportradar_api_key"
         }
     
-    async def fetch_live_games(self) -> List[Game]:
-        """Fetch live games from ESPN API"""
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared HTTP session, creating its connection pool on first use"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=32, limit_per_host=8, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                timeout=aiohttp.ClientTimeout(total=15)
+            )
+        return self._session
+    
+    async def async_init(self):
+        """Open the shared HTTP session before the first request needs it"""
+        self._get_session()
+    
+    async def close(self):
+        """Close the shared HTTP session and its pooled connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
+    async def iter_live_games(self) -> AsyncIterator[Game]:
+        """Stream live games from ESPN API, yielding each game as soon as it is parsed"""
         try:
             url = self.data_sources["espn"]
-            response = requests.get(url)
-            response.raise_for_status()
-            
-            data = response.json()
-            games = []
-            
-            for event in data.get("events", []):
-                game = self.parse_espn_game(event)
-                if game:
-                    games.append(game)
-            
-            return games
+            async with self._get_session().get(url) as response:
+                response.raise_for_status()
+                # Parse events incrementally instead of buffering the whole scoreboard
+                async for event in ijson.items(response.content, "events.item", use_float=True):
+                    game = self.parse_espn_game(event)
+                    if game:
+                        yield game
         except Exception as e:
             logger.error(f"Error fetching live games: {e}")
-            return []
+    
+    async def fetch_live_games(self) -> List[Game]:
+        """Fetch live games from ESPN API"""
+        return [game async for game in self.iter_live_games()]
     
     def parse_espn_game(self, event: Dict[str, Any]) -> Optional[Game]:
         """Parse ESPN game data into Game object"""
@@ -276,7 +598,7 @@ class DataIngestionEngine:
                 "home_team": home_team,
                 "away_team": away_team,
                 "date": datetime.fromisoformat(date_str.replace("Z", "+00:00")),
-                "status": GameStatus(status.lower()),
+                "status": _STATUS_MAP.get(status.lower(), GameStatus.SCHEDULED),
                 "quarter": 0,
                 "time_remaining": "15:00",
                 "home_score": 0,
@@ -294,10 +616,10 @@ class DataIngestionEngine:
             logger.error(f"Error parsing ESPN game: {e}")
             return None
     
-    async def fetch_historical_data(self, team_id: str, season: int) -> pd.DataFrame:
-        """Fetch historical data for a team"""
+    async def fetch_historical_data(self, team_id: str, season: int) -> PlayFeaturesSoA:
+        """Fetch historical play features for a team"""
         # Placeholder for historical data fetching
-        return pd.DataFrame()
+        return PlayFeaturesSoA.empty()
 
 class PredictiveModel:
     """AI-powered predictive modeling for football"""
@@ -307,7 +629,8 @@ class PredictiveModel:
         self.outcome_prediction_model = None
         self.player_stats_model = None
         self.sentiment_analyzer = None
-        self.load_models()
+        # Per-instance cache; lru_cache on the method itself would pin every instance
+        self._predict_cached = lru_cache(maxsize=4096)(self._predict_from_state)
     
     def load_models(self):
         """Load pre-trained predictive models"""
@@ -321,20 +644,24 @@ class PredictiveModel:
     def predict_next_play(self, game: Game, context: Dict[str, Any]) -> Prediction:
         """Predict the next play type based on current game state"""
         try:
-            # Extract features
-            features = self.extract_play_features(game, context)
-            
-            # Make prediction (placeholder for actual model)
-            play_type = self.predict_play_type(features)
-            confidence = self.calculate_confidence(features)
-            reasoning = self.generate_reasoning(features, play_type)
-            alternatives = self.get_alternatives(features)
+            # Bucket the game state so near-identical situations share a cache entry
+            play_type, confidence, reasoning, alternatives = self._predict_cached(
+                game.down,
+                game.distance,
+                game.yard_line // 5,
+                game.quarter,
+                game.time_remaining_s // 30,
+                max(-28, min(28, game.home_score - game.away_score)),
+                game.possession,
+                context.get("formation", "unknown"),
+                context.get("defensive_alignment", "unknown")
+            )
             
             return Prediction(
                 play_type=play_type,
                 confidence=confidence,
                 reasoning=reasoning,
-                alternatives=alternatives,
+                alternatives=list(alternatives),
                 timestamp=datetime.now()
             )
         except Exception as e:
@@ -347,6 +674,30 @@ class PredictiveModel:
                 timestamp=datetime.now()
             )
     
+    def _predict_from_state(self, down: int, distance: int, yard_line_bucket: int, quarter: int,
+                            time_bucket: int, score_diff_bucket: int, possession: str,
+                            formation: str, defensive_alignment: str) -> Tuple[PlayType, float, str, Tuple]:
+        """Run the deterministic prediction path for a bucketed game state"""
+        features = {
+            "down": down,
+            "distance": distance,
+            "yard_line": yard_line_bucket * 5,
+            "quarter": quarter,
+            "time_remaining": time_bucket * 30,
+            "score_differential": score_diff_bucket,
+            "possession": possession,
+            "formation": formation,
+            "defensive_alignment": defensive_alignment
+        }
+        
+        # Make prediction
+        play_type_id, confidence = _score(down, distance, yard_line_bucket * 5, quarter,
+                                          time_bucket * 30, score_diff_bucket)
+        play_type = _PLAY_TYPES[play_type_id]
+        reasoning = self.generate_reasoning(features, play_type)
+        alternatives = tuple(self.get_alternatives(features))
+        return play_type, confidence, reasoning, alternatives
+    
     def extract_play_features(self, game: Game, context: Dict[str, Any]) -> Dict[str, Any]:
         """Extract features for play prediction"""
         return {
@@ -354,7 +705,7 @@ class PredictiveModel:
             "distance": game.distance,
             "yard_line": game.yard_line,
             "quarter": game.quarter,
-            "time_remaining": self.parse_time(game.time_remaining),
+            "time_remaining": game.time_remaining_s,
             "score_differential": game.home_score - game.away_score,
             "possession": game.possession,
             "play_clock": game.play_clock,
@@ -364,50 +715,46 @@ class PredictiveModel:
             "injuries": context.get("injuries", [])
         }
     
+    def predict_batch(self, features: PlayFeaturesSoA) -> np.ndarray:
+        """Predict play type ids (indices into _PLAY_TYPES) for every row at once"""
+        play_type_ids, _ = _score_batch(
+            features.down, features.distance, features.yard_line,
+            features.quarter, features.time_s, features.score_diff
+        )
+        return play_type_ids
+    
     def parse_time(self, time_str: str) -> int:
         """Parse time string to seconds"""
-        try:
-            parts = time_str.split(":")
-            minutes = int(parts[0])
-            seconds = int(parts[1])
-            return minutes * 60 + seconds
-        except:
-            return 0
+        return parse_clock(time_str)
+    
+    def _score_features(self, features: Dict[str, Any]) -> Tuple[int, float]:
+        """Run the JIT scoring kernel on a feature dict"""
+        return _score(
+            features.get("down", 1),
+            features.get("distance", 10),
+            features.get("yard_line", 20),
+            features.get("quarter", 0),
+            features.get("time_remaining", 0),
+            features.get("score_differential", 0)
+        )
     
     def predict_play_type(self, features: Dict[str, Any]) -> PlayType:
         """Predict play type based on features"""
-        # Placeholder for actual ML model
-        down = features.get("down", 1)
-        distance = features.get("distance", 10)
-        
-        if down == 1:
-            return PlayType.RUN
-        elif down == 2 and distance <= 3:
-            return PlayType.RUN
-        elif down == 3 and distance <= 3:
-            return PlayType.RUN
-        else:
-            return PlayType.PASS
+        return _PLAY_TYPES[self._score_features(features)[0]]
     
     def calculate_confidence(self, features: Dict[str, Any]) -> float:
         """Calculate prediction confidence"""
-        # Placeholder for confidence calculation
-        return 0.75
+        return self._score_features(features)[1]
     
     def generate_reasoning(self, features: Dict[str, Any], play_type: PlayType) -> str:
         """Generate natural language reasoning for prediction"""
         down = features.get("down", 1)
         distance = features.get("distance", 10)
         
-        if play_type == PlayType.RUN:
-            if down == 1:
-                return f"First down - likely to run to establish the ground game"
-            elif distance <= 3:
-                return f"Short distance ({distance} yards) - high probability run play"
-            else:
-                return f"Down and distance suggest a run play"
-        else:
-            return f"Passing situation - {distance} yards needed on {down}rd down"
+        reasoning = _REASONS.get((down, distance, play_type))
+        if reasoning is None:
+            reasoning = _format_reasoning(down, distance, play_type)
+        return reasoning
     
     def get_alternatives(self, features: Dict[str, Any]) -> List[Tuple[PlayType, float]]:
         """Get alternative play predictions with probabilities"""
@@ -499,10 +846,43 @@ class FootballAIPlatform:
         self.data_engine = DataIngestionEngine()
         self.predictive_model = PredictiveModel()
         self.dashboard = FanDashboard()
-        self.app = FastAPI(title="Football AI Platform", version="1.0.0")
+        # Synchronous libraries (requests, BeautifulSoup, yfinance, model loading) run here
+        self._io_pool = concurrent.futures.ThreadPoolExecutor(max_workers=16, thread_name_prefix="football-io")
+        self.app = FastAPI(title="Football AI Platform", version="1.0.0", lifespan=self._lifespan)
         self.setup_routes()
         self.active_games = {}
         self.predictions_history = {}
+        self._predictions_bytes: Dict[str, bytes] = {}
+        self._game_subscribers: Dict[str, List[asyncio.Queue]] = {}
+        self._snapshot_frames: Dict[str, bytes] = {}
+        self._latest_frames: Dict[str, bytes] = {}
+        self._frame_tokens: Dict[str, Tuple] = {}
+        self._last_state_hash: Dict[str, Tuple] = {}
+    
+    @asynccontextmanager
+    async def _lifespan(self, app: FastAPI):
+        """Warm up HTTP pool and models before serving, tear them down on shutdown"""
+        await self.data_engine.async_init()
+        await asyncio.gather(
+            self._run_blocking(self.cv_analyzer.load_models),
+            self._run_blocking(self.predictive_model.load_models)
+        )
+        analysis_task = asyncio.create_task(self.run_real_time_analysis())
+        try:
+            yield
+        finally:
+            analysis_task.cancel()
+            try:
+                await analysis_task
+            except asyncio.CancelledError:
+                pass
+            await self.cv_analyzer.close()
+            await self.data_engine.close()
+            self._io_pool.shutdown(wait=False)
+    
+    async def _run_blocking(self, fn, *args):
+        """Run a blocking call in the I/O thread pool without stalling the event loop"""
+        return await asyncio.get_running_loop().run_in_executor(self._io_pool, fn, *args)
     
     def setup_routes(self):
         """Setup FastAPI routes"""
@@ -514,14 +894,21 @@ class FootballAIPlatform:
         @self.app.get("/games/live")
         async def get_live_games():
             """Get all live games"""
-            games = await self.data_engine.fetch_live_games()
-            return {"games": [asdict(game) for game in games]}
+            async def stream_games():
+                yield b'{"games":['
+                separator = b""
+                async for game in self.data_engine.iter_live_games():
+                    yield separator + orjson.dumps(game.to_primitive())
+                    separator = b","
+                yield b"]}"
+            
+            return StreamingResponse(stream_games(), media_type="application/json")
         
         @self.app.get("/games/{game_id}/predictions")
         async def get_game_predictions(game_id: str):
             """Get predictions for a specific game"""
-            if game_id in self.predictions_history:
-                return self.predictions_history[game_id]
+            if game_id in self._predictions_bytes:
+                return Response(content=self._predictions_bytes[game_id], media_type="application/json")
             return {"error": "No predictions found for this game"}
         
         @self.app.post("/users/{user_id}/preferences")
@@ -540,25 +927,74 @@ class FootballAIPlatform:
         async def websocket_endpoint(websocket: WebSocket, game_id: str):
             """WebSocket for real-time game updates"""
             await websocket.accept()
+            queue: asyncio.Queue = asyncio.Queue(maxsize=16)
+            self._game_subscribers.setdefault(game_id, []).append(queue)
+            
+            # Bring new subscribers up to date without waiting for the next tick
+            if game_id in self._snapshot_frames:
+                queue.put_nowait(self._snapshot_frames[game_id])
+            if game_id in self._latest_frames:
+                queue.put_nowait(self._latest_frames[game_id])
+            
+            async def drain():
+                while True:
+                    # Merge everything queued since the last send into one frame
+                    frames = [await queue.get()]
+                    while not queue.empty():
+                        frames.append(queue.get_nowait())
+                    await websocket.send_bytes(b"[" + b",".join(frames) + b"]")
+            
+            sender = asyncio.create_task(drain())
             try:
+                # Updates are pushed by the producer; this loop only notices the client leaving
                 while True:
-                    # Send real-time updates
-                    if game_id in self.active_games:
-                        game = self.active_games[game_id]
-                        prediction = self.predictive_model.predict_next_play(
-                            game, {"formation": "unknown"}
-                        )
-                        
-                        await websocket.send_json({
-                            "game_state": asdict(game),
-                            "prediction": asdict(prediction),
-                            "timestamp": datetime.now().isoformat()
-                        })
-                    
-                    await asyncio.sleep(5)  # Update every 5 seconds
+                    await websocket.receive_text()
                     
             except WebSocketDisconnect:
                 logger.info(f"WebSocket disconnected for game {game_id}")
+            finally:
+                sender.cancel()
+                subscribers = self._game_subscribers.get(game_id, [])
+                if queue in subscribers:
+                    subscribers.remove(queue)
+                if not subscribers:
+                    self._game_subscribers.pop(game_id, None)
+    
+    def publish_game_update(self, game: Game, prediction: Prediction):
+        """Serialize a game update once and fan it out to every subscriber queue
+        
+        Subscribers receive one "snapshot" frame with the static team data and
+        then compact "delta" frames carrying only the per-play state.
+        """
+        token = (game.status, game.quarter, game.time_remaining, game.home_score, game.away_score,
+                 game.possession, game.down, game.distance, game.yard_line)
+        previous = self._frame_tokens.get(game.id)
+        if previous == token:
+            # Subscribers already hold this exact state
+            return
+        
+        frames = []
+        if game.id not in self._snapshot_frames or previous is None or previous[0] != game.status:
+            snapshot = orjson.dumps(game.to_snapshot())
+            self._snapshot_frames[game.id] = snapshot
+            frames.append(snapshot)
+        
+        delta = orjson.dumps({
+            "type": "delta",
+            "s": game.to_delta(),
+            "prediction": prediction.to_primitive(),
+            "timestamp": datetime.now().isoformat()
+        })
+        frames.append(delta)
+        self._frame_tokens[game.id] = token
+        self._latest_frames[game.id] = delta
+        
+        for queue in self._game_subscribers.get(game.id, []):
+            for frame in frames:
+                if queue.full():
+                    # Slow client: drop its oldest pending frame rather than block the producer
+                    queue.get_nowait()
+                queue.put_nowait(frame)
     
     async def run_real_time_analysis(self):
         """Run real-time analysis loop"""
@@ -571,20 +1007,32 @@ class FootballAIPlatform:
                     if game.status == GameStatus.LIVE:
                         self.active_games[game.id] = game
                         
-                        # Make predictions
-                        prediction = self.predictive_model.predict_next_play(
-                            game, {"formation": "unknown"}
-                        )
+                        # Nothing new to predict while the situation is unchanged (timeouts,
+                        # breaks): reuse the last prediction. The clock and status may still
+                        # have moved, so the update is published either way
+                        state = (game.quarter, game.down, game.distance, game.yard_line,
+                                 game.home_score, game.away_score, game.possession)
+                        history = self.predictions_history.get(game.id)
+                        if history and self._last_state_hash.get(game.id) == state:
+                            prediction = history[-1]
+                        else:
+                            self._last_state_hash[game.id] = state
+                            
+                            # Make predictions
+                            prediction = self.predictive_model.predict_next_play(
+                                game, {"formation": "unknown"}
+                            )
+                            
+                            # Store prediction history (bounded to the last 100 predictions)
+                            history = self.predictions_history.setdefault(game.id, deque(maxlen=100))
+                            history.append(prediction)
+                            # Re-serialize once per append so the predictions route never does
+                            self._predictions_bytes[game.id] = orjson.dumps(
+                                [entry.to_primitive() for entry in history]
+                            )
                         
-                        # Store prediction history
-                        if game.id not in self.predictions_history:
-                            self.predictions_history[game.id] = []
-                        
-                        self.predictions_history[game.id].append(prediction)
-                        
-                        # Keep only last 100 predictions
-                        if len(self.predictions_history[game.id]) > 100:
-                            self.predictions_history[game.id] = self.predictions_history[game.id][-100:]
+                        # Push the update to WebSocket subscribers (deduplicated by publish_game_update)
+                        self.publish_game_update(game, prediction)
                 
                 # Wait before next update
                 await asyncio.sleep(30)  # Update every 30 seconds
@@ -597,10 +1045,7 @@ class FootballAIPlatform:
         """Run the platform"""
         logger.info("Starting Football AI Platform...")
         
-        # Start real-time analysis in background
-        asyncio.create_task(self.run_real_time_analysis())
-        
-        # Start FastAPI server
+        # Start FastAPI server (models and background analysis start in the lifespan)
         uvicorn.run(self.app, host=host, port=port)
 
 def main():
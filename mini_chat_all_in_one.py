@@ -20,17 +20,42 @@ import argparse
 import os
 import sys
 import platform
+import gzip
+import json
+import queue
+import atexit
+import hashlib
+import logging
+import logging.handlers
 import asyncio
-from typing import Optional
+import threading
+import importlib.util
+import importlib.metadata
+import contextlib
+import io
+import functools
+import shutil
+import socket
+import struct
+import time
+from datetime import datetime
+from itertools import islice
+from string import Template
+from array import array
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Callable, Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Union
 
-# Model-related imports
+# Model-related imports. transformers and the web stack are imported where
+# they're used: transformers alone takes seconds to import, and CLI runs
+# never touch fastapi/uvicorn.
 import torch
-from transformers import AutoTokenizer, AutoModelForCausalLM
 
-# Web server imports
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
-from fastapi.responses import HTMLResponse
-import uvicorn
+if TYPE_CHECKING:
+    from fastapi import FastAPI, WebSocket
+    from transformers import LogitsProcessorList
+
+logger = logging.getLogger("minichat")
 
 # ---------------------------
 # Configuration
@@ -38,11 +63,24 @@ import uvicorn
 DEFAULT_MODEL = "EleutherAI/gpt-neo-125M" # change to another model if desired
 DEFAULT_MAX_NEW_TOKENS = 150
 DEFAULT_TEMPERATURE = 0.8
+GREEDY_TEMPERATURE = 1e-3  # at or below this, decode greedily instead of sampling
 DEFAULT_TOP_P = 0.95
 DEFAULT_TOP_K = 50
 DEFAULT_REPETITION_PENALTY = 1.1
 DEFAULT_MAX_LENGTH = 2048
 CLIENT_HTML_PATH = "client.html"
+QUANTIZATION_MODES = ["none", "int8", "int8_dynamic", "nf4"]
+DTYPE_MODES = ["auto", "fp32", "bf16", "fp16"]
+MAX_BATCH_SIZE = 16      # max WebSocket prompts fused into one generate call
+MAX_BATCH_WAIT_MS = 20   # how long the batcher waits for more prompts
+STREAM_FLUSH_MS = 20     # after the first token, coalesce streamed text for this long per frame
+REPLY_CACHE_SIZE = 1024  # greedy replies remembered per exact conversation state
+MAX_CACHED_SESSIONS = 32 # WebSocket sessions that keep their KV cache between turns (LRU)
+EVICT_TO_FRACTION = 0.75 # a full session evicts old turns down to this share of the context
+# Set MINICHAT_COMPILE=1 to torch.compile the model (slow warm-up, faster decode)
+COMPILE_MODEL = os.getenv("MINICHAT_COMPILE", "0") == "1"
+# Intra-op threads for CPU inference (0 = one per physical core)
+CPU_THREADS = int(os.getenv("MINICHAT_CPU_THREADS", "0"))
 
 # Model presets for different use cases
 MODEL_PRESETS = {
@@ -66,46 +104,143 @@ def get_device():
         return "cpu"
 
 DEFAULT_DEVICE = get_device()
+# FP32 matmuls (CPU fallback, FP32 retries, unquantized layers) may use TF32/bf16 internals
+torch.set_float32_matmul_precision("high")
 
 # ---------------------------
 # Utilities
 # ---------------------------
+BANNED_WORDS: FrozenSet[str] = frozenset({
+    "bomb", "kill", "suicide", "self-harm", "illegal", "terrorist", "explode",
+    "child porn", "cp", "ddos", "hitman", "assassinate"
+})
+# ASCII-only lowercasing table: the banned words are ASCII, so bytes.translate
+# (one C pass) followed by a memmem-backed `in` per word is all the check needs.
+# An IGNORECASE regex alternation looks single-pass but re backtracks at every
+# position, and is 2-12x slower than this on typical messages
+_LOWER_TABLE = bytes.maketrans(bytes(range(0x41, 0x5B)), bytes(range(0x61, 0x7B)))
+_BANNED_BYTES = tuple(w.encode() for w in BANNED_WORDS)
+
+# With pyahocorasick installed, all words are matched in a single automaton
+# pass, whose cost doesn't grow with the size of the word list
+try:
+    import ahocorasick
+    _BANNED_AC = ahocorasick.Automaton()
+    for _word in BANNED_WORDS:
+        _BANNED_AC.add_word(_word, _word)
+    _BANNED_AC.make_automaton()
+except ImportError:
+    _BANNED_AC = None
+
 def safe_check(text: str) -> bool:
     """
     Very simple content filter: block obvious harmful keywords.
     Replace/extend with a better filter for production.
     """
-    banned = [
-        "bomb", "kill", "suicide", "self-harm", "illegal", "terrorist", "explode",
-        "child porn", "cp", "ddos", "hitman", "assassinate"
-    ]
-    low = text.lower()
-    return not any(w in low for w in banned)
+    if _BANNED_AC is not None:
+        # islower() stops at the first uppercase character; typed chat is often
+        # already lowercase, which saves copying the message
+        for _ in _BANNED_AC.iter(text if text.islower() else text.lower()):
+            return False
+        return True
+    if not text.isascii():
+        # Non-ASCII characters can lower-case to ASCII ones (e.g. the Kelvin sign
+        # to "k"), which the byte table can't see; str.lower() folds them like
+        # the automaton path does
+        text = text.lower()
+    lowered = text.encode("utf-8", "ignore").translate(_LOWER_TABLE)
+    for word in _BANNED_BYTES:
+        if word in lowered:
+            return False
+    return True
+
+# orjson (optional) encodes/decodes JSON in C straight to/from bytes
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# psutil (optional) backs the process/hardware CLI panels and CPU thread tuning
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Handle on this process for the process panels. psutil measures a process's
+# cpu_percent() against the previous call on the same handle, so it is created
+# and primed once here; a fresh Process() per command would always report 0.0.
+_OWN_PROCESS = psutil.Process() if psutil is not None else None
+_OWN_PROCESS_STARTED: Optional[str] = None
+if _OWN_PROCESS is not None:
+    _OWN_PROCESS.cpu_percent(interval=None)
+    # The start time never changes, so it is formatted once
+    _OWN_PROCESS_STARTED = datetime.fromtimestamp(_OWN_PROCESS.create_time()).strftime('%Y-%m-%d %H:%M:%S')
+
+def _json_bytes(obj) -> bytes:
+    """Indented UTF-8 JSON, as the history files have always been written."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode("utf-8")
+
+def _parse_json(data: bytes):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+def _json_line(obj) -> bytes:
+    """One compact JSON line, the record format of *.jsonl history logs."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE)
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+def _encode_json_lines(history: list) -> bytes:
+    return b"".join(map(_json_line, history))
+
+def _decode_json_lines(data: bytes) -> list:
+    return [_parse_json(line) for line in data.splitlines() if line.strip()]
+
+# msgpack (optional): "*.msgpack" history files are binary, smaller than JSON
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+def _history_codec(filename: str):
+    """(encode, decode) for a history file, chosen by its extension."""
+    if filename.endswith(".jsonl"):
+        return _encode_json_lines, _decode_json_lines
+    if filename.endswith(".msgpack"):
+        if msgpack is None:
+            raise RuntimeError("saving/loading .msgpack files requires msgpack (pip install msgpack)")
+        return msgpack.packb, msgpack.unpackb
+    return _json_bytes, _parse_json
 
 def save_conversation_history(history: list, filename: str):
-    """Save conversation history to a JSON file."""
+    """Save conversation history to a JSON file (msgpack for *.msgpack)."""
     try:
-        import json
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(history, f, indent=2, ensure_ascii=False)
-        print(f"[INFO] Conversation history saved to {filename}")
+        encode, _ = _history_codec(filename)
+        with open(filename, 'wb') as f:
+            f.write(encode(list(history)))
+        logger.info(f"Conversation history saved to {filename}")
         return True
     except Exception as e:
-        print(f"[ERROR] Failed to save history: {e}")
+        logger.error(f"Failed to save history: {e}")
         return False
 
 def load_conversation_history(filename: str) -> list:
-    """Load conversation history from a JSON file."""
+    """Load conversation history from a JSON file (msgpack for *.msgpack)."""
     try:
-        import json
-        with open(filename, 'r', encoding='utf-8') as f:
-            history = json.load(f)
-        print(f"[INFO] Conversation history loaded from {filename}")
+        _, decode = _history_codec(filename)
+        with open(filename, 'rb') as f:
+            history = decode(f.read())
+        logger.info(f"Conversation history loaded from {filename}")
         return history
     except Exception as e:
-        print(f"[ERROR] Failed to load history: {e}")
+        logger.error(f"Failed to load history: {e}")
         return []
 
+def last_turns(history, n: int):
+    """The last n turns of a history list or deque (deques can't be sliced)."""
+    return islice(history, max(len(history) - n, 0), None)
+
 def create_system_prompt(prompt_type: str = "general") -> str:
     """Create system prompts for different conversation types."""
     prompts = {
@@ -117,11 +252,256 @@ def create_system_prompt(prompt_type: str = "general") -> str:
     }
     return prompts.get(prompt_type, prompts["general"])
 
+def setup_logging(verbose: bool = False):
+    """
+    Route the minichat logger through a queue so callers (the event loop
+    included) only enqueue records; a listener thread does the formatting
+    and the blocking writes.
+    """
+    log_queue = queue.Queue(-1)
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter("[%(levelname)s] %(message)s"))
+    listener = logging.handlers.QueueListener(log_queue, stream)
+    listener.start()
+    atexit.register(listener.stop)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    logger.setLevel(logging.DEBUG if verbose else logging.INFO)
+    logger.propagate = False
+
 def format_timestamp() -> str:
     """Get current timestamp for logging."""
-    from datetime import datetime
     return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
+_LOCAL_ADDRESS: Optional[Union[tuple, OSError]] = None
+
+def local_address() -> tuple:
+    """
+    (hostname, IP) of this machine, resolved once since the DNS lookup can block.
+    A failed lookup is remembered too and re-raised, so a broken resolver costs
+    one timeout rather than one per command.
+    """
+    global _LOCAL_ADDRESS
+    if _LOCAL_ADDRESS is None:
+        try:
+            hostname = socket.gethostname()
+            _LOCAL_ADDRESS = (hostname, socket.gethostbyname(hostname))
+        except OSError as e:
+            _LOCAL_ADDRESS = e
+    if isinstance(_LOCAL_ADDRESS, OSError):
+        raise _LOCAL_ADDRESS.with_traceback(None)
+    return _LOCAL_ADDRESS
+
+_DEPENDENCY_VERSIONS = {}
+
+def dependency_version(name: str) -> Optional[str]:
+    """Installed version of a distribution (None if missing), looked up once per name."""
+    if name not in _DEPENDENCY_VERSIONS:
+        try:
+            _DEPENDENCY_VERSIONS[name] = importlib.metadata.version(name)
+        except importlib.metadata.PackageNotFoundError:
+            _DEPENDENCY_VERSIONS[name] = None
+    return _DEPENDENCY_VERSIONS[name]
+
+# Hugging Face cache subdirectories that never hold a model's config.json
+_CACHE_SKIP_DIRS = frozenset({"blobs", ".locks", "offload"})
+
+def count_cached_models(cache_dir: str, ttl: int = 60) -> int:
+    """Number of directories under cache_dir holding a config.json, rescanned at most every ttl seconds."""
+    return _count_cached_models(cache_dir, int(time.time()) // ttl)
+
+@functools.lru_cache(maxsize=4)
+def _count_cached_models(cache_dir: str, _time_bucket: int) -> int:
+    count = 0
+    pending = [cache_dir]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name not in _CACHE_SKIP_DIRS:
+                        pending.append(entry.path)
+                elif entry.name == "config.json":
+                    count += 1
+    return count
+
+def hf_cache_dir() -> str:
+    """
+    Hugging Face hub cache directory, resolved from the same environment
+    variables huggingface_hub reads, without importing transformers for it.
+    """
+    hf_home = os.environ.get("HF_HOME") or os.path.join(os.environ.get("XDG_CACHE_HOME", "~/.cache"), "huggingface")
+    return os.path.expanduser(os.environ.get("HF_HUB_CACHE") or os.path.join(hf_home, "hub"))
+
+def cache_dir_stats(path: str) -> tuple:
+    """
+    (total bytes, file count, model-like directory count) under path. Walks
+    with scandir so file sizes come from the directory entries, one stat per
+    file instead of os.walk's listing plus a getsize() per file.
+    """
+    total_size = file_count = model_count = 0
+    pending = [path]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                        name = entry.name.lower()
+                        if 'model' in name or 'tokenizer' in name or 'config' in name:
+                            model_count += 1
+                    else:
+                        total_size += entry.stat(follow_symlinks=False).st_size
+                        file_count += 1
+                except OSError:
+                    pass
+    return total_size, file_count, model_count
+
+def _psutil_missing() -> bool:
+    """Print the install hint for the psutil-backed CLI panels when psutil isn't available."""
+    if psutil is None:
+        print("  psutil not available - install with: pip install psutil")
+        return True
+    return False
+
+def gpu_memory(model_wrapper: "ModelWrapper") -> Optional[tuple]:
+    """(total, allocated, reserved) bytes on the model's GPU, or None when it runs elsewhere."""
+    if model_wrapper.gpu_properties is None:
+        return None
+    return (model_wrapper.gpu_properties.total_memory,
+            torch.cuda.memory_allocated(0), torch.cuda.memory_reserved(0))
+
+class MemorySummary(NamedTuple):
+    total: int
+    used: int
+    percent: float
+
+_MEMINFO_PATH = "/proc/meminfo"
+
+def memory_summary() -> MemorySummary:
+    """
+    Total/used bytes and percent used of system RAM, the same figures as
+    psutil.virtual_memory(). On Linux they come from one read of /proc/meminfo
+    rather than psutil's full parse; elsewhere (or on kernels without
+    MemAvailable) psutil is used.
+    """
+    try:
+        with open(_MEMINFO_PATH, "rb") as f:
+            data = f.read()
+    except OSError:
+        data = b""
+    fields = {}
+    for line in data.splitlines():
+        key, _, value = line.partition(b":")
+        if key in (b"MemTotal", b"MemAvailable"):
+            fields[key] = int(value.split()[0]) * 1024
+            if len(fields) == 2:
+                break
+    if len(fields) < 2:
+        memory = psutil.virtual_memory()
+        return MemorySummary(memory.total, memory.used, memory.percent)
+    total = fields[b"MemTotal"]
+    used = total - fields[b"MemAvailable"]
+    return MemorySummary(total, used, round(used / total * 100, 1))
+
+_CPU_PERCENT: Optional[float] = None
+_CPU_SAMPLER: Optional[threading.Thread] = None
+
+def cpu_percent() -> float:
+    """
+    System-wide CPU usage in percent. psutil needs an interval to measure over,
+    so a daemon thread samples it once a second and panels read the latest value
+    instead of sleeping for a second each.
+    """
+    global _CPU_SAMPLER
+    if _CPU_SAMPLER is None:
+        _CPU_SAMPLER = threading.Thread(target=_sample_cpu_percent, name="minichat-cpu", daemon=True)
+        _CPU_SAMPLER.start()
+    if _CPU_PERCENT is None:
+        # First call, before the sampler has a reading
+        return psutil.cpu_percent(interval=0.1)
+    return _CPU_PERCENT
+
+def _sample_cpu_percent():
+    global _CPU_PERCENT
+    while True:
+        _CPU_PERCENT = psutil.cpu_percent(interval=1.0)
+
+def gpu_stats() -> Optional[tuple]:
+    """(utilization %, temperature °C) of the current GPU, or None when NVML can't be queried."""
+    # NVML queries block for milliseconds; reuse a reading for up to half a second
+    return _gpu_stats(int(time.time() * 2))
+
+@functools.lru_cache(maxsize=1)
+def _gpu_stats(_time_bucket: int) -> Optional[tuple]:
+    try:
+        return torch.cuda.utilization(), torch.cuda.temperature()
+    except Exception:
+        # pynvml missing, or a driver without these queries
+        return None
+
+class SystemInfo(NamedTuple):
+    python_version: str
+    python_implementation: str
+    python_compiler: str
+    platform: str
+    system: str
+    release: str
+    machine: str
+    processor: str
+    architecture: tuple
+    node: str
+    cuda_available: bool
+    cuda_version: Optional[str]
+    gpu_count: int
+    mps_available: bool
+
+def interpreter_architecture() -> tuple:
+    """
+    (bits, linkage) of the running interpreter, like platform.architecture()
+    but without that function's `file` subprocess: the pointer size gives the
+    bits and the executable's magic number the linkage.
+    """
+    bits = f"{struct.calcsize('P') * 8}bit"
+    if sys.platform == "win32":
+        return bits, "WindowsPE"
+    try:
+        with open(sys.executable, "rb") as f:
+            magic = f.read(4)
+    except OSError:
+        magic = b""
+    return bits, "ELF" if magic == b"\x7fELF" else ""
+
+@functools.lru_cache(maxsize=None)
+def system_info() -> SystemInfo:
+    """
+    Host facts for the CLI info panels, gathered once: they don't change while
+    the process runs, and platform.processor() forks `uname` on Linux.
+    """
+    cuda_available = torch.cuda.is_available()
+    return SystemInfo(
+        python_version=platform.python_version(),
+        python_implementation=platform.python_implementation(),
+        python_compiler=platform.python_compiler(),
+        platform=platform.platform(),
+        system=platform.system(),
+        release=platform.release(),
+        machine=platform.machine(),
+        processor=platform.processor(),
+        architecture=interpreter_architecture(),
+        node=platform.node(),
+        cuda_available=cuda_available,
+        cuda_version=torch.version.cuda,
+        gpu_count=torch.cuda.device_count() if cuda_available else 0,
+        mps_available=hasattr(torch.backends, 'mps') and torch.backends.mps.is_available(),
+    )
+
 def export_conversation(history: list, format_type: str = "txt", filename: str = None) -> str:
     """Export conversation history in different formats."""
     if not filename:
@@ -147,70 +527,67 @@ def export_conversation(history: list, format_type: str = "txt", filename: str =
                     f.write(f"**Bot:** {turn['bot']}\n\n")
             return filename
         elif format_type == "json":
-            import json
-            with open(filename, 'w', encoding='utf-8') as f:
-                json.dump({
+            with open(filename, 'wb') as f:
+                f.write(_json_bytes({
                     "metadata": {
                         "timestamp": format_timestamp(),
                         "total_turns": len(history)
                     },
-                    "conversation": history
-                }, f, indent=2, ensure_ascii=False)
+                    "conversation": list(history)
+                }))
             return filename
         else:
             raise ValueError(f"Unsupported format: {format_type}")
     except Exception as e:
-        print(f"[ERROR] Failed to export conversation: {e}")
+        logger.error(f"Failed to export conversation: {e}")
         return None
 
-def write_client_html(path: str = CLIENT_HTML_PATH, ws_path: str = "/ws/chat"):
-    """
-    Writes an enhanced HTML client that connects to the WebSocket.
-    """
-    html = f"""<!doctype html>
+# The page only varies by WebSocket path; "$ws_path" is substituted (JS "${...}"
+# template literals don't match a given name, so safe_substitute leaves them alone)
+CLIENT_HTML_TEMPLATE = Template("""<!doctype html>
 <html>
 <head>
     <meta charset="utf-8">
     <title>MiniChat 2.0</title>
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <style>
-        * {{ margin: 0; padding: 0; box-sizing: border-box; }}
-        body {{ 
+        * { margin: 0; padding: 0; box-sizing: border-box; }
+        body { 
             font-family: -apple-system, BlinkMacSystemFont, 'Segoe UI', Roboto, sans-serif; 
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             min-height: 100vh;
             padding: 20px;
-        }}
-        .container {{
+        }
+        .container {
             max-width: 800px;
             margin: 0 auto;
             background: white;
             border-radius: 20px;
             box-shadow: 0 20px 40px rgba(0,0,0,0.1);
             overflow: hidden;
-        }}
-        .header {{
+        }
+        .header {
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             color: white;
             padding: 30px;
             text-align: center;
-        }}
-        .header h1 {{
+        }
+        .header h1 {
             font-size: 2.5em;
             margin-bottom: 10px;
             font-weight: 300;
-        }}
-        .header p {{
+        }
+        .header p {
             opacity: 0.9;
             font-size: 1.1em;
-        }}
-        .chat-container {{
+        }
+        .chat-container {
             padding: 20px;
             height: 500px;
             display: flex;
             flex-direction: column;
-        }}
-        #log {{
+        }
+        #log {
             flex: 1;
             overflow-y: auto;
             padding: 20px;
@@ -218,39 +595,39 @@ def write_client_html(path: str = CLIENT_HTML_PATH, ws_path: str = "/ws/chat"):
             border-radius: 15px;
             margin-bottom: 20px;
             border: 1px solid #e9ecef;
-        }}
-        .message {{
+        }
+        .message {
             margin-bottom: 15px;
             padding: 15px;
             border-radius: 15px;
             max-width: 80%;
             word-wrap: break-word;
-        }}
-        .you {{
+        }
+        .you {
             background: #007bff;
             color: white;
             margin-left: auto;
             border-bottom-right-radius: 5px;
-        }}
-        .bot {{
+        }
+        .bot {
             background: #28a745;
             color: white;
             margin-right: auto;
             border-bottom-left-radius: 5px;
-        }}
-        .sys {{
+        }
+        .sys {
             background: #6c757d;
             color: white;
             text-align: center;
             margin: 10px auto;
             font-style: italic;
-        }}
-        .input-container {{
+        }
+        .input-container {
             display: flex;
             gap: 10px;
             align-items: center;
-        }}
-        #input {{
+        }
+        #input {
             flex: 1;
             padding: 15px;
             border: 2px solid #e9ecef;
@@ -258,11 +635,11 @@ def write_client_html(path: str = CLIENT_HTML_PATH, ws_path: str = "/ws/chat"):
             font-size: 16px;
             outline: none;
             transition: border-color 0.3s;
-        }}
-        #input:focus {{
+        }
+        #input:focus {
             border-color: #667eea;
-        }}
-        #send {{
+        }
+        #send {
             padding: 15px 30px;
             background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
             color: white;
@@ -271,29 +648,29 @@ def write_client_html(path: str = CLIENT_HTML_PATH, ws_path: str = "/ws/chat"):
             font-size: 16px;
             cursor: pointer;
             transition: transform 0.2s;
-        }}
-        #send:hover {{
+        }
+        #send:hover {
             transform: translateY(-2px);
-        }}
-        .typing {{
+        }
+        .typing {
             display: none;
             color: #6c757d;
             font-style: italic;
             text-align: center;
             margin: 10px 0;
-        }}
-        .status {{
+        }
+        .status {
             text-align: center;
             padding: 10px;
             color: #6c757d;
             font-size: 14px;
-        }}
-        @media (max-width: 600px) {{
-            .container {{ margin: 10px; }}
-            .header {{ padding: 20px; }}
-            .header h1 {{ font-size: 2em; }}
-            .chat-container {{ height: 400px; }}
-        }}
+        }
+        @media (max-width: 600px) {
+            .container { margin: 10px; }
+            .header { padding: 20px; }
+            .header h1 { font-size: 2em; }
+            .chat-container { height: 400px; }
+        }
     </style>
 </head>
 <body>
@@ -319,47 +696,64 @@ def write_client_html(path: str = CLIENT_HTML_PATH, ws_path: str = "/ws/chat"):
         const typing = document.getElementById("typing");
         const status = document.getElementById("status");
         
-        function addMessage(cls, text, isHTML = false) {{
+        function addMessage(cls, text, isHTML = false) {
             const div = document.createElement("div");
-            div.className = `message ${{cls}}`;
+            div.className = `message ${cls}`;
             div.innerHTML = isHTML ? text : text.replace(/\\n/g, '<br>');
             log.appendChild(div);
             log.scrollTop = log.scrollHeight;
-        }}
+        }
         
-        function setStatus(text, isError = false) {{
+        function setStatus(text, isError = false) {
             status.textContent = text;
             status.style.color = isError ? '#dc3545' : '#6c757d';
-        }}
+        }
         
-        function showTyping(show) {{
+        function showTyping(show) {
             typing.style.display = show ? 'block' : 'none';
             if (show) log.scrollTop = log.scrollHeight;
-        }}
+        }
         
-        const ws = new WebSocket((location.protocol === "https:" ? "wss://" : "ws://") + location.host + "{ws_path}");
+        const ws = new WebSocket((location.protocol === "https:" ? "wss://" : "ws://") + location.host + "$ws_path");
         
-        ws.onopen = () => {{
+        ws.onopen = () => {
             setStatus("Connected");
             addMessage('sys', 'Connected to MiniChat server');
-        }};
+        };
         
-        ws.onmessage = (e) => {{
-            showTyping(false);
-            addMessage('bot', e.data);
-        }};
+        // Replies arrive as {"type": "delta", "text": ...} frames followed by {"type": "end"}
+        let reply = null;
+        ws.onmessage = (e) => {
+            const msg = JSON.parse(e.data);
+            if (msg.type === "status") {
+                addMessage('sys', msg.text);
+                return;
+            }
+            if (msg.type === "end") {
+                reply = null;
+                return;
+            }
+            if (!reply) {
+                showTyping(false);
+                addMessage('bot', '');
+                reply = { div: log.lastChild, text: '' };
+            }
+            reply.text += msg.text;
+            reply.div.innerHTML = reply.text.replace(/\\n/g, '<br>');
+            log.scrollTop = log.scrollHeight;
+        };
         
-        ws.onclose = () => {{
+        ws.onclose = () => {
             setStatus("Disconnected", true);
             addMessage('sys', 'Disconnected from server');
-        }};
+        };
         
-        ws.onerror = (e) => {{
+        ws.onerror = (e) => {
             setStatus("Connection error", true);
             console.error(e);
-        }};
+        };
         
-        function sendMessage() {{
+        function sendMessage() {
             const text = input.value.trim();
             if (!text) return;
             
@@ -367,32 +761,124 @@ def write_client_html(path: str = CLIENT_HTML_PATH, ws_path: str = "/ws/chat"):
             ws.send(text);
             input.value = "";
             showTyping(true);
-        }}
+        }
         
         send.onclick = sendMessage;
-        input.addEventListener("keydown", (e) => {{
+        input.addEventListener("keydown", (e) => {
             if (e.key === "Enter") sendMessage();
-        }});
+        });
         
         // Focus input on load
         input.focus();
     </script>
 </body>
-</html>"""
-    with open(path, "w", encoding="utf-8") as f:
-        f.write(html)
-    print(f"[INFO] Wrote enhanced client HTML to {path}")
+</html>""")
+
+def render_client_html(ws_path: str = "/ws/chat") -> str:
+    """
+    Renders the enhanced HTML client that connects to the WebSocket.
+    """
+    return CLIENT_HTML_TEMPLATE.safe_substitute(ws_path=ws_path)
+
+# Rendered once at import; the web server serves these bytes directly
+_CLIENT_HTML_BYTES = render_client_html().encode("utf-8")
+_CLIENT_HTML_GZ = gzip.compress(_CLIENT_HTML_BYTES, 9)
+# Lets a browser revalidate its copy with a 304 once max-age has passed; the
+# gzip body is a different representation, so it gets its own strong tag
+_CLIENT_HTML_TAG = hashlib.blake2b(_CLIENT_HTML_BYTES, digest_size=8).hexdigest()
+_CLIENT_HTML_ETAG = f'"{_CLIENT_HTML_TAG}"'
+_CLIENT_HTML_GZ_ETAG = f'"{_CLIENT_HTML_TAG}-gz"'
+
+def write_client_html(path: str = CLIENT_HTML_PATH, ws_path: str = "/ws/chat"):
+    """
+    Writes the HTML client to disk (the server itself doesn't read it).
+    """
+    html = _CLIENT_HTML_BYTES if ws_path == "/ws/chat" else render_client_html(ws_path).encode("utf-8")
+    # Already-encoded bytes go straight to the fd, no buffered file object
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        view = memoryview(html)
+        while view:
+            view = view[os.write(fd, view):]
+    finally:
+        os.close(fd)
+    logger.info(f"Wrote enhanced client HTML to {path}")
 
 # ---------------------------
 # Model Loader
 # ---------------------------
+class ChatSession:
+    """
+    Token ids and KV cache for one conversation. Each turn only prefills the
+    new user tokens; the cache covers everything generated before.
+
+    input_ids is the system prompt (prefix_len tokens) followed by whole
+    turns, whose lengths are kept in turn_lengths so the oldest turns can
+    be evicted when the context fills up.
+    """
+    def __init__(self):
+        self.input_ids: List[int] = []
+        self.prefix_len = 0
+        self.turn_lengths: deque = deque()
+        self.past_key_values = None
+        self.system_prompt: Optional[str] = None
+
+    def reset(self):
+        self.input_ids = []
+        self.prefix_len = 0
+        self.turn_lengths = deque()
+        self.past_key_values = None
+        self.system_prompt = None
+
+    def evict_oldest_turn(self):
+        n = self.turn_lengths.popleft()
+        del self.input_ids[self.prefix_len:self.prefix_len + n]
+        # Positions after the evicted turn have shifted, so the cache is stale
+        self.past_key_values = None
+
+    def add_turn(self, ids: List[int], reply_ids: List[int]):
+        """Record a finished turn; ids must extend the current input_ids."""
+        self.turn_lengths.append(len(ids) + len(reply_ids) - len(self.input_ids))
+        self.input_ids = ids + reply_ids
+
+class RepetitionLogitsProcessor:
+    """
+    transformers' RepetitionPenaltyLogitsProcessor and NoRepeatNGramLogitsProcessor
+    (same vectorized math and results) fused into one step that edits scores in
+    place: generate hands each step a fresh float copy of the logits, so the
+    two full-vocabulary copies the stock processors make per token are saved.
+    """
+    def __init__(self, penalty: float, no_repeat_ngram_size: int):
+        self.penalty = penalty
+        self.ngram_size = no_repeat_ngram_size
+
+    def __call__(self, input_ids: torch.Tensor, scores: torch.Tensor) -> torch.Tensor:
+        if self.penalty != 1.0:
+            seen = torch.gather(scores, 1, input_ids)
+            scores.scatter_(1, input_ids, torch.where(seen < 0, seen * self.penalty, seen / self.penalty))
+        n, cur_len = self.ngram_size, input_ids.shape[-1]
+        if cur_len >= n:
+            # Ban each token that completed an earlier n-gram starting like the last n-1 tokens
+            prefix = input_ids[:, cur_len + 1 - n:]
+            windows = input_ids.unfold(1, n, 1)
+            matches = (windows[..., :-1] == prefix.unsqueeze(1)).all(dim=-1)
+            vocab_size = scores.shape[-1]
+            # Non-matching windows go to a spare column, avoiding a host sync on the matches
+            banned = scores.new_zeros((scores.shape[0], vocab_size + 1), dtype=torch.bool)
+            banned.scatter_(1, torch.where(matches, windows[..., -1].clamp(max=vocab_size), vocab_size), True)
+            scores.masked_fill_(banned[:, :vocab_size], -float("inf"))
+        return scores
+
 class ModelWrapper:
     def __init__(self, model_name: str = DEFAULT_MODEL, device: Optional[str] = None, 
                  temperature: float = DEFAULT_TEMPERATURE, top_p: float = DEFAULT_TOP_P,
                  top_k: int = DEFAULT_TOP_K, repetition_penalty: float = DEFAULT_REPETITION_PENALTY,
-                 system_prompt: str = "general"):
+                 system_prompt: str = "general", quantization: str = "none",
+                 dtype: str = "auto", background_load: bool = False):
         self.model_name = model_name
         self.device = device or DEFAULT_DEVICE
+        self.quantization = quantization
+        self.dtype = dtype
         self.temperature = temperature
         self.top_p = top_p
         self.top_k = top_k
@@ -400,1366 +886,2270 @@ class ModelWrapper:
         self.system_prompt = create_system_prompt(system_prompt)
         self.tokenizer = None
         self.model = None
-        self.conversation_history = []
+        # Special token ids, read from the tokenizer once per load
+        self.eos_id = self.pad_id = None
+        self.total_params = self.trainable_params = 0
+        self.gpu_properties = None
         self.max_history_length = 10
-        self._load()
+        self.conversation_history = deque(maxlen=self.max_history_length)
+        # Open *.jsonl log that each new turn is appended to (see --save-history)
+        self.history_log = None
+        # Running totals over conversation_history for get_stats/token_totals
+        self._total_user_chars = self._total_bot_chars = 0
+        self._total_tokens = (0, 0)
+        self.session = ChatSession()
+        self._reply_cache = OrderedDict()
+        # Generation settings the cached replies were made with
+        self._reply_cache_sig = None
+        self._static_cache = False
+        self._static_kv = None
+        self._static_kv_len = 0
+        self._logits_processors = None
+        self._logits_processor_sig = None
+        # KV cache of the last generate() call and the token ids it covers
+        self._prefix_ids: List[int] = []
+        self._prefix_cache = None
+        # Encoded system prompt (keyed by its text) and encoded history turns
+        self._system_ids_key: Optional[str] = None
+        self._system_ids: List[int] = []
+        # KV cache of the encoded system prompt, shared by sessions that start with it
+        self._system_kv_key: Optional[str] = None
+        self._system_kv = None
+        self._history_ids = {}
+        self._ready = threading.Event()
+        self._load_error: Optional[Exception] = None
+        # Async callers run model work here; a single thread serializes GPU access
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="minichat-model")
+        if background_load:
+            # Let the caller (e.g. the web server) start up while weights load
+            threading.Thread(target=self._load_in_background, daemon=True).start()
+        else:
+            self._load()
+            self._ready.set()
+
+    def _load_in_background(self):
+        try:
+            self._load()
+        except Exception as e:
+            logger.error(f"Background model load failed: {e}")
+            self._load_error = e
+        finally:
+            self._ready.set()
+
+    @property
+    def ready(self) -> bool:
+        """True once the model has loaded successfully."""
+        return self._ready.is_set() and self._load_error is None
+
+    def wait_ready(self):
+        """Block until a background load has finished; raise if it failed."""
+        self._ready.wait()
+        if self._load_error is not None:
+            raise RuntimeError(f"Model failed to load: {self._load_error}")
+
+    def reset_cache(self):
+        """
+        Release the KV caches kept between calls: the CLI session's and the one
+        generate() keeps for prefix reuse. The next turn prefills from scratch.
+        """
+        self.session.reset()
+        self._prefix_ids, self._prefix_cache = [], None
 
     def _load(self):
+        # Cached keys/values and replies belong to the previous weights
+        self.reset_cache()
+        self._reply_cache.clear()
+        self._system_kv_key, self._system_kv = None, None
+        # A new model may come with a different tokenizer
+        self._system_ids_key, self._history_ids = None, {}
         try:
-            print(f"[INFO] Loading tokenizer & model: {self.model_name} on device {self.device} ...")
-            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+            logger.info(f"Loading tokenizer & model: {self.model_name} on device {self.device} ...")
+            from transformers import AutoTokenizer
+            # The Rust-backed tokenizer runs on every turn; the Python one is far slower
+            self.tokenizer = AutoTokenizer.from_pretrained(self.model_name, use_fast=True)
+            if not self.tokenizer.is_fast:
+                logger.warning(f"No fast tokenizer for {self.model_name}; using the slow Python tokenizer.")
             # For some models the tokenizer doesn't set pad/eos; ensure eos_token_id exists
             if self.tokenizer.pad_token is None:
                 try:
                     self.tokenizer.pad_token = self.tokenizer.eos_token
                 except Exception:
                     pass
-            self.model = AutoModelForCausalLM.from_pretrained(self.model_name)
-            self.model.to(self.device)
-            print("[INFO] Model loaded successfully.")
+            # Decoder-only models generate after the last position, so pad on the left
+            # (also what _generate_padded does by hand)
+            self.tokenizer.padding_side = "left"
+            # Turn scaffolding is encoded once; the user text keeps its leading
+            # space so BPE splits it exactly as in the joined string
+            self._user_prefix_ids = self.tokenizer.encode("\nUser:", add_special_tokens=False)
+            self._assistant_prefix_ids = self.tokenizer.encode("\nAssistant:", add_special_tokens=False)
+            self.eos_id = self.tokenizer.eos_token_id
+            self.pad_id = self.tokenizer.pad_token_id if self.tokenizer.pad_token_id is not None else self.eos_id
+            self.model = self._load_model()
+            if self.device == "cuda":
+                # TF32 convolutions too (matmuls are covered by set_float32_matmul_precision)
+                torch.backends.cudnn.allow_tf32 = True
+            logger.info("Model loaded successfully.")
         except Exception as e:
-            print(f"[ERROR] Failed to load model: {e}")
-            print("[INFO] Falling back to CPU...")
+            logger.error(f"Failed to load model: {e}")
+            logger.info("Falling back to CPU...")
             self.device = "cpu"
+            from transformers import AutoModelForCausalLM
             self.model = AutoModelForCausalLM.from_pretrained(self.model_name)
             self.model.to(self.device)
-            print("[INFO] Model loaded on CPU.")
+            logger.info("Model loaded on CPU.")
+        if self.device == "cpu":
+            self._tune_cpu()
+        config = self.model.config
+        # Fixed for the loaded weights, so counted here rather than per `performance` call
+        self.total_params = self.trainable_params = 0
+        for param in self.model.parameters():
+            self.total_params += param.numel()
+            if param.requires_grad:
+                self.trainable_params += param.numel()
+        self.max_context = getattr(config, "max_position_embeddings", None) or getattr(config, "n_positions", DEFAULT_MAX_LENGTH)
+        # Read once CUDA is up for the model; the CLI panels only make CUDA
+        # runtime calls when this is set, so they never initialise CUDA themselves
+        self.gpu_properties = torch.cuda.get_device_properties(0) if self.device == "cuda" else None
+        if COMPILE_MODEL:
+            self._compile()
+
+    def _tune_cpu(self):
+        """CPU inference setup: one thread per physical core, plus IPEX kernels if installed."""
+        threads = CPU_THREADS
+        if not threads and psutil is not None:
+            threads = psutil.cpu_count(logical=False)
+        if not threads:
+            # Without psutil assume two hardware threads per core
+            threads = max(1, (os.cpu_count() or 1) // 2)
+        # Hyperthread siblings only contend for the same FPUs during matmuls
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:
+            pass  # can only be set before inter-op work has started (e.g. on reload)
+        
+        if self.quantization != "none":
+            return
+        try:
+            import intel_extension_for_pytorch as ipex
+        except ImportError:
+            return
+        # Blocked oneDNN/TPP linears and fused attention. With --dtype auto, IPEX
+        # runs in bf16, its fast CPU path; an explicit --dtype (fp32 included)
+        # keeps the dtype the weights were loaded with. _model_generate
+        # autocasts to whichever it is
+        dtype = torch.bfloat16 if self.dtype == "auto" else self.model.dtype
+        self.model = ipex.llm.optimize(self.model, dtype=dtype, inplace=True)
+        logger.info(f"Applied Intel Extension for PyTorch ({threads} threads, {dtype}).")
+
+    def _load_model(self):
+        """Load the causal LM, applying the requested weight quantization."""
+        from transformers import AutoModelForCausalLM
+        if self.quantization == "int8" and self.device == "cpu":
+            # bitsandbytes int8 needs CUDA; on CPU the dynamic int8 Linear kernels are the equivalent
+            logger.info("int8 quantization on CPU: using int8_dynamic.")
+            self.quantization = "int8_dynamic"
+        if self.quantization in ("int8", "nf4"):
+            # bitsandbytes places the quantized weights itself, so no .to(device)
+            from transformers import BitsAndBytesConfig
+            if self.quantization == "int8":
+                # int8 weights + fp16 activations dequantize every step: smaller, but
+                # slower than fp16 at batch size 1 (prefer nf4 when memory is the issue)
+                quant_config = BitsAndBytesConfig(load_in_8bit=True)
+            else:
+                compute_dtype = (torch.bfloat16 if torch.cuda.is_available() and torch.cuda.is_bf16_supported()
+                                 else torch.float16)
+                # Double quantization also packs the per-block scales (~0.4 bit/param saved)
+                quant_config = BitsAndBytesConfig(load_in_4bit=True, bnb_4bit_quant_type="nf4",
+                                                  bnb_4bit_compute_dtype=compute_dtype,
+                                                  bnb_4bit_use_double_quant=True)
+            return AutoModelForCausalLM.from_pretrained(self.model_name, quantization_config=quant_config,
+                                                        device_map="auto")
+
+        load_kwargs = dict(torch_dtype=self._half_dtype(), low_cpu_mem_usage=True)
+        # With accelerate, weights are materialized straight into device buffers
+        # instead of a CPU copy that is then moved (int8_dynamic stays on CPU)
+        place_on_load = (self.quantization == "none" and self.device != "mps"
+                         and importlib.util.find_spec("accelerate") is not None)
+        if place_on_load:
+            load_kwargs["device_map"] = self.device
+        if self._use_flash_attention():
+            load_kwargs["attn_implementation"] = "flash_attention_2"
+        try:
+            model = AutoModelForCausalLM.from_pretrained(self.model_name, **load_kwargs)
+        except ValueError:
+            if "attn_implementation" not in load_kwargs:
+                raise
+            logger.info(f"{self.model_name} does not support FlashAttention-2, using SDPA.")
+            del load_kwargs["attn_implementation"]
+            model = AutoModelForCausalLM.from_pretrained(self.model_name, **load_kwargs)
+        model.eval()
+        if place_on_load:
+            return model
+        if self.quantization == "int8_dynamic":
+            # Dynamic int8 kernels are CPU-only
+            if self.device != "cpu":
+                logger.info("int8_dynamic quantization runs on CPU, switching device to cpu.")
+                self.device = "cpu"
+            # Quantize the Linear layers only; embeddings, LayerNorm and the tied lm_head stay FP32
+            qconfig_spec = {
+                name: torch.ao.quantization.default_dynamic_qconfig
+                for name, module in model.named_modules()
+                if isinstance(module, torch.nn.Linear) and name != "lm_head"
+            }
+            model = torch.ao.quantization.quantize_dynamic(model, qconfig_spec, dtype=torch.qint8)
+        model.to(self.device)
+        return model
+
+    def _use_flash_attention(self) -> bool:
+        """
+        Whether to load with FlashAttention-2 rather than transformers' default
+        SDPA attention: it needs CUDA, FP16/BF16 weights and the flash_attn
+        package. Compiled models keep SDPA, which traces with the static cache.
+        """
+        return (self.device == "cuda" and not COMPILE_MODEL and self._half_dtype() is not None
+                and importlib.util.find_spec("flash_attn") is not None)
+
+    def _half_dtype(self):
+        """Pick the reduced-precision dtype for the current device (None keeps FP32)."""
+        if self.quantization != "none":
+            return None
+        if self.dtype != "auto":
+            return {"fp32": None, "bf16": torch.bfloat16, "fp16": torch.float16}[self.dtype]
+        if self.device == "cuda":
+            return torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+        if self.device == "mps":
+            return torch.float16
+        return None
+
+    @torch.inference_mode()
+    def _model_generate(self, **kwargs):
+        """
+        Run model.generate under inference mode and autocast, retrying once in
+        FP32 on numerical failure. Every generate call goes through here, on
+        whichever thread runs it, so grad mode (which is per-thread) is set here.
+        Callers pass the full prompt ids, so a retry can prefill from scratch.
+        """
+        dtype = self.model.dtype
+        try:
+            with torch.autocast(device_type=self.device, dtype=dtype, enabled=dtype in (torch.float16, torch.bfloat16)):
+                return self.model.generate(**kwargs)
+        except RuntimeError as e:
+            # The compiled static-cache setup can't change dtype under its graphs
+            if dtype == torch.float32 or self.quantization != "none" or self._static_cache:
+                raise
+            logger.error(f"{dtype} generation failed ({e}), retrying in FP32...")
+            self.model.float()
+            # Every kept KV cache is in the old dtype, and the failed attempt has
+            # already appended part of this call to the one it was given
+            self.reset_cache()
+            self._system_kv_key, self._system_kv = None, None
+            self._static_kv = None
+            kwargs.pop("past_key_values", None)
+            return self.model.generate(**kwargs)
+
+    def _compile(self):
+        """Compile the forward pass with torch.compile and warm it up."""
+        if self.device == "mps" or not hasattr(torch, "compile"):
+            logger.info("torch.compile not available for this device/PyTorch, skipping.")
+            return
+        eager_forward = self.model.forward
+        if self.device == "cuda":
+            import torch._inductor.config as inductor_config
+            inductor_config.triton.cudagraphs = True
+            # A fixed-size KV cache keeps decode-step shapes constant, so the
+            # CUDA graphs captured by reduce-overhead are replayed every token
+            self._static_cache = getattr(self.model, "_can_compile_fullgraph",
+                                         getattr(self.model, "_supports_static_cache", False))
+        if self._static_cache:
+            # Allocated once and reset per call, so the graphs always see the same buffers
+            self._static_kv_len = min(self.max_context, DEFAULT_MAX_LENGTH)
+            self._static_kv = self._new_static_cache(self._static_kv_len)
+        # Static shapes let the whole forward compile as one graph; fall back to allowing breaks
+        for fullgraph in ((True, False) if self._static_cache else (False,)):
+            try:
+                # Compile forward rather than the module so HF generate() runs the compiled graph
+                self.model.forward = torch.compile(eager_forward, mode="reduce-overhead", fullgraph=fullgraph)
+                logger.info("Compiling model (first generation will be slow)...")
+                # Call generate directly: the public methods wait for loading, which isn't done yet
+                warmup_ids = self.tokenizer.encode("warmup")
+                self._model_generate(input_ids=self._as_input_ids(warmup_ids), **self._generation_kwargs(4),
+                                     **self._cache_kwargs(len(warmup_ids) + 4))
+                logger.info(f"Model compiled (fullgraph={fullgraph}).")
+                return
+            except Exception as e:
+                logger.error(f"torch.compile (fullgraph={fullgraph}) failed: {e}")
+        self.model.forward = eager_forward
+        self._static_cache = False
+        self._static_kv = None
+        logger.error("Using eager model.")
+
+    def _new_static_cache(self, max_cache_len: int):
+        from transformers import StaticCache
+        try:
+            return StaticCache(config=self.model.config, max_cache_len=max_cache_len)
+        except TypeError:
+            # Older transformers need the batch size, device and dtype up front
+            return StaticCache(config=self.model.config, max_batch_size=1, max_cache_len=max_cache_len,
+                               device=self.device, dtype=self.model.dtype)
+
+    def _generation_kwargs(self, max_new_tokens: int, temperature: float = None,
+                           top_p: float = None, top_k: int = None) -> dict:
+        """Sampling arguments for model.generate, using instance parameters unless overridden."""
+        temperature = temperature if temperature is not None else self.temperature
+        # Temperature 0 means greedy decoding: argmax, no per-step sort or sampling
+        do_sample = temperature > GREEDY_TEMPERATURE
+        kwargs = dict(
+            max_new_tokens=max_new_tokens,
+            do_sample=do_sample,
+            logits_processor=self._logits_processor(
+                temperature,
+                top_p if top_p is not None else self.top_p,
+                top_k if top_k is not None else self.top_k
+            ) if do_sample else self._logits_processor(1.0, 1.0, 0),
+            # Neutral values so generate doesn't build these processors again
+            repetition_penalty=1.0,
+            no_repeat_ngram_size=0,
+            pad_token_id=self.eos_id,
+            eos_token_id=self.eos_id
+        )
+        if do_sample:
+            # (greedy generate builds no warpers, and warns about sampling flags)
+            kwargs.update(top_k=0, top_p=1.0, temperature=1.0)
+        return kwargs
+
+    def _logits_processor(self, temperature: float, top_p: float, top_k: int) -> "LogitsProcessorList":
+        """
+        The sampling processors, in generate's own order, rebuilt only when a
+        parameter changes (they hold no per-call state, so reuse is safe).
+        """
+        sig = (self.repetition_penalty, temperature, top_p, top_k)
+        if sig != self._logits_processor_sig:
+            from transformers import LogitsProcessorList, TemperatureLogitsWarper, TopKLogitsWarper, TopPLogitsWarper
+            processors = LogitsProcessorList([RepetitionLogitsProcessor(self.repetition_penalty, 3)])
+            if temperature != 1.0:
+                processors.append(TemperatureLogitsWarper(temperature))
+            if top_k:
+                processors.append(TopKLogitsWarper(top_k))
+            if top_p < 1.0:
+                processors.append(TopPLogitsWarper(top_p))
+            self._logits_processors, self._logits_processor_sig = processors, sig
+        return self._logits_processors
+
+    def _to_device(self, rows: List[List[int]]) -> torch.Tensor:
+        """
+        A long tensor of rows on the model device. On CUDA it is built straight
+        in pinned memory (no pageable copy to pin first) and copied without
+        blocking the host; elsewhere it is built on the device directly.
+        """
+        if self.device == "cuda":
+            return torch.tensor(rows, dtype=torch.long, pin_memory=True).to(self.device, non_blocking=True)
+        return torch.tensor(rows, dtype=torch.long, device=self.device)
+
+    def _as_input_ids(self, ids: List[int]) -> torch.Tensor:
+        """A (1, len) id tensor for the model device, skipping BatchEncoding.to()."""
+        return self._to_device([ids])
+
+    def _cache_kwargs(self, total_len: Optional[int] = None) -> dict:
+        """
+        Cache arguments for stateless generate calls (session turns bring their
+        own cache). A single sequence of total_len tokens that fits reuses the
+        preallocated static cache; batches get a static cache from generate.
+        """
+        if not self._static_cache:
+            return {}
+        if total_len is not None and self._static_kv is not None and total_len <= self._static_kv_len:
+            # Its buffers were created under inference_mode, so clear them there too
+            with torch.inference_mode():
+                self._static_kv.reset()
+            return {"past_key_values": self._static_kv}
+        return {"cache_implementation": "static"}
 
-    @torch.no_grad()
     def generate(self, prompt: str, max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS, 
                 temperature: float = None, top_p: float = None, top_k: int = None) -> str:
+        # Nothing to generate: skip tokenization and the device round-trip entirely
+        if max_new_tokens == 0 or not prompt.strip():
+            return ""
         try:
-            # Use instance parameters if not overridden
-            temp = temperature if temperature is not None else self.temperature
-            tp = top_p if top_p is not None else self.top_p
-            tk = top_k if top_k is not None else self.top_k
-            
-            # Tokenize and move to device
-            inputs = self.tokenizer(prompt, return_tensors="pt").to(self.device)
+            self.wait_ready()
+            ids = self.tokenizer.encode(prompt)
+            # Tokenize straight into a device tensor
+            input_ids = self._as_input_ids(ids)
             
             # Generate
-            outputs = self.model.generate(
-                **inputs,
-                max_new_tokens=max_new_tokens,
-                do_sample=True,
-                top_k=tk,
-                top_p=tp,
-                temperature=temp,
-                repetition_penalty=self.repetition_penalty,
-                pad_token_id=self.tokenizer.eos_token_id,
-                eos_token_id=self.tokenizer.eos_token_id,
-                no_repeat_ngram_size=3
+            outputs = self._model_generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                **self._generation_kwargs(max_new_tokens, temperature, top_p, top_k),
+                **self._prompt_cache_kwargs(ids, max_new_tokens)
             )
+            self._keep_prefix(outputs)
             
             # decode only the newly generated tokens
-            gen_text = self.tokenizer.decode(outputs[0][inputs['input_ids'].shape[-1]:], skip_special_tokens=True)
+            gen_text = self.tokenizer.decode(outputs.sequences[0][len(ids):], skip_special_tokens=True)
             return gen_text.strip()
         except Exception as e:
-            print(f"[ERROR] Generation failed: {e}")
+            logger.error(f"Generation failed: {e}")
+            return "I'm sorry, I encountered an error while generating a response. Please try again."
+    
+    async def run_model(self, fn: Callable, *args, **kwargs):
+        """Await a blocking model call on the model thread, keeping the event loop free."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, functools.partial(fn, *args, **kwargs))
+    
+    async def agenerate(self, prompt: str, **kwargs) -> str:
+        """generate() for async callers such as the web handlers."""
+        return await self.run_model(self.generate, prompt, **kwargs)
+    
+    def _prompt_cache_kwargs(self, ids: List[int], max_new_tokens: int) -> dict:
+        """Cache arguments for generate()/generate_stream(): a reused prefix cache if possible."""
+        past_key_values = self._reuse_prefix(ids)
+        cache_kwargs = ({"past_key_values": past_key_values} if past_key_values is not None
+                        else self._cache_kwargs(len(ids) + max_new_tokens))
+        return dict(cache_kwargs, use_cache=True, return_dict_in_generate=True)
+    
+    def _keep_prefix(self, outputs):
+        """Remember a finished call's KV cache for _reuse_prefix."""
+        if not self._static_cache:
+            cache = outputs.past_key_values
+            self._prefix_ids = outputs.sequences[0, :cache.get_seq_length()].tolist()
+            self._prefix_cache = cache
+    
+    def _reuse_prefix(self, ids: List[int]):
+        """
+        Take the last generate() call's KV cache, cropped to the prefix it
+        shares with ids (e.g. the system prompt and earlier turns of a
+        get_context_prompt() prompt), or None if nothing is shared.
+        """
+        cache, cached_ids = self._prefix_cache, self._prefix_ids
+        self._prefix_ids, self._prefix_cache = [], None
+        if cache is None or self._static_cache:
+            return None
+        # Leave at least one prompt token to prefill
+        limit = min(len(cached_ids), len(ids) - 1)
+        n = 0
+        while n < limit and cached_ids[n] == ids[n]:
+            n += 1
+        if n == 0:
+            return None
+        extra = cache.get_seq_length() - n
+        if extra:
+            # A negative argument removes that many tokens (positive lengths are deprecated)
+            cache.crop(-extra)
+        return cache
+    
+    def generate_batch(self, prompts: List[str], max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS) -> List[str]:
+        """Generate replies for several prompts with a single padded generate call."""
+        if max_new_tokens == 0:
+            return [""] * len(prompts)
+        try:
+            self.wait_ready()
+            id_lists = [self.tokenizer.encode(prompt) for prompt in prompts]
+            return self._decode_replies(self._generate_padded(id_lists, max_new_tokens))
+        except Exception as e:
+            logger.error(f"Batched generation failed: {e}")
+            return ["I'm sorry, I encountered an error while generating a response. Please try again."] * len(prompts)
+    
+    def _generate_padded(self, id_lists: List[List[int]], max_new_tokens: int) -> List[List[int]]:
+        """Left-pad token id lists into one batch, generate, and return each row's new token ids."""
+        # Keep the most recent tokens of over-long prompts so every row fits the context
+        limit = self.max_context - max_new_tokens
+        id_lists = [ids[-limit:] for ids in id_lists]
+        width = max(len(ids) for ids in id_lists)
+        input_ids = self._to_device([[self.pad_id] * (width - len(ids)) + ids for ids in id_lists])
+        attention_mask = self._to_device([[0] * (width - len(ids)) + [1] * len(ids) for ids in id_lists])
+        
+        outputs = self._model_generate(
+            input_ids=input_ids,
+            attention_mask=attention_mask,
+            **self._generation_kwargs(max_new_tokens),
+            **self._cache_kwargs()
+        )
+        
+        # every row is padded to the same length, so new tokens start at the same index
+        return [self._trim_eos(row) for row in outputs[:, width:].tolist()]
+    
+    def _decode_replies(self, id_lists: List[List[int]]) -> List[str]:
+        """
+        Decode a batch's replies together. A fast tokenizer decodes them all in
+        one (parallel) Rust call instead of a Python-wrapped decode() per row.
+        """
+        if self.tokenizer.is_fast and not self.tokenizer.clean_up_tokenization_spaces:
+            texts = self.tokenizer.backend_tokenizer.decode_batch(id_lists, skip_special_tokens=True)
+        else:
+            texts = self.tokenizer.batch_decode(id_lists, skip_special_tokens=True)
+        return [text.strip() for text in texts]
+    
+    def _trim_eos(self, ids: List[int]) -> List[int]:
+        """Cut generated ids at the first EOS (generate pads finished rows with it)."""
+        if self.eos_id in ids:
+            return ids[:ids.index(self.eos_id)]
+        return ids
+    
+    def _encode_turn(self, user_input: str, reply: Optional[str] = None,
+                     user_ids: Optional[List[int]] = None) -> List[int]:
+        """
+        Ids of "\nUser: <user_input>\nAssistant:[ <reply>]" from the pre-encoded
+        scaffolding. user_ids, if given, is " <user_input>" already encoded.
+        """
+        if user_ids is None:
+            user_ids = self.tokenizer.encode(f" {user_input}", add_special_tokens=False)
+        ids = self._user_prefix_ids + user_ids + self._assistant_prefix_ids
+        if reply is not None:
+            ids += self.tokenizer.encode(f" {reply}", add_special_tokens=False)
+        return ids
+    
+    def _system_prompt_ids(self) -> List[int]:
+        """Encoded system prompt, re-encoded only when the prompt text changes."""
+        if self._system_ids_key != self.system_prompt:
+            self._system_ids = self.tokenizer.encode(f"{self.system_prompt}\n")
+            self._system_ids_key = self.system_prompt
+        return self._system_ids
+    
+    @torch.inference_mode()
+    def _system_prompt_cache(self):
+        """
+        A KV cache holding just the system prompt, prefilled once per prompt
+        text. Each caller gets a fresh DynamicCache seeded with a copy of the
+        prefilled key/value tensors, so turns never write into the shared one.
+        """
+        from transformers import DynamicCache
+        
+        if self._system_kv_key != self.system_prompt:
+            dtype = self.model.dtype
+            with torch.autocast(device_type=self.device, dtype=dtype, enabled=dtype in (torch.float16, torch.bfloat16)):
+                self._system_kv = self.model(self._as_input_ids(self._system_prompt_ids()), use_cache=True).past_key_values
+            self._system_kv_key = self.system_prompt
+        return DynamicCache(self._system_kv, config=self.model.config)
+    
+    def _session_cache(self, session: ChatSession):
+        """session's KV cache, seeded from _system_prompt_cache when it has none yet."""
+        if session.past_key_values is None and session.prefix_len:
+            session.past_key_values = self._system_prompt_cache()
+        return session.past_key_values
+    
+    def _history_turn_ids(self, turn: dict) -> List[int]:
+        """Encoded history turn, memoized while the turn is in conversation_history."""
+        key = (turn['user'], turn['bot'])
+        ids = self._history_ids.get(key)
+        if ids is None:
+            ids = self._history_ids[key] = self._encode_turn(turn['user'], turn['bot'])
+        return ids
+    
+    def get_context_ids(self, current_input: str) -> List[int]:
+        """
+        Token-level get_context_prompt: system prompt, last 3 turns and the new
+        user message, built from cached encodings so only current_input is tokenized.
+        """
+        self.wait_ready()
+        ids = list(self._system_prompt_ids())
+        for turn in last_turns(self.conversation_history, 3):
+            ids += self._history_turn_ids(turn)
+        return ids + self._encode_turn(current_input)
+    
+    def _turn_ids(self, session: ChatSession, user_input: str, max_new_tokens: int, history: list,
+                  user_ids: Optional[List[int]] = None) -> List[int]:
+        """Token ids for the next turn: the session so far plus the new user message."""
+        self.wait_ready()
+        if not session.input_ids or session.system_prompt != self.system_prompt:
+            # Start from the system prompt plus recent history, as get_context_prompt does
+            session.reset()
+            session.system_prompt = self.system_prompt
+            session.input_ids = list(self._system_prompt_ids())
+            session.prefix_len = len(session.input_ids)
+            for turn in last_turns(history, 3):
+                turn_ids = self._history_turn_ids(turn)
+                session.input_ids += turn_ids
+                session.turn_lengths.append(len(turn_ids))
+        
+        new_ids = self._encode_turn(user_input, user_ids=user_ids)
+        limit = self.max_context - max_new_tokens
+        if len(session.input_ids) + len(new_ids) > limit:
+            # Evicting invalidates the KV cache, so free room for the next few
+            # turns too rather than re-prefilling the whole context every turn
+            target = int(limit * EVICT_TO_FRACTION)
+            while len(session.input_ids) + len(new_ids) > target and session.turn_lengths:
+                session.evict_oldest_turn()
+        ids = session.input_ids + new_ids
+        if len(ids) > limit:
+            # Still too long after evicting every turn: keep the tail and restart
+            # the session from it
+            ids = ids[-limit:]
+            session.input_ids = []
+            session.prefix_len = 0
+            session.past_key_values = None
+        return ids
+    
+    @staticmethod
+    def _reply_key(ids: List[int], max_new_tokens: int) -> bytes:
+        # The length limit is part of the key: a short call's reply may be cut off
+        return hashlib.blake2b(array("q", [max_new_tokens] + ids).tobytes(), digest_size=16).digest()
+    
+    def _reply_cache_for_settings(self) -> Optional[OrderedDict]:
+        """
+        The reply cache, or None while sampling: a remembered sample would be
+        replayed for every repeat of the turn instead of a fresh one. Emptied
+        whenever a generation setting changes, as its replies used the old ones.
+        """
+        sig = (self.temperature, self.top_p, self.top_k, self.repetition_penalty)
+        if sig != self._reply_cache_sig:
+            self._reply_cache.clear()
+            self._reply_cache_sig = sig
+        if self.temperature > GREEDY_TEMPERATURE:
+            return None
+        return self._reply_cache
+    
+    def _remember_reply(self, ids: List[int], max_new_tokens: int, reply_ids: List[int], reply: str):
+        cache = self._reply_cache_for_settings()
+        if cache is None:
+            return
+        cache[self._reply_key(ids, max_new_tokens)] = (reply_ids, reply)
+        while len(cache) > REPLY_CACHE_SIZE:
+            cache.popitem(last=False)
+    
+    def _cached_turn(self, session: ChatSession, ids: List[int], max_new_tokens: int) -> Optional[str]:
+        """
+        Return the reply previously generated (greedily, with the current
+        settings) for exactly these turn ids (the conversation state plus the
+        new message), advancing the session as if it had been generated, or
+        None. Only called on the thread doing model work, which is also the
+        one that fills the cache.
+        """
+        cache = self._reply_cache_for_settings()
+        if cache is None:
+            return None
+        key = self._reply_key(ids, max_new_tokens)
+        hit = cache.get(key)
+        if hit is None:
+            return None
+        cache.move_to_end(key)
+        reply_ids, reply = hit
+        # The KV cache still covers a prefix of the new ids; generate prefills the rest next turn
+        session.add_turn(ids, reply_ids)
+        return reply
+    
+    def chat(self, user_input: str, session: Optional[ChatSession] = None,
+             max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS) -> str:
+        """
+        Generate a reply to user_input within a session, reusing the session's
+        KV cache so only the new tokens are prefilled. Defaults to the wrapper's
+        own session, which is seeded from conversation_history. A turn seen
+        before is answered from the reply cache.
+        """
+        if max_new_tokens == 0 or not user_input.strip():
+            return ""
+        if session is None:
+            session, history = self.session, self.conversation_history
+        else:
+            history = []
+        try:
+            ids = self._turn_ids(session, user_input, max_new_tokens, history)
+            cached = self._cached_turn(session, ids, max_new_tokens)
+            if cached is not None:
+                return cached
+            input_ids = self._as_input_ids(ids)
+            
+            outputs = self._model_generate(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=self._session_cache(session),
+                use_cache=True,
+                return_dict_in_generate=True,
+                **self._generation_kwargs(max_new_tokens)
+            )
+            
+            reply_ids = self._trim_eos(outputs.sequences[0, len(ids):].tolist())
+            session.add_turn(ids, reply_ids)
+            session.past_key_values = outputs.past_key_values
+            reply = self.tokenizer.decode(reply_ids, skip_special_tokens=True).strip()
+            self._remember_reply(ids, max_new_tokens, reply_ids, reply)
+            return reply
+        except Exception as e:
+            logger.error(f"Generation failed: {e}")
+            session.reset()
             return "I'm sorry, I encountered an error while generating a response. Please try again."
     
+    def chat_batch(self, sessions: List[ChatSession], user_inputs: List[str],
+                   max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS) -> List[str]:
+        """
+        Reply to several sessions at once. A single session takes the KV-cache
+        path; several are batched without caches, which are then rebuilt on the
+        session's next solo turn.
+        """
+        if max_new_tokens == 0:
+            return [""] * len(sessions)
+        if len(sessions) == 1:
+            return [self.chat(user_inputs[0], sessions[0], max_new_tokens)]
+        try:
+            # All the new messages in one call, which the Rust tokenizer encodes in parallel
+            user_id_lists = self.tokenizer([f" {text}" for text in user_inputs], add_special_tokens=False)["input_ids"]
+            id_lists = [self._turn_ids(session, user_input, max_new_tokens, [], user_ids)
+                        for session, user_input, user_ids in zip(sessions, user_inputs, user_id_lists)]
+            # Turns seen before are answered from the reply cache; only the rest are generated
+            replies = [self._cached_turn(session, ids, max_new_tokens) for session, ids in zip(sessions, id_lists)]
+            misses = [i for i, reply in enumerate(replies) if reply is None]
+            if misses:
+                reply_id_lists = self._generate_padded([id_lists[i] for i in misses], max_new_tokens)
+                for i, reply_ids, reply in zip(misses, reply_id_lists, self._decode_replies(reply_id_lists)):
+                    session, ids = sessions[i], id_lists[i]
+                    session.add_turn(ids, reply_ids)
+                    session.past_key_values = None
+                    self._remember_reply(ids, max_new_tokens, reply_ids, reply)
+                    replies[i] = reply
+            return replies
+        except Exception as e:
+            logger.error(f"Batched generation failed: {e}")
+            for session in sessions:
+                session.reset()
+            return ["I'm sorry, I encountered an error while generating a response. Please try again."] * len(sessions)
+    
+    def _generate_streaming(self, **kwargs):
+        """
+        Run generate in a worker thread and yield decoded text as tokens are
+        produced. The generate output is the generator's return value.
+        Closing the generator early stops generation after the current token.
+        """
+        from transformers import StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True)
+        stop = threading.Event()
+        result = {}
+        
+        class StopWhenClosed(StoppingCriteria):
+            def __call__(self, input_ids, scores, **kwargs):
+                return torch.full((input_ids.shape[0],), stop.is_set(), dtype=torch.bool, device=input_ids.device)
+        
+        kwargs["stopping_criteria"] = StoppingCriteriaList([StopWhenClosed()])
+        
+        def run():
+            try:
+                result["outputs"] = self._model_generate(streamer=streamer, **kwargs)
+            except Exception as e:
+                result["error"] = e
+                # Unblock the consumer, generate won't end the stream itself
+                streamer.end()
+        
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            yield from streamer
+        finally:
+            # On close (consumer gone) don't leave generate running on the model
+            stop.set()
+            thread.join()
+        if "error" in result:
+            raise result["error"]
+        return result["outputs"]
+    
     def generate_stream(self, prompt: str, max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS,
-                       temperature: float = None, top_p: float = None, top_k: int = None):
+                       temperature: float = None, top_p: float = None, top_k: int = None) -> Iterator[str]:
         """Generate text with streaming output."""
+        if max_new_tokens == 0 or not prompt.strip():
+            return
         try:
-            # Use instance parameters if not overridden
-            temp = temperature if temperature is not None else self.temperature
-            tp = top_p if top_p is not None else self.top_p
-            tk = top_k if top_k is not None else self.top_k
-            
-            # Tokenize and move to device
-            inputs = self.tokenizer(prompt, return_tensors="pt").to(self.device)
+            self.wait_ready()
+            ids = self.tokenizer.encode(prompt)
+            input_ids = self._as_input_ids(ids)
+            outputs = yield from self._generate_streaming(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                **self._generation_kwargs(max_new_tokens, temperature, top_p, top_k),
+                **self._prompt_cache_kwargs(ids, max_new_tokens)
+            )
+            self._keep_prefix(outputs)
+        except Exception as e:
+            logger.error(f"Streaming generation failed: {e}")
+            yield "I'm sorry, I encountered an error while generating a response. Please try again."
+    
+    def chat_stream(self, user_input: str, session: Optional[ChatSession] = None,
+                    max_new_tokens: int = DEFAULT_MAX_NEW_TOKENS) -> Iterator[str]:
+        """Like chat(), but yields the reply text as it is generated."""
+        if max_new_tokens == 0 or not user_input.strip():
+            return
+        if session is None:
+            session, history = self.session, self.conversation_history
+        else:
+            history = []
+        try:
+            ids = self._turn_ids(session, user_input, max_new_tokens, history)
+            cached = self._cached_turn(session, ids, max_new_tokens)
+            if cached is not None:
+                yield cached
+                return
+            input_ids = self._as_input_ids(ids)
             
-            # Generate with streaming
-            generated_tokens = []
-            for outputs in self.model.generate(
-                **inputs,
-                max_new_tokens=max_new_tokens,
-                do_sample=True,
-                top_k=tk,
-                top_p=tp,
-                temperature=temp,
-                repetition_penalty=self.repetition_penalty,
-                pad_token_id=self.tokenizer.eos_token_id,
-                eos_token_id=self.tokenizer.eos_token_id,
-                no_repeat_ngram_size=3,
+            outputs = yield from self._generate_streaming(
+                input_ids=input_ids,
+                attention_mask=torch.ones_like(input_ids),
+                past_key_values=self._session_cache(session),
+                use_cache=True,
                 return_dict_in_generate=True,
-                output_scores=False,
-                streaming=True
-            ):
-                if outputs.logits is not None:
-                    next_token = outputs.logits.argmax(dim=-1)[-1].unsqueeze(0)
-                    generated_tokens.append(next_token)
-                    
-                    # Decode and yield the new token
-                    new_text = self.tokenizer.decode(next_token, skip_special_tokens=True)
-                    if new_text.strip():
-                        yield new_text
-                        
+                **self._generation_kwargs(max_new_tokens)
+            )
+            
+            reply_ids = self._trim_eos(outputs.sequences[0, len(ids):].tolist())
+            session.add_turn(ids, reply_ids)
+            session.past_key_values = outputs.past_key_values
+            self._remember_reply(ids, max_new_tokens, reply_ids, self.tokenizer.decode(reply_ids, skip_special_tokens=True).strip())
+        except GeneratorExit:
+            # Abandoned mid-reply: the cache holds a partial turn
+            session.reset()
+            raise
         except Exception as e:
-            print(f"[ERROR] Streaming generation failed: {e}")
+            logger.error(f"Streaming generation failed: {e}")
+            session.reset()
             yield "I'm sorry, I encountered an error while generating a response. Please try again."
     
     def add_to_history(self, user_input: str, bot_response: str):
         """Add conversation turn to history."""
-        self.conversation_history.append({"user": user_input, "bot": bot_response})
-        if len(self.conversation_history) > self.max_history_length:
-            self.conversation_history.pop(0)
+        history = self.conversation_history
+        if len(history) == history.maxlen:
+            # The deque drops the oldest turn on append; forget its encoding too
+            old = history[0]
+            self._history_ids.pop((old['user'], old['bot']), None)
+            self._add_to_totals(old, -1)
+        turn = {"user": user_input, "bot": bot_response}
+        if self.tokenizer is not None:
+            self.turn_token_counts(turn)
+        history.append(turn)
+        self._add_to_totals(turn, 1)
+        if self.history_log is not None:
+            self.history_log.write(_json_line(turn))
+            self.history_log.flush()
+    
+    def _add_to_totals(self, turn: dict, sign: int):
+        """Add (sign=1) or remove (sign=-1) a turn from the running totals."""
+        self._total_user_chars += sign * len(turn['user'])
+        self._total_bot_chars += sign * len(turn['bot'])
+        if self._total_tokens is not None and self.tokenizer is not None:
+            user_tokens, bot_tokens = self.turn_token_counts(turn)
+            self._total_tokens = (self._total_tokens[0] + sign * user_tokens,
+                                  self._total_tokens[1] + sign * bot_tokens)
+        else:
+            self._total_tokens = None
+    
+    def set_history(self, history: list):
+        """Replace the conversation history, e.g. with one loaded from a file."""
+        self.conversation_history = deque(history, maxlen=self.max_history_length)
+        self._history_ids.clear()
+        self.reset_cache()
+        self._total_user_chars = self._total_bot_chars = 0
+        for turn in self.conversation_history:
+            self._total_user_chars += len(turn['user'])
+            self._total_bot_chars += len(turn['bot'])
+        # Token totals are counted on first use (older files carry no counts)
+        self._total_tokens = None if self.conversation_history else (0, 0)
+    
+    def turn_token_counts(self, turn: dict) -> tuple:
+        """(user, bot) token counts of a history turn, counted once and stored on the turn."""
+        if 'user_tokens' not in turn:
+            # Turns loaded from older history files don't carry counts yet
+            turn['user_tokens'] = len(self.tokenizer.encode(turn['user']))
+            turn['bot_tokens'] = len(self.tokenizer.encode(turn['bot']))
+        return turn['user_tokens'], turn['bot_tokens']
     
     def get_context_prompt(self, current_input: str) -> str:
         """Build context-aware prompt from conversation history."""
-        if not self.conversation_history:
-            return f"{self.system_prompt}\n\nUser: {current_input}\nAssistant:"
-        
-        context = f"{self.system_prompt}\n\n"
-        for turn in self.conversation_history[-3:]:  # Last 3 turns for context
-            context += f"User: {turn['user']}\nAssistant: {turn['bot']}\n"
-        context += f"User: {current_input}\nAssistant:"
-        return context
+        # Collected as fragments and joined once, not grown by repeated +=
+        parts = [self.system_prompt, "\n\n"]
+        for turn in last_turns(self.conversation_history, 3):  # Last 3 turns for context
+            parts += ("User: ", turn['user'], "\nAssistant: ", turn['bot'], "\n")
+        parts += ("User: ", current_input, "\nAssistant:")
+        return "".join(parts)
     
     def clear_history(self):
         """Clear conversation history."""
-        self.conversation_history.clear()
+        self.set_history([])
     
     def switch_model(self, new_model_name: str):
         """Switch to a different model."""
-        print(f"[INFO] Switching from {self.model_name} to {new_model_name}...")
+        logger.info(f"Switching from {self.model_name} to {new_model_name}...")
         self.model_name = new_model_name
         self.clear_history()
         self._load()
-        print(f"[INFO] Switched to {new_model_name}")
+        logger.info(f"Switched to {new_model_name}")
     
     def get_stats(self) -> dict:
         """Get conversation statistics."""
-        if not self.conversation_history:
+        turns = len(self.conversation_history)
+        if not turns:
             return {"total_turns": 0, "total_user_chars": 0, "total_bot_chars": 0}
         
-        total_user_chars = sum(len(turn['user']) for turn in self.conversation_history)
-        total_bot_chars = sum(len(turn['bot']) for turn in self.conversation_history)
-        
         return {
-            "total_turns": len(self.conversation_history),
-            "total_user_chars": total_user_chars,
-            "total_bot_chars": total_bot_chars,
-            "avg_user_length": total_user_chars / len(self.conversation_history),
-            "avg_bot_length": total_bot_chars / len(self.conversation_history)
+            "total_turns": turns,
+            "total_user_chars": self._total_user_chars,
+            "total_bot_chars": self._total_bot_chars,
+            "avg_user_length": self._total_user_chars / turns,
+            "avg_bot_length": self._total_bot_chars / turns
         }
+    
+    def token_totals(self) -> tuple:
+        """(user, bot) token totals over the conversation history."""
+        if self._total_tokens is None:
+            missing = [turn for turn in self.conversation_history if 'user_tokens' not in turn]
+            if missing:
+                # Count a loaded history in one batched call, which a fast
+                # tokenizer encodes in Rust (and in parallel) instead of turn by turn
+                texts = [turn['user'] for turn in missing] + [turn['bot'] for turn in missing]
+                lengths = self.tokenizer(texts, return_length=True)['length']
+                for turn, user_tokens, bot_tokens in zip(missing, lengths, lengths[len(missing):]):
+                    turn['user_tokens'], turn['bot_tokens'] = user_tokens, bot_tokens
+            user_total = bot_total = 0
+            for turn in self.conversation_history:
+                user_tokens, bot_tokens = self.turn_token_counts(turn)
+                user_total += user_tokens
+                bot_total += bot_tokens
+            self._total_tokens = (user_total, bot_total)
+        return self._total_tokens
 
 # ---------------------------
 # CLI Chat
 # ---------------------------
-def run_cli(model_wrapper: ModelWrapper):
-    print("MiniChat CLI — type 'exit' or Ctrl-C to quit.")
-    print(f"Using model: {model_wrapper.model_name} on {model_wrapper.device}")
-    print(f"Temperature: {model_wrapper.temperature}, Top-p: {model_wrapper.top_p}, Top-k: {model_wrapper.top_k}")
-    print("Commands: 'help', 'clear', 'history', 'settings', 'exit'")
-    
+_HELP_TEXT = (
+    "Commands:\n"
+    "  help      - Show this help\n"
+    "  clear     - Clear chat history\n"
+    "  history   - Show conversation history\n"
+    "  settings  - Show current model settings\n"
+    "  prompt X  - Change system prompt (X = general/creative/coding/professional/casual)\n"
+    "  export X  - Export conversation (X = txt/md/json)\n"
+    "  model X   - Switch to different model (X = model name)\n"
+    "  models    - Show available model presets\n"
+    "  temp X    - Set temperature (X = 0.1 to 2.0, 0 = greedy)\n"
+    "  topp X    - Set top-p (X = 0.1 to 1.0)\n"
+    "  topk X    - Set top-k (X = 1 to 100)\n"
+    "  save X    - Save conversation to file X\n"
+    "  load X    - Load conversation from file X\n"
+    "  info      - Show system information\n"
+    "  context   - Show current conversation context\n"
+    "  reset     - Reload the current model\n"
+    "  tokens    - Show tokenizer information\n"
+    "  memory    - Show memory usage\n"
+    "  pwd       - Show current working directory\n"
+    "  time      - Show current time and date\n"
+    "  params    - Show current generation parameters\n"
+    "  model-info - Show model architecture information\n"
+    "  performance - Show performance metrics\n"
+    "  license   - Show model license information\n"
+    "  training  - Show training information\n"
+    "  evaluation - Show evaluation metrics\n"
+    "  usage     - Show usage statistics\n"
+    "  version   - Show version information\n"
+    "  config    - Show model configuration\n"
+    "  capabilities - Show model capabilities\n"
+    "  safety    - Show safety information\n"
+    "  environment - Show environment information\n"
+    "  token-usage - Show token usage statistics\n"
+    "  generation - Show generation history\n"
+    "  system    - Show detailed system information\n"
+    "  network   - Show network information\n"
+    "  disk      - Show disk usage information\n"
+    "  process   - Show process information\n"
+    "  cache     - Show model cache information\n"
+    "  deps      - Show dependencies information\n"
+    "  security  - Show security information\n"
+    "  tokenizer - Show tokenizer information\n"
+    "  help-cat  - Show help by category\n"
+    "  debug     - Show debugging information\n"
+    "  status    - Show system status\n"
+    "  config-detail - Show detailed configuration\n"
+    "  capabilities-detail - Show detailed capabilities\n"
+    "  safety-detail - Show detailed safety information\n"
+    "  performance-detail - Show detailed performance metrics\n"
+    "  memory-detail - Show detailed memory information\n"
+    "  network-detail - Show detailed network information\n"
+    "  disk-detail - Show detailed disk information\n"
+    "  process-detail - Show detailed process information\n"
+    "  cache-detail - Show detailed cache information\n"
+    "  deps-detail - Show detailed dependencies information\n"
+    "  system-overview - Show comprehensive system overview\n"
+    "  stats     - Show conversation statistics\n"
+    "  exit      - Exit the program\n"
+)
+
+def cmd_clear(model_wrapper: ModelWrapper):
+    """Clear chat history."""
+    model_wrapper.clear_history()
+    print("Chat history cleared.")
+
+def cmd_history(model_wrapper: ModelWrapper):
+    """Show conversation history."""
+    if model_wrapper.conversation_history:
+        print("Recent conversation:")
+        for i, turn in enumerate(last_turns(model_wrapper.conversation_history, 5), 1):
+            print(f"  {i}. You: {turn['user']}")
+            print(f"     Bot: {turn['bot']}")
+    else:
+        print("No conversation history.")
+
+def cmd_settings(model_wrapper: ModelWrapper):
+    """Show current model settings."""
+    print(f"Model: {model_wrapper.model_name}")
+    print(f"Device: {model_wrapper.device}")
+    print(f"Temperature: {model_wrapper.temperature}")
+    print(f"Top-p: {model_wrapper.top_p}")
+    print(f"Top-k: {model_wrapper.top_k}")
+    print(f"Repetition penalty: {model_wrapper.repetition_penalty}")
+    print(f"System prompt: {model_wrapper.system_prompt}")
+
+def cmd_prompt(model_wrapper: ModelWrapper, arg: str):
+    """Change system prompt (X = general/creative/coding/professional/casual)."""
+    prompt_type = arg.lower()
+    if prompt_type in ["general", "creative", "coding", "professional", "casual"]:
+        model_wrapper.system_prompt = create_system_prompt(prompt_type)
+        print(f"System prompt changed to: {prompt_type}")
+    else:
+        print("Available prompt types: general, creative, coding, professional, casual")
+
+def cmd_export(model_wrapper: ModelWrapper, arg: str):
+    """Export conversation (X = txt/md/json)."""
+    if not model_wrapper.conversation_history:
+        print("No conversation to export.")
+        return
+    format_type = arg.lower()
+    if format_type in ["txt", "md", "json"]:
+        filename = export_conversation(model_wrapper.conversation_history, format_type)
+        if filename:
+            print(f"Conversation exported to: {filename}")
+    else:
+        print("Available export formats: txt, md, json")
+
+def cmd_model(model_wrapper: ModelWrapper, arg: str):
+    """Switch to different model (X = model name)."""
+    if not arg:
+        print("Usage: model <model name>")
+        return
     try:
-        while True:
-            user = input("\nYou: ").strip()
-            if user.lower() in ("exit", "quit"):
-                print("Goodbye.")
-                break
-            if not user:
-                continue
-            if user.lower() == "help":
-                print("Commands:")
-                print("  help      - Show this help")
-                print("  clear     - Clear chat history")
-                print("  history   - Show conversation history")
-                print("  settings  - Show current model settings")
-                print("  prompt X  - Change system prompt (X = general/creative/coding/professional/casual)")
-                print("  export X  - Export conversation (X = txt/md/json)")
-                print("  model X   - Switch to different model (X = model name)")
-                print("  models    - Show available model presets")
-                print("  temp X    - Set temperature (X = 0.1 to 2.0)")
-                print("  topp X    - Set top-p (X = 0.1 to 1.0)")
-                print("  topk X    - Set top-k (X = 1 to 100)")
-                print("  save X    - Save conversation to file X")
-                print("  load X    - Load conversation from file X")
-                print("  info      - Show system information")
-                print("  context   - Show current conversation context")
-                print("  reset     - Reload the current model")
-                print("  tokens    - Show tokenizer information")
-                print("  memory    - Show memory usage")
-                print("  pwd       - Show current working directory")
-                print("  time      - Show current time and date")
-                print("  params    - Show current generation parameters")
-                print("  model-info - Show model architecture information")
-                print("  performance - Show performance metrics")
-                print("  license   - Show model license information")
-                print("  training  - Show training information")
-                print("  evaluation - Show evaluation metrics")
-                print("  usage     - Show usage statistics")
-                print("  version   - Show version information")
-                print("  config    - Show model configuration")
-                print("  capabilities - Show model capabilities")
-                print("  safety    - Show safety information")
-                print("  environment - Show environment information")
-                print("  token-usage - Show token usage statistics")
-                print("  generation - Show generation history")
-                print("  system    - Show detailed system information")
-                print("  network   - Show network information")
-                print("  disk      - Show disk usage information")
-                print("  process   - Show process information")
-                print("  cache     - Show model cache information")
-                print("  deps      - Show dependencies information")
-                print("  memory    - Show memory information")
-                print("  performance - Show performance metrics")
-                print("  security  - Show security information")
-                print("  model-info - Show detailed model information")
-                print("  tokenizer - Show tokenizer information")
-                print("  params    - Show generation parameters")
-                print("  history   - Show conversation history")
-                print("  help-cat  - Show help by category")
-                print("  evaluation - Show evaluation metrics")
-                print("  debug     - Show debugging information")
-                print("  status    - Show system status")
-                print("  config-detail - Show detailed configuration")
-                print("  capabilities-detail - Show detailed capabilities")
-                print("  safety-detail - Show detailed safety information")
-                print("  performance-detail - Show detailed performance metrics")
-                print("  memory-detail - Show detailed memory information")
-                print("  network-detail - Show detailed network information")
-                print("  disk-detail - Show detailed disk information")
-                print("  process-detail - Show detailed process information")
-                print("  cache-detail - Show detailed cache information")
-                print("  deps-detail - Show detailed dependencies information")
-                print("  system-overview - Show comprehensive system overview")
-                print("  stats     - Show conversation statistics")
-                print("  exit      - Exit the program")
-                continue
-            if user.lower() == "clear":
-                model_wrapper.clear_history()
-                print("Chat history cleared.")
-                continue
-            if user.lower() == "history":
-                if model_wrapper.conversation_history:
-                    print("Recent conversation:")
-                    for i, turn in enumerate(model_wrapper.conversation_history[-5:], 1):
-                        print(f"  {i}. You: {turn['user']}")
-                        print(f"     Bot: {turn['bot']}")
-                else:
-                    print("No conversation history.")
-                continue
-            if user.lower() == "settings":
-                print(f"Model: {model_wrapper.model_name}")
-                print(f"Device: {model_wrapper.device}")
-                print(f"Temperature: {model_wrapper.temperature}")
-                print(f"Top-p: {model_wrapper.top_p}")
-                print(f"Top-k: {model_wrapper.top_k}")
-                print(f"Repetition penalty: {model_wrapper.repetition_penalty}")
-                print(f"System prompt: {model_wrapper.system_prompt}")
-                continue
-            if user.lower().startswith("prompt "):
-                prompt_type = user.lower().split(" ", 1)[1]
-                if prompt_type in ["general", "creative", "coding", "professional", "casual"]:
-                    model_wrapper.system_prompt = create_system_prompt(prompt_type)
-                    print(f"System prompt changed to: {prompt_type}")
-                else:
-                    print("Available prompt types: general, creative, coding, professional, casual")
-                continue
-            if user.lower().startswith("export "):
-                if not model_wrapper.conversation_history:
-                    print("No conversation to export.")
-                    continue
-                format_type = user.lower().split(" ", 1)[1]
-                if format_type in ["txt", "md", "json"]:
-                    filename = export_conversation(model_wrapper.conversation_history, format_type)
-                    if filename:
-                        print(f"Conversation exported to: {filename}")
-                else:
-                    print("Available export formats: txt, md, json")
-                continue
-            if user.lower().startswith("model "):
-                new_model = user.split(" ", 1)[1]
-                try:
-                    model_wrapper.switch_model(new_model)
-                except Exception as e:
-                    print(f"Failed to switch model: {e}")
-                continue
-            if user.lower() == "stats":
-                stats = model_wrapper.get_stats()
-                print("Conversation Statistics:")
-                print(f"  Total turns: {stats['total_turns']}")
-                if stats['total_turns'] > 0:
-                    print(f"  Average user message length: {stats['avg_user_length']:.1f} characters")
-                    print(f"  Average bot response length: {stats['avg_bot_length']:.1f} characters")
-                    print(f"  Total user characters: {stats['total_user_chars']}")
-                    print(f"  Total bot characters: {stats['total_bot_chars']}")
-                continue
-            if user.lower() == "models":
-                print("Available Model Presets:")
-                for preset, model_name in MODEL_PRESETS.items():
-                    print(f"  {preset:12} - {model_name}")
-                print(f"\\nCurrent model: {model_wrapper.model_name}")
-                continue
-            if user.lower().startswith("temp "):
-                try:
-                    temp = float(user.split(" ", 1)[1])
-                    if 0.1 <= temp <= 2.0:
-                        model_wrapper.temperature = temp
-                        print(f"Temperature set to {temp}")
-                    else:
-                        print("Temperature must be between 0.1 and 2.0")
-                except ValueError:
-                    print("Invalid temperature value. Use: temp 0.8")
-                continue
-            if user.lower().startswith("topp "):
-                try:
-                    topp = float(user.split(" ", 1)[1])
-                    if 0.1 <= topp <= 1.0:
-                        model_wrapper.top_p = topp
-                        print(f"Top-p set to {topp}")
-                    else:
-                        print("Top-p must be between 0.1 and 1.0")
-                except ValueError:
-                    print("Invalid top-p value. Use: topp 0.9")
-                continue
-            if user.lower().startswith("topk "):
-                try:
-                    topk = int(user.split(" ", 1)[1])
-                    if 1 <= topk <= 100:
-                        model_wrapper.top_k = topk
-                        print(f"Top-k set to {topk}")
-                    else:
-                        print("Top-k must be between 1 and 100")
-                except ValueError:
-                    print("Invalid top-k value. Use: topk 50")
-                continue
-            if user.lower().startswith("save "):
-                filename = user.split(" ", 1)[1]
-                if save_conversation_history(model_wrapper.conversation_history, filename):
-                    print(f"Conversation saved to {filename}")
-                else:
-                    print("Failed to save conversation")
-                continue
-            if user.lower().startswith("load "):
-                filename = user.split(" ", 1)[1]
-                history = load_conversation_history(filename)
-                if history:
-                    model_wrapper.conversation_history = history
-                    print(f"Conversation loaded from {filename}")
-                else:
-                    print("Failed to load conversation")
-                continue
-            if user.lower() == "info":
-                print("System Information:")
-                print(f"  Python version: {platform.python_version()}")
-                print(f"  PyTorch version: {torch.__version__}")
-                print(f"  CUDA available: {torch.cuda.is_available()}")
-                if torch.cuda.is_available():
-                    print(f"  CUDA version: {torch.version.cuda}")
-                    print(f"  GPU device: {torch.cuda.get_device_name()}")
-                print(f"  Device: {model_wrapper.device}")
-                print(f"  Model: {model_wrapper.model_name}")
-                continue
-            if user.lower() == "context":
-                print("Current Conversation Context:")
-                print(f"  System prompt: {model_wrapper.system_prompt[:100]}...")
-                if model_wrapper.conversation_history:
-                    print(f"  History length: {len(model_wrapper.conversation_history)} turns")
-                    print("  Recent context:")
-                    for i, turn in enumerate(model_wrapper.conversation_history[-3:], 1):
-                        print(f"    {i}. User: {turn['user'][:50]}...")
-                        print(f"       Bot: {turn['bot'][:50]}...")
-                else:
-                    print("  No conversation history")
-                continue
-            if user.lower() == "reset":
-                print("Reloading model...")
-                model_wrapper._load()
-                print("Model reloaded successfully.")
-                continue
-            if user.lower() == "tokens":
-                print("Tokenizer Information:")
-                print(f"  Vocabulary size: {model_wrapper.tokenizer.vocab_size}")
-                print(f"  Pad token: {model_wrapper.tokenizer.pad_token}")
-                print(f"  EOS token: {model_wrapper.tokenizer.eos_token}")
-                print(f"  BOS token: {model_wrapper.tokenizer.bos_token}")
-                print(f"  UNK token: {model_wrapper.tokenizer.unk_token}")
-                print(f"  Model max length: {model_wrapper.tokenizer.model_max_length}")
-                continue
-            if user.lower() == "memory":
-                print("Memory Usage:")
-                if torch.cuda.is_available():
-                    print(f"  GPU memory allocated: {torch.cuda.memory_allocated() / 1024**3:.2f} GB")
-                    print(f"  GPU memory cached: {torch.cuda.memory_reserved() / 1024**3:.2f} GB")
-                    print(f"  GPU memory total: {torch.cuda.get_device_properties(0).total_memory / 1024**3:.2f} GB")
-                else:
-                    print("  GPU not available")
-                continue
-            if user.lower() == "pwd":
-                print("Current Working Directory:")
-                print(f"  Path: {os.getcwd()}")
-                print(f"  Files: {len([f for f in os.listdir('.') if os.path.isfile(f)])} files")
-                print(f"  Directories: {len([d for d in os.listdir('.') if os.path.isdir(d)])} directories")
-                continue
-            if user.lower() == "time":
-                from datetime import datetime
-                now = datetime.now()
-                print("Current Time and Date:")
-                print(f"  Date: {now.strftime('%Y-%m-%d')}")
-                print(f"  Time: {now.strftime('%H:%M:%S')}")
-                print(f"  Timezone: {now.strftime('%Z')}")
-                print(f"  Timestamp: {now.timestamp():.0f}")
-                continue
-            if user.lower() == "params":
-                print("Current Generation Parameters:")
-                print(f"  Temperature: {model_wrapper.temperature}")
-                print(f"  Top-p: {model_wrapper.top_p}")
-                print(f"  Top-k: {model_wrapper.top_k}")
-                print(f"  Repetition penalty: {model_wrapper.repetition_penalty}")
-                print(f"  Max new tokens: {DEFAULT_MAX_NEW_TOKENS}")
-                continue
-            if user.lower() == "model-info":
-                print("Model Architecture Information:")
-                print(f"  Model type: {type(model_wrapper.model).__name__}")
-                print(f"  Model name: {model_wrapper.model_name}")
-                if hasattr(model_wrapper.model, 'config'):
-                    config = model_wrapper.model.config
-                    print(f"  Architecture: {getattr(config, 'architectures', ['Unknown'])[0] if getattr(config, 'architectures', None) else 'Unknown'}")
-                    print(f"  Hidden size: {getattr(config, 'hidden_size', 'Unknown')}")
-                    print(f"  Num layers: {getattr(config, 'num_hidden_layers', 'Unknown')}")
-                    print(f"  Num attention heads: {getattr(config, 'num_attention_heads', 'Unknown')}")
-                    print(f"  Max position embeddings: {getattr(config, 'max_position_embeddings', 'Unknown')}")
-                else:
-                    print("  Architecture: Unknown (no config available)")
-                continue
-            if user.lower() == "performance":
-                print("Performance Metrics:")
-                print(f"  Device: {model_wrapper.device}")
-                if torch.cuda.is_available():
-                    print(f"  GPU utilization: {torch.cuda.utilization()}%")
-                    print(f"  GPU temperature: {torch.cuda.temperature()}°C")
-                print(f"  Model parameters: {sum(p.numel() for p in model_wrapper.model.parameters()):,}")
-                print(f"  Trainable parameters: {sum(p.numel() for p in model_wrapper.model.parameters() if p.requires_grad):,}")
-                continue
-            if user.lower() == "license":
-                print("Model License Information:")
-                if hasattr(model_wrapper.model, 'config'):
-                    config = model_wrapper.model.config
-                    print(f"  License: {getattr(config, 'license', 'Unknown')}")
-                    print(f"  Model card: {getattr(config, 'model_card', 'Unknown')}")
-                    print(f"  Tags: {getattr(config, 'tags', 'None')}")
-                    print(f"  Paper: {getattr(config, 'paper', 'Unknown')}")
-                else:
-                    print("  License information not available")
-                continue
-            if user.lower() == "training":
-                print("Training Information:")
-                if hasattr(model_wrapper.model, 'config'):
-                    config = model_wrapper.model.config
-                    print(f"  Training data: {getattr(config, 'training_data', 'Unknown')}")
-                    print(f"  Training objective: {getattr(config, 'training_objective', 'Unknown')}")
-                    print(f"  Training strategy: {getattr(config, 'training_strategy', 'Unknown')}")
-                    print(f"  Training steps: {getattr(config, 'training_steps', 'Unknown')}")
-                    print(f"  Learning rate: {getattr(config, 'learning_rate', 'Unknown')}")
-                else:
-                    print("  Training information not available")
-                continue
-            if user.lower() == "evaluation":
-                print("Evaluation Metrics:")
-                if hasattr(model_wrapper.model, 'config'):
-                    config = model_wrapper.model.config
-                    print(f"  Evaluation dataset: {getattr(config, 'evaluation_dataset', 'Unknown')}")
-                    print(f"  Evaluation metrics: {getattr(config, 'evaluation_metrics', 'Unknown')}")
-                    print(f"  Evaluation results: {getattr(config, 'evaluation_results', 'Unknown')}")
-                    print(f"  Benchmark scores: {getattr(config, 'benchmark_scores', 'Unknown')}")
-                else:
-                    print("  Evaluation information not available")
-                continue
-            if user.lower() == "usage":
-                print("Usage Statistics:")
-                print(f"  Total conversations: {len(model_wrapper.conversation_history)}")
-                print(f"  Total user messages: {sum(len(turn['user']) for turn in model_wrapper.conversation_history)} characters")
-                print(f"  Total bot responses: {sum(len(turn['bot']) for turn in model_wrapper.conversation_history)} characters")
-                print(f"  Average response length: {sum(len(turn['bot']) for turn in model_wrapper.conversation_history) / max(len(model_wrapper.conversation_history), 1):.1f} characters")
-                print(f"  Model loaded at: {getattr(model_wrapper, '_load_time', 'Unknown')}")
-                continue
-            if user.lower() == "version":
-                print("Version Information:")
-                print(f"  MiniChat version: 2.0")
-                print(f"  Python version: {platform.python_version()}")
-                print(f"  PyTorch version: {torch.__version__}")
-                print(f"  Transformers version: {getattr(torch, '__version__', 'Unknown')}")
-                print(f"  FastAPI version: {getattr(uvicorn, '__version__', 'Unknown')}")
-                continue
-            if user.lower() == "config":
-                print("Model Configuration:")
-                if hasattr(model_wrapper.model, 'config'):
-                    config = model_wrapper.model.config
-                    print(f"  Model type: {type(config).__name__}")
-                    print(f"  Model name: {getattr(config, 'name_or_path', 'Unknown')}")
-                    print(f"  Model revision: {getattr(config, 'revision', 'Unknown')}")
-                    print(f"  Model size: {getattr(config, 'model_size', 'Unknown')}")
-                    print(f"  Model family: {getattr(config, 'model_type', 'Unknown')}")
-                    print(f"  Task type: {getattr(config, 'task_type', 'Unknown')}")
-                else:
-                    print("  Configuration not available")
-                continue
-            if user.lower() == "capabilities":
-                print("Model Capabilities:")
-                if hasattr(model_wrapper.model, 'config'):
-                    config = model_wrapper.model.config
-                    print(f"  Text generation: Yes")
-                    print(f"  Context length: {getattr(config, 'max_position_embeddings', 'Unknown')} tokens")
-                    print(f"  Multilingual: {getattr(config, 'multilingual', 'Unknown')}")
-                    print(f"  Code generation: {getattr(config, 'code_generation', 'Unknown')}")
-                    print(f"  Reasoning: {getattr(config, 'reasoning', 'Unknown')}")
-                    print(f"  Creative writing: {getattr(config, 'creative_writing', 'Unknown')}")
-                else:
-                    print("  Capabilities information not available")
-                continue
-            if user.lower() == "safety":
-                print("Safety Information:")
-                print(f"  Content filtering: Enabled")
-                print(f"  Banned keywords: {len(['bomb', 'kill', 'suicide', 'self-harm', 'illegal', 'terrorist', 'explode', 'child porn', 'cp', 'ddos', 'hitman', 'assassinate'])} words")
-                print(f"  Safety checks: Active")
-                print(f"  Harmful content: Blocked")
-                print(f"  Ethical guidelines: Followed")
-                continue
-            if user.lower() == "environment":
-                print("Environment Information:")
-                print(f"  Operating system: {platform.system()} {platform.release()}")
-                print(f"  Python executable: {sys.executable}")
-                print(f"  Working directory: {os.getcwd()}")
-                print(f"  Environment variables: {len(os.environ)} variables")
-                print(f"  Process ID: {os.getpid()}")
-                print(f"  User: {os.getenv('USER', 'Unknown')}")
-                continue
-            if user.lower() == "token-usage":
-                print("Token Usage Statistics:")
-                if model_wrapper.conversation_history:
-                    total_tokens = 0
-                    total_user_tokens = 0
-                    total_bot_tokens = 0
-                    for turn in model_wrapper.conversation_history:
-                        user_tokens = len(model_wrapper.tokenizer.encode(turn['user']))
-                        bot_tokens = len(model_wrapper.tokenizer.encode(turn['bot']))
-                        total_user_tokens += user_tokens
-                        total_bot_tokens += bot_tokens
-                        total_tokens += user_tokens + bot_tokens
-                    print(f"  Total tokens used: {total_tokens:,}")
-                    print(f"  User message tokens: {total_user_tokens:,}")
-                    print(f"  Bot response tokens: {total_bot_tokens:,}")
-                    print(f"  Average tokens per turn: {total_tokens / len(model_wrapper.conversation_history):.1f}")
-                else:
-                    print("  No conversation history available")
-                continue
-            if user.lower() == "generation":
-                print("Generation History:")
-                if model_wrapper.conversation_history:
-                    print(f"  Total generations: {len(model_wrapper.conversation_history)}")
-                    print(f"  First generation: {model_wrapper.conversation_history[0]['user'][:50]}...")
-                    print(f"  Latest generation: {model_wrapper.conversation_history[-1]['user'][:50]}...")
-                    print(f"  Generation time span: {len(model_wrapper.conversation_history)} turns")
-                    print("  Recent generations:")
-                    for i, turn in enumerate(model_wrapper.conversation_history[-3:], 1):
-                        print(f"    {turn['user'][:40]}...")
-                        print(f"       Bot: {turn['bot'][:40]}...")
-                else:
-                    print("  No generation history available")
-                continue
-            if user.lower() == "system":
-                print("Detailed System Information:")
-                print(f"  Platform: {platform.platform()}")
-                print(f"  Machine: {platform.machine()}")
-                print(f"  Processor: {platform.processor()}")
-                print(f"  Python version: {platform.python_version()}")
-                print(f"  Python implementation: {platform.python_implementation()}")
-                print(f"  Python compiler: {platform.python_compiler()}")
-                print(f"  System: {platform.system()} {platform.release()}")
-                print(f"  Architecture: {platform.architecture()}")
-                print(f"  Node: {platform.node()}")
-                continue
-            if user.lower() == "network":
-                print("Network Information:")
-                try:
-                    import socket
-                    hostname = socket.gethostname()
-                    local_ip = socket.gethostbyname(hostname)
-                    print(f"  Hostname: {hostname}")
-                    print(f"  Local IP: {local_ip}")
-                    print(f"  Port: 8000 (default)")
-                    print(f"  Web interface: http://localhost:8000")
-                    print(f"  WebSocket: ws://localhost:8000/ws/chat")
-                except Exception as e:
-                    print(f"  Network info unavailable: {e}")
-                continue
-            if user.lower() == "disk":
-                print("Disk Usage Information:")
-                try:
-                    import shutil
-                    total, used, free = shutil.disk_usage(".")
-                    print(f"  Current directory: {os.getcwd()}")
-                    print(f"  Total space: {total // (1024**3):.1f} GB")
-                    print(f"  Used space: {used // (1024**3):.1f} GB")
-                    print(f"  Free space: {free // (1024**3):.1f} GB")
-                    print(f"  Usage percentage: {(used / total) * 100:.1f}%")
-                except Exception as e:
-                    print(f"  Disk info unavailable: {e}")
-                continue
-            if user.lower() == "process":
-                print("Process Information:")
-                try:
-                    import psutil
-                    process = psutil.Process()
-                    print(f"  Process ID: {process.pid}")
-                    print(f"  Process name: {process.name()}")
-                    print(f"  Process status: {process.status()}")
-                    print(f"  CPU percent: {process.cpu_percent()}%")
-                    print(f"  Memory usage: {process.memory_info().rss // (1024**2):.1f} MB")
-                    print(f"  Create time: {datetime.fromtimestamp(process.create_time()).strftime('%Y-%m-%d %H:%M:%S')}")
-                except ImportError:
-                    print("  psutil not available - install with: pip install psutil")
-                except Exception as e:
-                    print(f"  Process info unavailable: {e}")
-                continue
-            if user.lower() == "cache":
-                print("Model Cache Information:")
-                try:
-                    cache_dir = os.path.expanduser("~/.cache/huggingface")
-                    if os.path.exists(cache_dir):
-                        import shutil
-                        total, used, free = shutil.disk_usage(cache_dir)
-                        print(f"  Cache directory: {cache_dir}")
-                        print(f"  Cache size: {used // (1024**3):.1f} GB")
-                        print(f"  Available space: {free // (1024**3):.1f} GB")
-                        
-                        # Count model files
-                        model_count = 0
-                        for root, dirs, files in os.walk(cache_dir):
-                            if "config.json" in files:
-                                model_count += 1
-                        print(f"  Cached models: {model_count}")
-                    else:
-                        print("  Cache directory not found")
-                except Exception as e:
-                    print(f"  Cache info unavailable: {e}")
-                continue
-            if user.lower() == "deps":
-                print("Dependencies Information:")
-                try:
-                    import pkg_resources
-                    deps = ['torch', 'transformers', 'fastapi', 'uvicorn', 'jinja2']
-                    for dep in deps:
-                        try:
-                            version = pkg_resources.get_distribution(dep).version
-                            print(f"  {dep}: {version}")
-                        except pkg_resources.DistributionNotFound:
-                            print(f"  {dep}: Not installed")
-                except ImportError:
-                    print("  pkg_resources not available")
-                except Exception as e:
-                    print(f"  Dependencies info unavailable: {e}")
-                continue
-            if user.lower() == "memory":
-                print("Memory Information:")
-                try:
-                    import psutil
-                    memory = psutil.virtual_memory()
-                    print(f"  Total RAM: {memory.total // (1024**3):.1f} GB")
-                    print(f"  Available RAM: {memory.available // (1024**3):.1f} GB")
-                    print(f"  Used RAM: {memory.used // (1024**3):.1f} GB")
-                    print(f"  RAM usage: {memory.percent}%")
-                    
-                    # GPU memory if available
-                    if torch.cuda.is_available():
-                        gpu_memory = torch.cuda.get_device_properties(0).total_memory
-                        gpu_allocated = torch.cuda.memory_allocated(0)
-                        gpu_cached = torch.cuda.memory_reserved(0)
-                        print(f"  GPU memory: {gpu_memory // (1024**3):.1f} GB")
-                        print(f"  GPU allocated: {gpu_allocated // (1024**3):.1f} GB")
-                        print(f"  GPU cached: {gpu_cached // (1024**3):.1f} GB")
-                except ImportError:
-                    print("  psutil not available - install with: pip install psutil")
-                except Exception as e:
-                    print(f"  Memory info unavailable: {e}")
-                continue
-            if user.lower() == "performance":
-                print("Performance Metrics:")
-                try:
-                    import psutil
-                    cpu_percent = psutil.cpu_percent(interval=1)
-                    print(f"  CPU usage: {cpu_percent}%")
-                    
-                    # Model performance info
-                    if hasattr(model_wrapper, '_load_time'):
-                        print(f"  Model load time: {getattr(model_wrapper, '_load_time', 'Unknown')}")
-                    
-                    # Device info
-                    print(f"  Current device: {model_wrapper.device}")
-                    if torch.cuda.is_available():
-                        print(f"  CUDA version: {torch.version.cuda}")
-                        print(f"  GPU count: {torch.cuda.device_count()}")
-                        if torch.cuda.device_count() > 0:
-                            gpu_name = torch.cuda.get_device_name(0)
-                            print(f"  GPU name: {gpu_name}")
-                except ImportError:
-                    print("  psutil not available - install with: pip install psutil")
-                except Exception as e:
-                    print(f"  Performance info unavailable: {e}")
-                continue
-            if user.lower() == "security":
-                print("Security Information:")
-                print(f"  Content filtering: {'Enabled' if safe_check('test') else 'Disabled'}")
-                print(f"  Banned keywords: {len(['bomb', 'kill', 'suicide', 'self-harm', 'illegal', 'terrorist', 'explode', 'child porn', 'cp', 'ddos', 'hitman', 'assassinate'])} words")
-                print(f"  Safety checks: Active")
-                print(f"  Harmful content: Blocked")
-                print(f"  Ethical guidelines: Followed")
-                print(f"  Model safety: {getattr(model_wrapper.model, 'safe', 'Unknown')}")
-                print(f"  Input validation: Active")
-                print(f"  Output filtering: Active")
-                continue
-            if user.lower() == "model-info":
-                print("Detailed Model Information:")
-                if hasattr(model_wrapper.model, 'config'):
-                    config = model_wrapper.model.config
-                    print(f"  Model type: {type(config).__name__}")
-                    print(f"  Model name: {getattr(config, 'name_or_path', 'Unknown')}")
-                    print(f"  Model revision: {getattr(config, 'revision', 'Unknown')}")
-                    print(f"  Model size: {getattr(config, 'model_size', 'Unknown')}")
-                    print(f"  Model family: {getattr(config, 'model_type', 'Unknown')}")
-                    print(f"  Task type: {getattr(config, 'task_type', 'Unknown')}")
-                    print(f"  Vocabulary size: {getattr(config, 'vocab_size', 'Unknown')}")
-                    print(f"  Hidden size: {getattr(config, 'hidden_size', 'Unknown')}")
-                    print(f"  Num layers: {getattr(config, 'num_hidden_layers', 'Unknown')}")
-                    print(f"  Num attention heads: {getattr(config, 'num_attention_heads', 'Unknown')}")
-                    print(f"  Max position embeddings: {getattr(config, 'max_position_embeddings', 'Unknown')}")
-                    print(f"  Type vocab size: {getattr(config, 'type_vocab_size', 'Unknown')}")
-                    print(f"  Initializer range: {getattr(config, 'initializer_range', 'Unknown')}")
-                    print(f"  Layer norm eps: {getattr(config, 'layer_norm_eps', 'Unknown')}")
-                    print(f"  Position embedding type: {getattr(config, 'position_embedding_type', 'Unknown')}")
-                    print(f"  Use cache: {getattr(config, 'use_cache', 'Unknown')}")
-                    print(f"  Architectures: {getattr(config, 'architectures', 'Unknown')}")
-                else:
-                    print("  Configuration not available")
-                continue
-            if user.lower() == "tokenizer":
-                print("Tokenizer Information:")
-                if model_wrapper.tokenizer:
-                    print(f"  Tokenizer class: {type(model_wrapper.tokenizer).__name__}")
-                    print(f"  Vocabulary size: {model_wrapper.tokenizer.vocab_size}")
-                    print(f"  Model max length: {getattr(model_wrapper.tokenizer, 'model_max_length', 'Unknown')}")
-                    print(f"  Padding token: {getattr(model_wrapper.tokenizer, 'pad_token', 'None')}")
-                    print(f"  EOS token: {getattr(model_wrapper.tokenizer, 'eos_token', 'None')}")
-                    print(f"  BOS token: {getattr(model_wrapper.tokenizer, 'bos_token', 'None')}")
-                    print(f"  UNK token: {getattr(model_wrapper.tokenizer, 'unk_token', 'None')}")
-                    print(f"  CLS token: {getattr(model_wrapper.tokenizer, 'cls_token', 'None')}")
-                    print(f"  SEP token: {getattr(model_wrapper.tokenizer, 'sep_token', 'None')}")
-                    print(f"  MASK token: {getattr(model_wrapper.tokenizer, 'mask_token', 'None')}")
-                    print(f"  Tokenizer type: {getattr(model_wrapper.tokenizer, 'tokenizer_type', 'Unknown')}")
-                    print(f"  Clean up tokenization spaces: {getattr(model_wrapper.tokenizer, 'clean_up_tokenization_spaces', 'Unknown')}")
-                else:
-                    print("  Tokenizer not available")
-                continue
-            if user.lower() == "params":
-                print("Generation Parameters:")
-                print(f"  Temperature: {model_wrapper.temperature}")
-                print(f"  Top-p: {model_wrapper.top_p}")
-                print(f"  Top-k: {model_wrapper.top_k}")
-                print(f"  Repetition penalty: {model_wrapper.repetition_penalty}")
-                print(f"  Max new tokens: {DEFAULT_MAX_NEW_TOKENS}")
-                print(f"  Max length: {DEFAULT_MAX_LENGTH}")
-                print(f"  System prompt: {model_wrapper.system_prompt}")
-                print(f"  Current device: {model_wrapper.device}")
-                print(f"  Model name: {model_wrapper.model_name}")
-                continue
-            if user.lower() == "history":
-                print("Conversation History:")
-                if model_wrapper.conversation_history:
-                    print(f"  Total conversations: {len(model_wrapper.conversation_history)}")
-                    for i, turn in enumerate(model_wrapper.conversation_history, 1):
-                        print(f"  Turn {i}:")
-                        print(f"    User: {turn['user'][:100]}{'...' if len(turn['user']) > 100 else ''}")
-                        print(f"    Bot: {turn['bot'][:100]}{'...' if len(turn['bot']) > 100 else ''}")
-                        print()
-                else:
-                    print("  No conversation history available")
-                continue
-            if user.lower() == "help-cat":
-                print("Help by Category:")
-                print("\n  SYSTEM COMMANDS:")
-                print("    help, help-cat, exit, clear, time, date")
-                print("\n  MODEL COMMANDS:")
-                print("    model, models, switch, config, capabilities, model-info, tokenizer")
-                print("\n  GENERATION COMMANDS:")
-                print("    temp, topp, topk, prompt, params")
-                print("\n  HISTORY COMMANDS:")
-                print("    save, load, export, history, stats, usage, token-usage, generation")
-                print("\n  SYSTEM INFO COMMANDS:")
-                print("    version, info, system, environment, network, disk, process, cache, deps, memory, performance, security")
-                continue
-            if user.lower() == "evaluation":
-                print("Evaluation Metrics:")
-                if model_wrapper.conversation_history:
-                    total_turns = len(model_wrapper.conversation_history)
-                    total_user_chars = sum(len(turn['user']) for turn in model_wrapper.conversation_history)
-                    total_bot_chars = sum(len(turn['bot']) for turn in model_wrapper.conversation_history)
-                    total_user_tokens = sum(len(model_wrapper.tokenizer.encode(turn['user'])) for turn in model_wrapper.conversation_history)
-                    total_bot_tokens = sum(len(model_wrapper.tokenizer.encode(turn['bot'])) for turn in model_wrapper.conversation_history)
-                    
-                    print(f"  Total turns: {total_turns}")
-                    print(f"  Average user message length: {total_user_chars / total_turns:.1f} characters")
-                    print(f"  Average bot response length: {total_bot_chars / total_turns:.1f} characters")
-                    print(f"  Average user tokens: {total_user_tokens / total_turns:.1f} tokens")
-                    print(f"  Average bot tokens: {total_bot_tokens / total_turns:.1f} tokens")
-                    print(f"  Total tokens used: {total_user_tokens + total_bot_tokens:,}")
-                    print(f"  Response ratio (bot/user): {total_bot_chars / max(total_user_chars, 1):.2f}")
-                else:
-                    print("  No conversation history available for evaluation")
-                continue
-            if user.lower() == "debug":
-                print("Debugging Information:")
-                print(f"  Python version: {sys.version}")
-                print(f"  PyTorch version: {torch.__version__}")
-                print(f"  Transformers version: {getattr(torch, '__version__', 'Unknown')}")
-                print(f"  FastAPI version: {getattr(uvicorn, '__version__', 'Unknown')}")
-                print(f"  CUDA available: {torch.cuda.is_available()}")
-                if torch.cuda.is_available():
-                    print(f"  CUDA version: {torch.version.cuda}")
-                    print(f"  GPU count: {torch.cuda.device_count()}")
-                    print(f"  Current GPU: {torch.cuda.current_device()}")
-                print(f"  MPS available: {hasattr(torch.backends, 'mps') and torch.backends.mps.is_available()}")
-                print(f"  Device: {model_wrapper.device}")
-                print(f"  Model loaded: {model_wrapper.model is not None}")
-                print(f"  Tokenizer loaded: {model_wrapper.tokenizer is not None}")
-                print(f"  Conversation history length: {len(model_wrapper.conversation_history)}")
-                continue
-            if user.lower() == "status":
-                print("System Status:")
-                try:
-                    import psutil
-                    # CPU status
-                    cpu_percent = psutil.cpu_percent(interval=1)
-                    cpu_count = psutil.cpu_count()
-                    print(f"  CPU: {cpu_percent}% usage ({cpu_count} cores)")
-                    
-                    # Memory status
-                    memory = psutil.virtual_memory()
-                    print(f"  Memory: {memory.percent}% used ({memory.used // (1024**3):.1f}GB / {memory.total // (1024**3):.1f}GB)")
-                    
-                    # Disk status
-                    disk = psutil.disk_usage('.')
-                    print(f"  Disk: {(disk.used / disk.total) * 100:.1f}% used ({disk.used // (1024**3):.1f}GB / {disk.total // (1024**3):.1f}GB)")
-                    
-                    # Network status
-                    network = psutil.net_io_counters()
-                    print(f"  Network: {network.bytes_sent // (1024**2):.1f}MB sent, {network.bytes_recv // (1024**2):.1f}MB received")
-                    
-                    # Model status
-                    print(f"  Model: {model_wrapper.model_name} on {model_wrapper.device}")
-                    print(f"  Conversations: {len(model_wrapper.conversation_history)}")
-                    
-                except ImportError:
-                    print("  psutil not available - install with: pip install psutil")
-                except Exception as e:
-                    print(f"  Status info unavailable: {e}")
-                continue
-            if user.lower() == "config-detail":
-                print("Detailed Configuration:")
-                print(f"  Default model: {DEFAULT_MODEL}")
-                print(f"  Default max new tokens: {DEFAULT_MAX_NEW_TOKENS}")
-                print(f"  Default device: {DEFAULT_DEVICE}")
-                print(f"  Default temperature: {DEFAULT_TEMPERATURE}")
-                print(f"  Default top-p: {DEFAULT_TOP_P}")
-                print(f"  Default top-k: {DEFAULT_TOP_K}")
-                print(f"  Default repetition penalty: {DEFAULT_REPETITION_PENALTY}")
-                print(f"  Default max length: {DEFAULT_MAX_LENGTH}")
-                print(f"  Client HTML path: {CLIENT_HTML_PATH}")
-                print(f"  Current working directory: {os.getcwd()}")
-                print(f"  Python executable: {sys.executable}")
-                print(f"  Platform: {platform.platform()}")
-                print(f"  Architecture: {platform.architecture()}")
-                print(f"  Machine: {platform.machine()}")
-                print(f"  Processor: {platform.processor()}")
-                continue
-            if user.lower() == "capabilities-detail":
-                print("Detailed Capabilities:")
-                print("  Text Generation:")
-                print("    - Natural language processing")
-                print("    - Context-aware responses")
-                print("    - Multi-turn conversations")
-                print("    - Creative writing")
-                print("    - Technical explanations")
-                print("  Language Support:")
-                print("    - English (primary)")
-                print("    - Multi-language support")
-                print("    - Code generation")
-                print("    - Mathematical reasoning")
-                print("  Model Features:")
-                print("    - Streaming responses")
-                print("    - Parameter adjustment")
-                print("    - Model switching")
-                print("    - History management")
-                print("    - Export functionality")
-                print("  System Integration:")
-                print("    - CLI interface")
-                print("    - Web interface")
-                print("    - WebSocket support")
-                print("    - File operations")
-                print("    - System monitoring")
-                continue
-            if user.lower() == "safety-detail":
-                print("Detailed Safety Information:")
-                print("  Content Filtering:")
-                print("    - Keyword-based filtering")
-                print("    - Harmful content detection")
-                print("    - Inappropriate language blocking")
-                print("    - Violence prevention")
-                print("    - Illegal activity prevention")
-                print("  Safety Measures:")
-                print("    - Input validation")
-                print("    - Output filtering")
-                print("    - Ethical guidelines")
-                print("    - Bias mitigation")
-                print("    - Privacy protection")
-                print("  Banned Categories:")
-                print("    - Violence and harm")
-                print("    - Illegal activities")
-                print("    - Inappropriate content")
-                print("    - Misinformation")
-                print("    - Privacy violations")
-                print("  Safety Features:")
-                print("    - Real-time filtering")
-                print("    - User notification")
-                print("    - Content logging")
-                print("    - Safety reporting")
-                print("    - Continuous monitoring")
-                continue
-            if user.lower() == "performance-detail":
-                print("Detailed Performance Metrics:")
-                print("  System Performance:")
-                print("    - CPU utilization monitoring")
-                print("    - Memory usage tracking")
-                print("    - Disk I/O monitoring")
-                print("    - Network performance")
-                print("    - Process statistics")
-                print("  Model Performance:")
-                print("    - Inference speed")
-                print("    - Token generation rate")
-                print("    - Memory efficiency")
-                print("    - GPU utilization")
-                print("    - Model loading time")
-                print("  User Experience:")
-                print("    - Response time")
-                print("    - Conversation flow")
-                print("    - Error handling")
-                print("    - System stability")
-                print("    - Resource optimization")
-                print("  Optimization Features:")
-                print("    - Dynamic parameter adjustment")
-                print("    - Model quantization support")
-                print("    - Cache management")
-                print("    - Background processing")
-                print("    - Performance profiling")
-                continue
-            if user.lower() == "memory-detail":
-                print("Detailed Memory Information:")
-                try:
-                    import psutil
-                    # RAM details
-                    memory = psutil.virtual_memory()
-                    print("  RAM Memory:")
-                    print(f"    Total: {memory.total // (1024**3):.1f} GB")
-                    print(f"    Available: {memory.available // (1024**3):.1f} GB")
-                    print(f"    Used: {memory.used // (1024**3):.1f} GB")
-                    print(f"    Free: {memory.free // (1024**3):.1f} GB")
-                    print(f"    Usage: {memory.percent}%")
-                    print(f"    Active: {memory.active // (1024**3):.1f} GB")
-                    print(f"    Inactive: {memory.inactive // (1024**3):.1f} GB")
-                    print(f"    Wired: {getattr(memory, 'wired', 'N/A')}")
-                    
-                    # Swap memory
-                    swap = psutil.swap_memory()
-                    print("  Swap Memory:")
-                    print(f"    Total: {swap.total // (1024**3):.1f} GB")
-                    print(f"    Used: {swap.used // (1024**3):.1f} GB")
-                    print(f"    Free: {swap.free // (1024**3):.1f} GB")
-                    print(f"    Usage: {swap.percent}%")
-                    
-                    # GPU memory if available
-                    if torch.cuda.is_available():
-                        print("  GPU Memory:")
-                        gpu_memory = torch.cuda.get_device_properties(0).total_memory
-                        gpu_allocated = torch.cuda.memory_allocated(0)
-                        gpu_cached = torch.cuda.memory_reserved(0)
-                        gpu_free = gpu_memory - gpu_cached
-                        print(f"    Total: {gpu_memory // (1024**3):.1f} GB")
-                        print(f"    Allocated: {gpu_allocated // (1024**3):.1f} GB")
-                        print(f"    Cached: {gpu_cached // (1024**3):.1f} GB")
-                        print(f"    Free: {gpu_free // (1024**3):.1f} GB")
-                        print(f"    Usage: {(gpu_cached / gpu_memory) * 100:.1f}%")
-                    
-                except ImportError:
-                    print("  psutil not available - install with: pip install psutil")
-                except Exception as e:
-                    print(f"  Memory detail info unavailable: {e}")
-                continue
-            if user.lower() == "network-detail":
-                print("Detailed Network Information:")
-                try:
-                    import psutil
-                    # Hostname and IP
-                    hostname = socket.gethostname()
-                    local_ip = socket.gethostbyname(hostname)
-                    print("  Network Configuration:")
-                    print(f"    Hostname: {hostname}")
-                    print(f"    Local IP: {local_ip}")
-                    print(f"    Default port: 8000")
-                    print(f"    Web URL: http://{local_ip}:8000")
-                    print(f"    WebSocket URL: ws://{local_ip}:8000/ws/chat")
-                    
-                    # Network interfaces
-                    net_if_addrs = psutil.net_if_addrs()
-                    print("  Network Interfaces:")
-                    for interface, addresses in net_if_addrs.items():
-                        print(f"    {interface}:")
-                        for addr in addresses:
-                            if addr.family == socket.AF_INET:
-                                print(f"      IPv4: {addr.address}")
-                            elif addr.family == socket.AF_INET6:
-                                print(f"      IPv6: {addr.address}")
-                    
-                    # Network statistics
-                    net_io = psutil.net_io_counters()
-                    print("  Network Statistics:")
-                    print(f"    Bytes sent: {net_io.bytes_sent // (1024**2):.1f} MB")
-                    print(f"    Bytes received: {net_io.bytes_recv // (1024**2):.1f} MB")
-                    print(f"    Packets sent: {net_io.packets_sent:,}")
-                    print(f"    Packets received: {net_io.packets_recv:,}")
-                    print(f"    Errors in: {net_io.errin}")
-                    print(f"    Errors out: {net_io.errout}")
-                    print(f"    Drops in: {net_io.dropin}")
-                    print(f"    Drops out: {net_io.dropout}")
-                    
-                except ImportError:
-                    print("  psutil not available - install with: pip install psutil")
-                except Exception as e:
-                    print(f"  Network detail info unavailable: {e}")
-                continue
-            if user.lower() == "disk-detail":
-                print("Detailed Disk Information:")
-                try:
-                    import psutil
-                    # Current directory
-                    current_dir = os.getcwd()
-                    print("  Current Directory:")
-                    print(f"    Path: {current_dir}")
-                    
-                    # Disk partitions
-                    partitions = psutil.disk_partitions()
-                    print("  Disk Partitions:")
-                    for partition in partitions:
-                        try:
-                            usage = psutil.disk_usage(partition.mountpoint)
-                            print(f"    {partition.device}:")
-                            print(f"      Mountpoint: {partition.mountpoint}")
-                            print(f"      Filesystem: {partition.fstype}")
-                            print(f"      Total: {usage.total // (1024**3):.1f} GB")
-                            print(f"      Used: {usage.used // (1024**3):.1f} GB")
-                            print(f"      Free: {usage.free // (1024**3):.1f} GB")
-                            print(f"      Usage: {(usage.used / usage.total) * 100:.1f}%")
-                        except PermissionError:
-                            print(f"    {partition.device}: Access denied")
-                    
-                    # Current directory usage
-                    try:
-                        current_usage = psutil.disk_usage(current_dir)
-                        print("  Current Directory Usage:")
-                        print(f"    Total: {current_usage.total // (1024**3):.1f} GB")
-                        print(f"    Used: {current_usage.used // (1024**3):.1f} GB")
-                        print(f"    Free: {current_usage.free // (1024**3):.1f} GB")
-                        print(f"    Usage: {(current_usage.used / current_usage.total) * 100:.1f}%")
-                    except PermissionError:
-                        print("  Current directory usage: Access denied")
-                    
-                    # Disk I/O statistics
-                    disk_io = psutil.disk_io_counters()
-                    if disk_io:
-                        print("  Disk I/O Statistics:")
-                        print(f"    Read count: {disk_io.read_count:,}")
-                        print(f"    Write count: {disk_io.write_count:,}")
-                        print(f"    Read bytes: {disk_io.read_bytes // (1024**3):.1f} GB")
-                        print(f"    Write bytes: {disk_io.write_bytes // (1024**3):.1f} GB")
-                        print(f"    Read time: {disk_io.read_time} ms")
-                        print(f"    Write time: {disk_io.write_time} ms")
-                    
-                except ImportError:
-                    print("  psutil not available - install with: pip install psutil")
-                except Exception as e:
-                    print(f"  Disk detail info unavailable: {e}")
-                continue
-            if user.lower() == "process-detail":
-                print("Detailed Process Information:")
-                try:
-                    import psutil
-                    # Current process
-                    current_process = psutil.Process()
-                    print("  Current Process:")
-                    print(f"    PID: {current_process.pid}")
-                    print(f"    Name: {current_process.name()}")
-                    print(f"    Status: {current_process.status()}")
-                    print(f"    Create time: {datetime.fromtimestamp(current_process.create_time()).strftime('%Y-%m-%d %H:%M:%S')}")
-                    print(f"    CPU percent: {current_process.cpu_percent()}%")
-                    
-                    # Memory info
-                    memory_info = current_process.memory_info()
-                    print("  Memory Usage:")
-                    print(f"    RSS: {memory_info.rss // (1024**2):.1f} MB")
-                    print(f"    VMS: {memory_info.vms // (1024**2):.1f} MB")
-                    print(f"    Percent: {current_process.memory_percent():.1f}%")
-                    
-                    # CPU info
-                    cpu_times = current_process.cpu_times()
-                    print("  CPU Times:")
-                    print(f"    User: {cpu_times.user:.2f}s")
-                    print(f"    System: {cpu_times.system:.2f}s")
-                    print(f"    Children user: {cpu_times.children_user:.2f}s")
-                    print(f"    Children system: {cpu_times.children_system:.2f}s")
-                    
-                    # Open files
-                    try:
-                        open_files = current_process.open_files()
-                        print(f"  Open Files: {len(open_files)}")
-                        for file in open_files[:5]:  # Show first 5
-                            print(f"    {file.path}")
-                        if len(open_files) > 5:
-                            print(f"    ... and {len(open_files) - 5} more")
-                    except (psutil.AccessDenied, psutil.ZombieProcess):
-                        print("  Open Files: Access denied")
-                    
-                    # Threads
-                    try:
-                        threads = current_process.threads()
-                        print(f"  Threads: {len(threads)}")
-                        for thread in threads[:5]:  # Show first 5
-                            print(f"    Thread {thread.id}: {cpu_times.user:.2f}s user, {cpu_times.system:.2f}s system")
-                        if len(threads) > 5:
-                            print(f"    ... and {len(threads) - 5} more")
-                    except (psutil.AccessDenied, psutil.ZombieProcess):
-                        print("  Threads: Access denied")
-                    
-                except ImportError:
-                    print("  psutil not available - install with: pip install psutil")
-                except Exception as e:
-                    print(f"  Process detail info unavailable: {e}")
+        model_wrapper.switch_model(arg)
+    except Exception as e:
+        print(f"Failed to switch model: {e}")
+
+def cmd_stats(model_wrapper: ModelWrapper):
+    """Show conversation statistics."""
+    stats = model_wrapper.get_stats()
+    print("Conversation Statistics:")
+    print(f"  Total turns: {stats['total_turns']}")
+    if stats['total_turns'] > 0:
+        print(f"  Average user message length: {stats['avg_user_length']:.1f} characters")
+        print(f"  Average bot response length: {stats['avg_bot_length']:.1f} characters")
+        print(f"  Total user characters: {stats['total_user_chars']}")
+        print(f"  Total bot characters: {stats['total_bot_chars']}")
+
+def cmd_models(model_wrapper: ModelWrapper):
+    """Show available model presets."""
+    print("Available Model Presets:")
+    for preset, model_name in MODEL_PRESETS.items():
+        print(f"  {preset:12} - {model_name}")
+    print(f"\\nCurrent model: {model_wrapper.model_name}")
+
+def cmd_temp(model_wrapper: ModelWrapper, arg: str):
+    """Set temperature (X = 0.1 to 2.0, or 0 for greedy decoding)."""
+    try:
+        temp = float(arg)
+        if temp == 0 or 0.1 <= temp <= 2.0:
+            model_wrapper.temperature = temp
+            print(f"Temperature set to {temp}")
+        else:
+            print("Temperature must be between 0.1 and 2.0 (or 0 for greedy decoding)")
+    except ValueError:
+        print("Invalid temperature value. Use: temp 0.8")
+
+def cmd_topp(model_wrapper: ModelWrapper, arg: str):
+    """Set top-p (X = 0.1 to 1.0)."""
+    try:
+        topp = float(arg)
+        if 0.1 <= topp <= 1.0:
+            model_wrapper.top_p = topp
+            print(f"Top-p set to {topp}")
+        else:
+            print("Top-p must be between 0.1 and 1.0")
+    except ValueError:
+        print("Invalid top-p value. Use: topp 0.9")
+
+def cmd_topk(model_wrapper: ModelWrapper, arg: str):
+    """Set top-k (X = 1 to 100)."""
+    try:
+        topk = int(arg)
+        if 1 <= topk <= 100:
+            model_wrapper.top_k = topk
+            print(f"Top-k set to {topk}")
+        else:
+            print("Top-k must be between 1 and 100")
+    except ValueError:
+        print("Invalid top-k value. Use: topk 50")
+
+def cmd_save(model_wrapper: ModelWrapper, arg: str):
+    """Save conversation to file X."""
+    filename = arg
+    if not filename:
+        print("Usage: save <filename>")
+        return
+    if save_conversation_history(model_wrapper.conversation_history, filename):
+        print(f"Conversation saved to {filename}")
+    else:
+        print("Failed to save conversation")
+
+def cmd_load(model_wrapper: ModelWrapper, arg: str):
+    """Load conversation from file X."""
+    filename = arg
+    if not filename:
+        print("Usage: load <filename>")
+        return
+    history = load_conversation_history(filename)
+    if history:
+        model_wrapper.set_history(history)
+        print(f"Conversation loaded from {filename}")
+    else:
+        print("Failed to load conversation")
+
+def cmd_info(model_wrapper: ModelWrapper):
+    """Show system information."""
+    sysinfo = system_info()
+    print("System Information:")
+    print(f"  Python version: {sysinfo.python_version}")
+    print(f"  PyTorch version: {torch.__version__}")
+    print(f"  CUDA available: {sysinfo.cuda_available}")
+    if sysinfo.cuda_available:
+        print(f"  CUDA version: {sysinfo.cuda_version}")
+    if model_wrapper.gpu_properties is not None:
+        print(f"  GPU device: {model_wrapper.gpu_properties.name}")
+    print(f"  Device: {model_wrapper.device}")
+    print(f"  Model: {model_wrapper.model_name}")
+
+def cmd_context(model_wrapper: ModelWrapper):
+    """Show current conversation context."""
+    print("Current Conversation Context:")
+    print(f"  System prompt: {model_wrapper.system_prompt[:100]}...")
+    if model_wrapper.conversation_history:
+        print(f"  History length: {len(model_wrapper.conversation_history)} turns")
+        print("  Recent context:")
+        for i, turn in enumerate(last_turns(model_wrapper.conversation_history, 3), 1):
+            print(f"    {i}. User: {turn['user'][:50]}...")
+            print(f"       Bot: {turn['bot'][:50]}...")
+    else:
+        print("  No conversation history")
+
+def cmd_reset(model_wrapper: ModelWrapper):
+    """Reload the current model."""
+    print("Reloading model...")
+    model_wrapper._load()
+    print("Model reloaded successfully.")
+
+def cmd_tokens(model_wrapper: ModelWrapper):
+    """Show tokenizer information."""
+    print("Tokenizer Information:")
+    print(f"  Vocabulary size: {model_wrapper.tokenizer.vocab_size}")
+    print(f"  Pad token: {model_wrapper.tokenizer.pad_token}")
+    print(f"  EOS token: {model_wrapper.tokenizer.eos_token}")
+    print(f"  BOS token: {model_wrapper.tokenizer.bos_token}")
+    print(f"  UNK token: {model_wrapper.tokenizer.unk_token}")
+    print(f"  Model max length: {model_wrapper.tokenizer.model_max_length}")
+
+def cmd_memory(model_wrapper: ModelWrapper):
+    """Show memory usage."""
+    print("Memory Information:")
+    if _psutil_missing():
+        return
+    try:
+        memory = psutil.virtual_memory()
+        print(f"  Total RAM: {memory.total // (1024**3):.1f} GB")
+        print(f"  Available RAM: {memory.available // (1024**3):.1f} GB")
+        print(f"  Used RAM: {memory.used // (1024**3):.1f} GB")
+        print(f"  RAM usage: {memory.percent}%")
+
+        # GPU memory if available
+        gpu = gpu_memory(model_wrapper)
+        if gpu is not None:
+            gpu_total, gpu_allocated, gpu_cached = gpu
+            print(f"  GPU memory: {gpu_total // (1024**3):.1f} GB")
+            print(f"  GPU allocated: {gpu_allocated // (1024**3):.1f} GB")
+            print(f"  GPU cached: {gpu_cached // (1024**3):.1f} GB")
+    except Exception as e:
+        print(f"  Memory info unavailable: {e}")
+
+def cmd_pwd(model_wrapper: ModelWrapper):
+    """Show current working directory."""
+    print("Current Working Directory:")
+    print(f"  Path: {os.getcwd()}")
+    # One directory read; DirEntry types come from readdir, so most entries need no stat
+    files = dirs = 0
+    with os.scandir('.') as entries:
+        for entry in entries:
+            if entry.is_file():
+                files += 1
+            elif entry.is_dir():
+                dirs += 1
+    print(f"  Files: {files} files")
+    print(f"  Directories: {dirs} directories")
+
+def cmd_time(model_wrapper: ModelWrapper):
+    """Show current time and date."""
+    now = time.time()
+    sys.stdout.write(
+        time.strftime("Current Time and Date:\n  Date: %Y-%m-%d\n  Time: %H:%M:%S\n  Timezone: %Z\n",
+                      time.localtime(now))
+        + f"  Timestamp: {now:.0f}\n"
+    )
+
+def cmd_params(model_wrapper: ModelWrapper):
+    """Show current generation parameters."""
+    print("Generation Parameters:")
+    print(f"  Temperature: {model_wrapper.temperature}")
+    print(f"  Top-p: {model_wrapper.top_p}")
+    print(f"  Top-k: {model_wrapper.top_k}")
+    print(f"  Repetition penalty: {model_wrapper.repetition_penalty}")
+    print(f"  Max new tokens: {DEFAULT_MAX_NEW_TOKENS}")
+    print(f"  Max length: {DEFAULT_MAX_LENGTH}")
+    print(f"  System prompt: {model_wrapper.system_prompt}")
+    print(f"  Current device: {model_wrapper.device}")
+    print(f"  Model name: {model_wrapper.model_name}")
+
+# Config-driven panels list (label, attribute[, default]) fields and render
+# them in one pass instead of an explicit getattr/print per line
+_CONFIG_FIELDS = (
+    ("Model name", "name_or_path"),
+    ("Model revision", "revision"),
+    ("Model size", "model_size"),
+    ("Model family", "model_type"),
+    ("Task type", "task_type"),
+)
+
+_MODEL_INFO_FIELDS = _CONFIG_FIELDS + (
+    ("Vocabulary size", "vocab_size"),
+    ("Hidden size", "hidden_size"),
+    ("Num layers", "num_hidden_layers"),
+    ("Num attention heads", "num_attention_heads"),
+    ("Max position embeddings", "max_position_embeddings"),
+    ("Type vocab size", "type_vocab_size"),
+    ("Initializer range", "initializer_range"),
+    ("Layer norm eps", "layer_norm_eps"),
+    ("Position embedding type", "position_embedding_type"),
+    ("Use cache", "use_cache"),
+    ("Architectures", "architectures"),
+)
+
+def _field_lines(obj, fields, default="Unknown") -> str:
+    """Render (label, attr[, default]) fields of obj as indented panel lines."""
+    return "".join(
+        f"  {label}: {getattr(obj, attr, fallback[0] if fallback else default)}\n"
+        for label, attr, *fallback in fields
+    )
+
+def cmd_model_info(model_wrapper: ModelWrapper):
+    """Show model architecture information."""
+    config = getattr(model_wrapper.model, 'config', None)
+    if config is None:
+        sys.stdout.write("Detailed Model Information:\n  Configuration not available\n")
+        return
+    sys.stdout.write(f"Detailed Model Information:\n  Model type: {type(config).__name__}\n"
+                     + _field_lines(config, _MODEL_INFO_FIELDS))
+
+def cmd_performance(model_wrapper: ModelWrapper):
+    """Show performance metrics."""
+    sysinfo = system_info()
+    print("Performance Metrics:")
+    if _psutil_missing():
+        return
+    try:
+        print(f"  CPU usage: {cpu_percent()}%")
+
+        # Model performance info
+        if hasattr(model_wrapper, '_load_time'):
+            print(f"  Model load time: {getattr(model_wrapper, '_load_time', 'Unknown')}")
+
+        # Device info
+        print(f"  Current device: {model_wrapper.device}")
+        print(f"  Model parameters: {model_wrapper.total_params:,}")
+        print(f"  Trainable parameters: {model_wrapper.trainable_params:,}")
+        if sysinfo.cuda_available:
+            print(f"  CUDA version: {sysinfo.cuda_version}")
+            print(f"  GPU count: {sysinfo.gpu_count}")
+        if model_wrapper.gpu_properties is not None:
+            print(f"  GPU name: {model_wrapper.gpu_properties.name}")
+            utilization, temperature = gpu_stats() or ("Unknown", "Unknown")
+            print(f"  GPU utilization: {utilization}%")
+            print(f"  GPU temperature: {temperature}°C")
+    except Exception as e:
+        print(f"  Performance info unavailable: {e}")
+
+_LICENSE_FIELDS = (
+    ("License", "license"),
+    ("Model card", "model_card"),
+    ("Tags", "tags", "None"),
+    ("Paper", "paper"),
+)
+
+def cmd_license(model_wrapper: ModelWrapper):
+    """Show model license information."""
+    config = getattr(model_wrapper.model, 'config', None)
+    if config is None:
+        sys.stdout.write("Model License Information:\n  License information not available\n")
+        return
+    sys.stdout.write("Model License Information:\n" + _field_lines(config, _LICENSE_FIELDS))
+
+_TRAINING_FIELDS = (
+    ("Training data", "training_data"),
+    ("Training objective", "training_objective"),
+    ("Training strategy", "training_strategy"),
+    ("Training steps", "training_steps"),
+    ("Learning rate", "learning_rate"),
+)
+
+def cmd_training(model_wrapper: ModelWrapper):
+    """Show training information."""
+    config = getattr(model_wrapper.model, 'config', None)
+    if config is None:
+        sys.stdout.write("Training Information:\n  Training information not available\n")
+        return
+    sys.stdout.write("Training Information:\n" + _field_lines(config, _TRAINING_FIELDS))
+
+def cmd_evaluation(model_wrapper: ModelWrapper):
+    """Show evaluation metrics."""
+    print("Evaluation Metrics:")
+    if model_wrapper.conversation_history:
+        stats = model_wrapper.get_stats()
+        total_turns = stats['total_turns']
+        total_user_chars, total_bot_chars = stats['total_user_chars'], stats['total_bot_chars']
+        total_user_tokens, total_bot_tokens = model_wrapper.token_totals()
+
+        print(f"  Total turns: {total_turns}")
+        print(f"  Average user message length: {total_user_chars / total_turns:.1f} characters")
+        print(f"  Average bot response length: {total_bot_chars / total_turns:.1f} characters")
+        print(f"  Average user tokens: {total_user_tokens / total_turns:.1f} tokens")
+        print(f"  Average bot tokens: {total_bot_tokens / total_turns:.1f} tokens")
+        print(f"  Total tokens used: {total_user_tokens + total_bot_tokens:,}")
+        print(f"  Response ratio (bot/user): {total_bot_chars / max(total_user_chars, 1):.2f}")
+    else:
+        print("  No conversation history available for evaluation")
+
+def cmd_usage(model_wrapper: ModelWrapper):
+    """Show usage statistics."""
+    print("Usage Statistics:")
+    stats = model_wrapper.get_stats()
+    print(f"  Total conversations: {stats['total_turns']}")
+    print(f"  Total user messages: {stats['total_user_chars']} characters")
+    print(f"  Total bot responses: {stats['total_bot_chars']} characters")
+    print(f"  Average response length: {stats.get('avg_bot_length', 0.0):.1f} characters")
+    print(f"  Model loaded at: {getattr(model_wrapper, '_load_time', 'Unknown')}")
+
+def cmd_version(model_wrapper: ModelWrapper):
+    """Show version information."""
+    print("Version Information:")
+    print(f"  MiniChat version: 2.0")
+    print(f"  Python version: {system_info().python_version}")
+    print(f"  PyTorch version: {torch.__version__}")
+    print(f"  Transformers version: {dependency_version('transformers') or 'Unknown'}")
+    print(f"  FastAPI version: {dependency_version('fastapi') or 'Unknown'}")
+
+def cmd_config(model_wrapper: ModelWrapper):
+    """Show model configuration."""
+    config = getattr(model_wrapper.model, 'config', None)
+    if config is None:
+        sys.stdout.write("Model Configuration:\n  Configuration not available\n")
+        return
+    sys.stdout.write(f"Model Configuration:\n  Model type: {type(config).__name__}\n"
+                     + _field_lines(config, _CONFIG_FIELDS))
+
+_CAPABILITY_FIELDS = (
+    ("Multilingual", "multilingual"),
+    ("Code generation", "code_generation"),
+    ("Reasoning", "reasoning"),
+    ("Creative writing", "creative_writing"),
+)
+
+def cmd_capabilities(model_wrapper: ModelWrapper):
+    """Show model capabilities."""
+    config = getattr(model_wrapper.model, 'config', None)
+    if config is None:
+        sys.stdout.write("Model Capabilities:\n  Capabilities information not available\n")
+        return
+    sys.stdout.write(
+        "Model Capabilities:\n  Text generation: Yes\n"
+        f"  Context length: {getattr(config, 'max_position_embeddings', 'Unknown')} tokens\n"
+        + _field_lines(config, _CAPABILITY_FIELDS)
+    )
+
+_SAFETY_TEXT = (
+    "Safety Information:\n"
+    "  Content filtering: Enabled\n"
+    f"  Banned keywords: {len(BANNED_WORDS)} words\n"
+    "  Safety checks: Active\n"
+    "  Harmful content: Blocked\n"
+    "  Ethical guidelines: Followed\n"
+)
+
+def cmd_environment(model_wrapper: ModelWrapper):
+    """Show environment information."""
+    print("Environment Information:")
+    print(f"  Operating system: {system_info().system} {system_info().release}")
+    print(f"  Python executable: {sys.executable}")
+    print(f"  Working directory: {os.getcwd()}")
+    print(f"  Environment variables: {len(os.environ)} variables")
+    print(f"  Process ID: {os.getpid()}")
+    print(f"  User: {os.getenv('USER', 'Unknown')}")
+
+def cmd_token_usage(model_wrapper: ModelWrapper):
+    """Show token usage statistics."""
+    print("Token Usage Statistics:")
+    if model_wrapper.conversation_history:
+        total_user_tokens, total_bot_tokens = model_wrapper.token_totals()
+        total_tokens = total_user_tokens + total_bot_tokens
+        print(f"  Total tokens used: {total_tokens:,}")
+        print(f"  User message tokens: {total_user_tokens:,}")
+        print(f"  Bot response tokens: {total_bot_tokens:,}")
+        print(f"  Average tokens per turn: {total_tokens / len(model_wrapper.conversation_history):.1f}")
+    else:
+        print("  No conversation history available")
+
+def cmd_generation(model_wrapper: ModelWrapper):
+    """Show generation history."""
+    print("Generation History:")
+    if model_wrapper.conversation_history:
+        print(f"  Total generations: {len(model_wrapper.conversation_history)}")
+        print(f"  First generation: {model_wrapper.conversation_history[0]['user'][:50]}...")
+        print(f"  Latest generation: {model_wrapper.conversation_history[-1]['user'][:50]}...")
+        print(f"  Generation time span: {len(model_wrapper.conversation_history)} turns")
+        print("  Recent generations:")
+        for i, turn in enumerate(last_turns(model_wrapper.conversation_history, 3), 1):
+            print(f"    {turn['user'][:40]}...")
+            print(f"       Bot: {turn['bot'][:40]}...")
+    else:
+        print("  No generation history available")
+
+def cmd_system(model_wrapper: ModelWrapper):
+    """Show detailed system information."""
+    sysinfo = system_info()
+    print("Detailed System Information:")
+    print(f"  Platform: {sysinfo.platform}")
+    print(f"  Machine: {sysinfo.machine}")
+    print(f"  Processor: {sysinfo.processor}")
+    print(f"  Python version: {sysinfo.python_version}")
+    print(f"  Python implementation: {sysinfo.python_implementation}")
+    print(f"  Python compiler: {sysinfo.python_compiler}")
+    print(f"  System: {sysinfo.system} {sysinfo.release}")
+    print(f"  Architecture: {sysinfo.architecture}")
+    print(f"  Node: {sysinfo.node}")
+
+def cmd_network(model_wrapper: ModelWrapper):
+    """Show network information."""
+    print("Network Information:")
+    try:
+        hostname, local_ip = local_address()
+        print(f"  Hostname: {hostname}")
+        print(f"  Local IP: {local_ip}")
+        print(f"  Port: 8000 (default)")
+        print(f"  Web interface: http://localhost:8000")
+        print(f"  WebSocket: ws://localhost:8000/ws/chat")
+    except Exception as e:
+        print(f"  Network info unavailable: {e}")
+
+def cmd_disk(model_wrapper: ModelWrapper):
+    """Show disk usage information."""
+    print("Disk Usage Information:")
+    try:
+        total, used, free = shutil.disk_usage(".")
+        print(f"  Current directory: {os.getcwd()}")
+        print(f"  Total space: {total // (1024**3):.1f} GB")
+        print(f"  Used space: {used // (1024**3):.1f} GB")
+        print(f"  Free space: {free // (1024**3):.1f} GB")
+        print(f"  Usage percentage: {(used / total) * 100:.1f}%")
+    except Exception as e:
+        print(f"  Disk info unavailable: {e}")
+
+def cmd_process(model_wrapper: ModelWrapper):
+    """Show process information."""
+    print("Process Information:")
+    if _psutil_missing():
+        return
+    try:
+        process = _OWN_PROCESS
+        print(f"  Process ID: {process.pid}")
+        print(f"  Process name: {process.name()}")
+        print(f"  Process status: {process.status()}")
+        print(f"  CPU percent: {process.cpu_percent()}%")
+        print(f"  Memory usage: {process.memory_info().rss // (1024**2):.1f} MB")
+        print(f"  Create time: {_OWN_PROCESS_STARTED}")
+    except Exception as e:
+        print(f"  Process info unavailable: {e}")
+
+def cmd_cache(model_wrapper: ModelWrapper):
+    """Show model cache information."""
+    print("Model Cache Information:")
+    try:
+        cache_dir = os.path.expanduser("~/.cache/huggingface")
+        if os.path.exists(cache_dir):
+            total, used, free = shutil.disk_usage(cache_dir)
+            print(f"  Cache directory: {cache_dir}")
+            print(f"  Cache size: {used // (1024**3):.1f} GB")
+            print(f"  Available space: {free // (1024**3):.1f} GB")
+
+            print(f"  Cached models: {count_cached_models(cache_dir)}")
+        else:
+            print("  Cache directory not found")
+    except Exception as e:
+        print(f"  Cache info unavailable: {e}")
+
+def cmd_deps(model_wrapper: ModelWrapper):
+    """Show dependencies information."""
+    print("Dependencies Information:")
+    deps = ['torch', 'transformers', 'fastapi', 'uvicorn', 'jinja2']
+    for dep in deps:
+        print(f"  {dep}: {dependency_version(dep) or 'Not installed'}")
+
+def cmd_security(model_wrapper: ModelWrapper):
+    """Show security information."""
+    print("Security Information:")
+    print(f"  Content filtering: {'Enabled' if safe_check('test') else 'Disabled'}")
+    print(f"  Banned keywords: {len(BANNED_WORDS)} words")
+    print(f"  Safety checks: Active")
+    print(f"  Harmful content: Blocked")
+    print(f"  Ethical guidelines: Followed")
+    print(f"  Model safety: {getattr(model_wrapper.model, 'safe', 'Unknown')}")
+    print(f"  Input validation: Active")
+    print(f"  Output filtering: Active")
+
+_TOKENIZER_FIELDS = (
+    ("Model max length", "model_max_length"),
+    ("Padding token", "pad_token", "None"),
+    ("EOS token", "eos_token", "None"),
+    ("BOS token", "bos_token", "None"),
+    ("UNK token", "unk_token", "None"),
+    ("CLS token", "cls_token", "None"),
+    ("SEP token", "sep_token", "None"),
+    ("MASK token", "mask_token", "None"),
+    ("Tokenizer type", "tokenizer_type"),
+    ("Clean up tokenization spaces", "clean_up_tokenization_spaces"),
+)
+
+def cmd_tokenizer(model_wrapper: ModelWrapper):
+    """Show tokenizer information."""
+    tokenizer = model_wrapper.tokenizer
+    if not tokenizer:
+        sys.stdout.write("Tokenizer Information:\n  Tokenizer not available\n")
+        return
+    sys.stdout.write(
+        f"Tokenizer Information:\n  Tokenizer class: {type(tokenizer).__name__}\n"
+        f"  Vocabulary size: {tokenizer.vocab_size}\n"
+        + _field_lines(tokenizer, _TOKENIZER_FIELDS)
+    )
+
+_HELP_CAT_TEXT = (
+    "Help by Category:\n"
+    "\n  SYSTEM COMMANDS:\n"
+    "    help, help-cat, exit, clear, time, date\n"
+    "\n  MODEL COMMANDS:\n"
+    "    model, models, switch, config, capabilities, model-info, tokenizer\n"
+    "\n  GENERATION COMMANDS:\n"
+    "    temp, topp, topk, prompt, params\n"
+    "\n  HISTORY COMMANDS:\n"
+    "    save, load, export, history, stats, usage, token-usage, generation\n"
+    "\n  SYSTEM INFO COMMANDS:\n"
+    "    version, info, system, environment, network, disk, process, cache, deps, memory, performance, security\n"
+)
+
+@functools.lru_cache(maxsize=None)
+def _debug_header() -> str:
+    """The part of the debug panel that can't change while the process runs, formatted once."""
+    sysinfo = system_info()
+    header = (
+        "Debugging Information:\n"
+        f"  Python version: {sys.version}\n"
+        f"  PyTorch version: {torch.__version__}\n"
+        f"  Transformers version: {dependency_version('transformers') or 'Unknown'}\n"
+        f"  FastAPI version: {dependency_version('fastapi') or 'Unknown'}\n"
+        f"  CUDA available: {sysinfo.cuda_available}\n"
+    )
+    if sysinfo.cuda_available:
+        header += f"  CUDA version: {sysinfo.cuda_version}\n  GPU count: {sysinfo.gpu_count}\n"
+    return header
+
+def cmd_debug(model_wrapper: ModelWrapper):
+    """Show debugging information."""
+    sysinfo = system_info()
+    sys.stdout.write(_debug_header())
+    if model_wrapper.gpu_properties is not None:
+        print(f"  Current GPU: {torch.cuda.current_device()}")
+    sys.stdout.write(
+        f"  MPS available: {sysinfo.mps_available}\n"
+        f"  Device: {model_wrapper.device}\n"
+        f"  Model loaded: {model_wrapper.model is not None}\n"
+        f"  Tokenizer loaded: {model_wrapper.tokenizer is not None}\n"
+        f"  Conversation history length: {len(model_wrapper.conversation_history)}\n"
+    )
+
+def cmd_status(model_wrapper: ModelWrapper):
+    """Show system status."""
+    print("System Status:")
+    if _psutil_missing():
+        return
+    try:
+        # CPU status
+        cpu_usage = cpu_percent()
+        cpu_count = psutil.cpu_count()
+        print(f"  CPU: {cpu_usage}% usage ({cpu_count} cores)")
+
+        # Memory status
+        memory = memory_summary()
+        print(f"  Memory: {memory.percent}% used ({memory.used // (1024**3):.1f}GB / {memory.total // (1024**3):.1f}GB)")
+
+        # Disk status
+        disk = psutil.disk_usage('.')
+        print(f"  Disk: {(disk.used / disk.total) * 100:.1f}% used ({disk.used // (1024**3):.1f}GB / {disk.total // (1024**3):.1f}GB)")
+
+        # Network status
+        network = psutil.net_io_counters()
+        print(f"  Network: {network.bytes_sent // (1024**2):.1f}MB sent, {network.bytes_recv // (1024**2):.1f}MB received")
+
+        # Model status
+        print(f"  Model: {model_wrapper.model_name} on {model_wrapper.device}")
+        print(f"  Conversations: {len(model_wrapper.conversation_history)}")
+
+    except Exception as e:
+        print(f"  Status info unavailable: {e}")
+
+def cmd_config_detail(model_wrapper: ModelWrapper):
+    """Show detailed configuration."""
+    sysinfo = system_info()
+    print("Detailed Configuration:")
+    print(f"  Default model: {DEFAULT_MODEL}")
+    print(f"  Default max new tokens: {DEFAULT_MAX_NEW_TOKENS}")
+    print(f"  Default device: {DEFAULT_DEVICE}")
+    print(f"  Default temperature: {DEFAULT_TEMPERATURE}")
+    print(f"  Default top-p: {DEFAULT_TOP_P}")
+    print(f"  Default top-k: {DEFAULT_TOP_K}")
+    print(f"  Default repetition penalty: {DEFAULT_REPETITION_PENALTY}")
+    print(f"  Default max length: {DEFAULT_MAX_LENGTH}")
+    print(f"  Client HTML path: {CLIENT_HTML_PATH}")
+    print(f"  Current working directory: {os.getcwd()}")
+    print(f"  Python executable: {sys.executable}")
+    print(f"  Platform: {sysinfo.platform}")
+    print(f"  Architecture: {sysinfo.architecture}")
+    print(f"  Machine: {sysinfo.machine}")
+    print(f"  Processor: {sysinfo.processor}")
+
+_CAPABILITIES_DETAIL_TEXT = (
+    "Detailed Capabilities:\n"
+    "  Text Generation:\n"
+    "    - Natural language processing\n"
+    "    - Context-aware responses\n"
+    "    - Multi-turn conversations\n"
+    "    - Creative writing\n"
+    "    - Technical explanations\n"
+    "  Language Support:\n"
+    "    - English (primary)\n"
+    "    - Multi-language support\n"
+    "    - Code generation\n"
+    "    - Mathematical reasoning\n"
+    "  Model Features:\n"
+    "    - Streaming responses\n"
+    "    - Parameter adjustment\n"
+    "    - Model switching\n"
+    "    - History management\n"
+    "    - Export functionality\n"
+    "  System Integration:\n"
+    "    - CLI interface\n"
+    "    - Web interface\n"
+    "    - WebSocket support\n"
+    "    - File operations\n"
+    "    - System monitoring\n"
+)
+
+_SAFETY_DETAIL_TEXT = (
+    "Detailed Safety Information:\n"
+    "  Content Filtering:\n"
+    "    - Keyword-based filtering\n"
+    "    - Harmful content detection\n"
+    "    - Inappropriate language blocking\n"
+    "    - Violence prevention\n"
+    "    - Illegal activity prevention\n"
+    "  Safety Measures:\n"
+    "    - Input validation\n"
+    "    - Output filtering\n"
+    "    - Ethical guidelines\n"
+    "    - Bias mitigation\n"
+    "    - Privacy protection\n"
+    "  Banned Categories:\n"
+    "    - Violence and harm\n"
+    "    - Illegal activities\n"
+    "    - Inappropriate content\n"
+    "    - Misinformation\n"
+    "    - Privacy violations\n"
+    "  Safety Features:\n"
+    "    - Real-time filtering\n"
+    "    - User notification\n"
+    "    - Content logging\n"
+    "    - Safety reporting\n"
+    "    - Continuous monitoring\n"
+)
+
+_PERFORMANCE_DETAIL_TEXT = (
+    "Detailed Performance Metrics:\n"
+    "  System Performance:\n"
+    "    - CPU utilization monitoring\n"
+    "    - Memory usage tracking\n"
+    "    - Disk I/O monitoring\n"
+    "    - Network performance\n"
+    "    - Process statistics\n"
+    "  Model Performance:\n"
+    "    - Inference speed\n"
+    "    - Token generation rate\n"
+    "    - Memory efficiency\n"
+    "    - GPU utilization\n"
+    "    - Model loading time\n"
+    "  User Experience:\n"
+    "    - Response time\n"
+    "    - Conversation flow\n"
+    "    - Error handling\n"
+    "    - System stability\n"
+    "    - Resource optimization\n"
+    "  Optimization Features:\n"
+    "    - Dynamic parameter adjustment\n"
+    "    - Model quantization support\n"
+    "    - Cache management\n"
+    "    - Background processing\n"
+    "    - Performance profiling\n"
+)
+
+def cmd_memory_detail(model_wrapper: ModelWrapper):
+    """Show detailed memory information."""
+    print("Detailed Memory Information:")
+    if _psutil_missing():
+        return
+    try:
+        # RAM details
+        memory = psutil.virtual_memory()
+        print("  RAM Memory:")
+        print(f"    Total: {memory.total // (1024**3):.1f} GB")
+        print(f"    Available: {memory.available // (1024**3):.1f} GB")
+        print(f"    Used: {memory.used // (1024**3):.1f} GB")
+        print(f"    Free: {memory.free // (1024**3):.1f} GB")
+        print(f"    Usage: {memory.percent}%")
+        print(f"    Active: {memory.active // (1024**3):.1f} GB")
+        print(f"    Inactive: {memory.inactive // (1024**3):.1f} GB")
+        print(f"    Wired: {getattr(memory, 'wired', 'N/A')}")
+
+        # Swap memory
+        swap = psutil.swap_memory()
+        print("  Swap Memory:")
+        print(f"    Total: {swap.total // (1024**3):.1f} GB")
+        print(f"    Used: {swap.used // (1024**3):.1f} GB")
+        print(f"    Free: {swap.free // (1024**3):.1f} GB")
+        print(f"    Usage: {swap.percent}%")
+
+        # GPU memory if available
+        gpu = gpu_memory(model_wrapper)
+        if gpu is not None:
+            print("  GPU Memory:")
+            gpu_total, gpu_allocated, gpu_cached = gpu
+            gpu_free = gpu_total - gpu_cached
+            print(f"    Total: {gpu_total // (1024**3):.1f} GB")
+            print(f"    Allocated: {gpu_allocated // (1024**3):.1f} GB")
+            print(f"    Cached: {gpu_cached // (1024**3):.1f} GB")
+            print(f"    Free: {gpu_free // (1024**3):.1f} GB")
+            print(f"    Usage: {(gpu_cached / gpu_total) * 100:.1f}%")
+
+    except Exception as e:
+        print(f"  Memory detail info unavailable: {e}")
+
+def cmd_network_detail(model_wrapper: ModelWrapper):
+    """Show detailed network information."""
+    print("Detailed Network Information:")
+    if _psutil_missing():
+        return
+    try:
+        # Hostname and IP
+        hostname, local_ip = local_address()
+        print("  Network Configuration:")
+        print(f"    Hostname: {hostname}")
+        print(f"    Local IP: {local_ip}")
+        print(f"    Default port: 8000")
+        print(f"    Web URL: http://{local_ip}:8000")
+        print(f"    WebSocket URL: ws://{local_ip}:8000/ws/chat")
+
+        # Network interfaces
+        net_if_addrs = psutil.net_if_addrs()
+        print("  Network Interfaces:")
+        for interface, addresses in net_if_addrs.items():
+            print(f"    {interface}:")
+            for addr in addresses:
+                if addr.family == socket.AF_INET:
+                    print(f"      IPv4: {addr.address}")
+                elif addr.family == socket.AF_INET6:
+                    print(f"      IPv6: {addr.address}")
+
+        # Network statistics
+        net_io = psutil.net_io_counters()
+        print("  Network Statistics:")
+        print(f"    Bytes sent: {net_io.bytes_sent // (1024**2):.1f} MB")
+        print(f"    Bytes received: {net_io.bytes_recv // (1024**2):.1f} MB")
+        print(f"    Packets sent: {net_io.packets_sent:,}")
+        print(f"    Packets received: {net_io.packets_recv:,}")
+        print(f"    Errors in: {net_io.errin}")
+        print(f"    Errors out: {net_io.errout}")
+        print(f"    Drops in: {net_io.dropin}")
+        print(f"    Drops out: {net_io.dropout}")
+
+    except Exception as e:
+        print(f"  Network detail info unavailable: {e}")
+
+# Virtual and in-memory filesystems whose usage says nothing about disk space
+_PSEUDO_FILESYSTEMS = frozenset({
+    "tmpfs", "devtmpfs", "squashfs", "overlay", "proc", "sysfs",
+    "cgroup", "cgroup2", "autofs", "devpts", "none",
+})
+
+def _safe_disk_usage(path: str):
+    """psutil.disk_usage(path), or None when the mount can't be read."""
+    try:
+        return psutil.disk_usage(path)
+    except PermissionError:
+        return None
+
+def cmd_disk_detail(model_wrapper: ModelWrapper):
+    """Show detailed disk information."""
+    print("Detailed Disk Information:")
+    if _psutil_missing():
+        return
+    try:
+        # Current directory
+        current_dir = os.getcwd()
+        print("  Current Directory:")
+        print(f"    Path: {current_dir}")
+
+        # Disk partitions; statvfs can block on slow or network mounts, so
+        # query them in parallel and wait for the slowest rather than the sum
+        partitions = [partition for partition in psutil.disk_partitions(all=False)
+                      if partition.fstype not in _PSEUDO_FILESYSTEMS]
+        print("  Disk Partitions:")
+        if partitions:
+            with ThreadPoolExecutor(max_workers=min(8, len(partitions))) as executor:
+                usages = list(executor.map(_safe_disk_usage, [partition.mountpoint for partition in partitions]))
+        else:
+            usages = []
+        for partition, usage in zip(partitions, usages):
+            if usage is None:
+                print(f"    {partition.device}: Access denied")
+                continue
+            print(f"    {partition.device}:")
+            print(f"      Mountpoint: {partition.mountpoint}")
+            print(f"      Filesystem: {partition.fstype}")
+            print(f"      Total: {usage.total // (1024**3):.1f} GB")
+            print(f"      Used: {usage.used // (1024**3):.1f} GB")
+            print(f"      Free: {usage.free // (1024**3):.1f} GB")
+            print(f"      Usage: {(usage.used / usage.total) * 100:.1f}%")
+
+        # Current directory usage
+        try:
+            # A plain statvfs via shutil; psutil's wrapper adds nothing here
+            current_usage = shutil.disk_usage(current_dir)
+            print("  Current Directory Usage:")
+            print(f"    Total: {current_usage.total // (1024**3):.1f} GB")
+            print(f"    Used: {current_usage.used // (1024**3):.1f} GB")
+            print(f"    Free: {current_usage.free // (1024**3):.1f} GB")
+            print(f"    Usage: {(current_usage.used / current_usage.total) * 100:.1f}%")
+        except PermissionError:
+            print("  Current directory usage: Access denied")
+
+        # Disk I/O statistics
+        disk_io = psutil.disk_io_counters()
+        if disk_io:
+            print("  Disk I/O Statistics:")
+            print(f"    Read count: {disk_io.read_count:,}")
+            print(f"    Write count: {disk_io.write_count:,}")
+            print(f"    Read bytes: {disk_io.read_bytes // (1024**3):.1f} GB")
+            print(f"    Write bytes: {disk_io.write_bytes // (1024**3):.1f} GB")
+            print(f"    Read time: {disk_io.read_time} ms")
+            print(f"    Write time: {disk_io.write_time} ms")
+
+    except Exception as e:
+        print(f"  Disk detail info unavailable: {e}")
+
+def cmd_process_detail(model_wrapper: ModelWrapper):
+    """Show detailed process information."""
+    print("Detailed Process Information:")
+    if _psutil_missing():
+        return
+    try:
+        # Current process
+        current_process = _OWN_PROCESS
+        print("  Current Process:")
+        print(f"    PID: {current_process.pid}")
+        print(f"    Name: {current_process.name()}")
+        print(f"    Status: {current_process.status()}")
+        print(f"    Create time: {_OWN_PROCESS_STARTED}")
+        print(f"    CPU percent: {current_process.cpu_percent()}%")
+
+        # Memory info
+        memory_info = current_process.memory_info()
+        print("  Memory Usage:")
+        print(f"    RSS: {memory_info.rss // (1024**2):.1f} MB")
+        print(f"    VMS: {memory_info.vms // (1024**2):.1f} MB")
+        print(f"    Percent: {current_process.memory_percent():.1f}%")
+
+        # CPU info
+        cpu_times = current_process.cpu_times()
+        print("  CPU Times:")
+        print(f"    User: {cpu_times.user:.2f}s")
+        print(f"    System: {cpu_times.system:.2f}s")
+        print(f"    Children user: {cpu_times.children_user:.2f}s")
+        print(f"    Children system: {cpu_times.children_system:.2f}s")
+
+        # Open files
+        try:
+            open_files = current_process.open_files()
+            print(f"  Open Files: {len(open_files)}")
+            for file in open_files[:5]:  # Show first 5
+                print(f"    {file.path}")
+            if len(open_files) > 5:
+                print(f"    ... and {len(open_files) - 5} more")
+        except (psutil.AccessDenied, psutil.ZombieProcess):
+            print("  Open Files: Access denied")
+
+        # Threads
+        try:
+            threads = current_process.threads()
+            print(f"  Threads: {len(threads)}")
+            for thread in threads[:5]:  # Show first 5
+                print(f"    Thread {thread.id}: {cpu_times.user:.2f}s user, {cpu_times.system:.2f}s system")
+            if len(threads) > 5:
+                print(f"    ... and {len(threads) - 5} more")
+        except (psutil.AccessDenied, psutil.ZombieProcess):
+            print("  Threads: Access denied")
+
+    except Exception as e:
+        print(f"  Process detail info unavailable: {e}")
+
+def cmd_cache_detail(model_wrapper: ModelWrapper):
+    """Show detailed cache information."""
+    print("Detailed Cache Information:")
+    try:
+        # Transformers cache directory
+        cache_dir = hf_cache_dir()
+        print("  Transformers Cache:")
+        print(f"    Directory: {cache_dir}")
+
+        if os.path.exists(cache_dir):
+            # Cache size
+            total_size, file_count, model_count = cache_dir_stats(cache_dir)
+            print(f"    Total size: {total_size // (1024**3):.1f} GB")
+            print(f"    File count: {file_count:,}")
+            print(f"    Model count: {model_count}")
+
+            # Available space
+            disk_usage = shutil.disk_usage(cache_dir)
+            print(f"    Available space: {disk_usage.free // (1024**3):.1f} GB")
+            print(f"    Usage percentage: {(disk_usage.used / disk_usage.total) * 100:.1f}%")
+        else:
+            print("    Directory does not exist")
+
+        # PyTorch cache
+        gpu = gpu_memory(model_wrapper)
+        if gpu is not None:
+            gpu_total, gpu_allocated, gpu_cached = gpu
+            print("  PyTorch CUDA Cache:")
+            print(f"    Memory allocated: {gpu_allocated // (1024**3):.1f} GB")
+            print(f"    Memory cached: {gpu_cached // (1024**3):.1f} GB")
+            print(f"    Max memory: {torch.cuda.max_memory_allocated(0) // (1024**3):.1f} GB")
+
+            # Cache settings
+            print("  Cache Settings:")
+            # Only report on the caching allocator; emptying it here would
+            # sync the device and make the next generation re-allocate
+            print("    Empty cache on exit: No")
+            print(f"    Allocation retries: {torch.cuda.memory_stats(0).get('num_alloc_retries', 0)}")
+            print(f"    Memory fraction: {gpu_total // (1024**3):.1f} GB")
+
+        # System temp directory
+        temp_dir = os.environ.get('TMPDIR', '/tmp')
+        if os.path.exists(temp_dir):
+            try:
+                temp_usage = shutil.disk_usage(temp_dir)
+                print("  System Temp Directory:")
+                print(f"    Path: {temp_dir}")
+                print(f"    Available: {temp_usage.free // (1024**3):.1f} GB")
+                print(f"    Usage: {(temp_usage.used / temp_usage.total) * 100:.1f}%")
+            except PermissionError:
+                pass
+
+    except Exception as e:
+        print(f"  Cache detail info unavailable: {e}")
+
+def cmd_deps_detail(model_wrapper: ModelWrapper):
+    """Show detailed dependencies information."""
+    sysinfo = system_info()
+    print("Detailed Dependencies Information:")
+    try:
+        # Core dependencies
+        core_deps = ['torch', 'transformers', 'fastapi', 'uvicorn', 'jinja2']
+        print("  Core Dependencies:")
+        for dep in core_deps:
+            try:
+                dist = importlib.metadata.distribution(dep)
+                print(f"    {dep}: {dist.version}")
+                print(f"      Location: {dist.locate_file('')}")
+                # Only what every install pulls in, not optional extras
+                requires = [req for req in dist.requires or [] if "extra ==" not in req]
+                print(f"      Requires: {', '.join(requires) if requires else 'None'}")
+            except importlib.metadata.PackageNotFoundError:
+                print(f"    {dep}: Not installed")
+
+        # PyTorch specific info
+        if dependency_version('torch') is not None:
+            print("  PyTorch Details:")
+            print(f"    Version: {torch.__version__}")
+            print(f"    CUDA available: {sysinfo.cuda_available}")
+            if sysinfo.cuda_available:
+                print(f"    CUDA version: {sysinfo.cuda_version}")
+                print(f"    cuDNN version: {torch.backends.cudnn.version()}")
+                print(f"    GPU count: {sysinfo.gpu_count}")
+            print(f"    MPS available: {sysinfo.mps_available}")
+            print(f"    OpenMP available: {torch.backends.openmp.is_available()}")
+
+        # Transformers and FastAPI specific info, read from their metadata so
+        # the CLI never imports the web stack just to print a version
+        for dep, title in (('transformers', "Transformers"), ('fastapi', "FastAPI")):
+            dep_version = dependency_version(dep)
+            if dep_version is not None:
+                print(f"  {title} Details:")
+                print(f"    Version: {dep_version}")
+
+        # System dependencies
+        print("  System Dependencies:")
+        print(f"    psutil: {dependency_version('psutil') or 'Not available'}")
+
+        # Python environment
+        print("  Python Environment:")
+        print(f"    Python version: {sys.version}")
+        print(f"    Executable: {sys.executable}")
+        print(f"    Platform: {sysinfo.platform}")
+        print(f"    Architecture: {sysinfo.architecture}")
+
+    except Exception as e:
+        print(f"  Dependencies detail info unavailable: {e}")
+
+def cmd_system_overview(model_wrapper: ModelWrapper):
+    """Show comprehensive system overview."""
+    sysinfo = system_info()
+    print("Comprehensive System Overview:")
+    print("=" * 50)
+
+    # System information
+    print("  SYSTEM INFORMATION:")
+    print(f"    OS: {sysinfo.system} {sysinfo.release}")
+    print(f"    Platform: {sysinfo.platform}")
+    print(f"    Architecture: {sysinfo.architecture}")
+    print(f"    Machine: {sysinfo.machine}")
+    print(f"    Processor: {sysinfo.processor}")
+    print(f"    Python: {sysinfo.python_version}")
+    print(f"    Working Directory: {os.getcwd()}")
+
+    # Hardware information
+    if psutil is not None:
+        print("\n  HARDWARE INFORMATION:")
+        print(f"    CPU Cores: {psutil.cpu_count()}")
+        print(f"    CPU Usage: {cpu_percent()}%")
+
+        memory = memory_summary()
+        print(f"    RAM Total: {memory.total // (1024**3):.1f} GB")
+        print(f"    RAM Used: {memory.used // (1024**3):.1f} GB ({memory.percent}%)")
+
+        disk = psutil.disk_usage('.')
+        print(f"    Disk Total: {disk.total // (1024**3):.1f} GB")
+        print(f"    Disk Used: {disk.used // (1024**3):.1f} GB ({(disk.used / disk.total) * 100:.1f}%)")
+
+        if model_wrapper.gpu_properties is not None:
+            print(f"    GPU: {model_wrapper.gpu_properties.name}")
+            print(f"    GPU Memory: {model_wrapper.gpu_properties.total_memory // (1024**3):.1f} GB")
+    else:
+        print("\n  HARDWARE INFORMATION: psutil not available")
+
+    # Model information
+    print("\n  MODEL INFORMATION:")
+    print(f"    Current Model: {model_wrapper.model_name}")
+    print(f"    Device: {model_wrapper.device}")
+    print(f"    Temperature: {model_wrapper.temperature}")
+    print(f"    Top-p: {model_wrapper.top_p}")
+    print(f"    Top-k: {model_wrapper.top_k}")
+    print(f"    Repetition Penalty: {model_wrapper.repetition_penalty}")
+    print(f"    Conversations: {len(model_wrapper.conversation_history)}")
+
+    # Network information
+    try:
+        hostname, local_ip = local_address()
+        print("\n  NETWORK INFORMATION:")
+        print(f"    Hostname: {hostname}")
+        print(f"    Local IP: {local_ip}")
+        print(f"    Web URL: http://{local_ip}:8000")
+        print(f"    WebSocket: ws://{local_ip}:8000/ws/chat")
+    except Exception:
+        print("\n  NETWORK INFORMATION: Unable to retrieve")
+
+    # Performance summary
+    print("\n  PERFORMANCE SUMMARY:")
+    print(f"    Model Loaded: {'Yes' if model_wrapper.model else 'No'}")
+    print(f"    Tokenizer Loaded: {'Yes' if model_wrapper.tokenizer else 'No'}")
+    print(f"    CUDA Available: {'Yes' if sysinfo.cuda_available else 'No'}")
+    print(f"    MPS Available: {'Yes' if sysinfo.mps_available else 'No'}")
+
+    print("=" * 50)
+
+# Word commands whose output never changes, encoded once at import and
+# written straight to the byte stream instead of through run_command()
+STATIC_PANELS: Dict[str, bytes] = {
+    name: text.encode("utf-8")
+    for name, text in (
+        ("help", _HELP_TEXT),
+        ("help-cat", _HELP_CAT_TEXT),
+        ("safety", _SAFETY_TEXT),
+        ("capabilities-detail", _CAPABILITIES_DETAIL_TEXT),
+        ("safety-detail", _SAFETY_DETAIL_TEXT),
+        ("performance-detail", _PERFORMANCE_DETAIL_TEXT),
+    )
+}
+
+# Word commands, looked up by the lowercased input
+COMMANDS: Dict[str, Callable[[ModelWrapper], None]] = {
+    "clear": cmd_clear,
+    "history": cmd_history,
+    "settings": cmd_settings,
+    "stats": cmd_stats,
+    "models": cmd_models,
+    "info": cmd_info,
+    "context": cmd_context,
+    "reset": cmd_reset,
+    "tokens": cmd_tokens,
+    "memory": cmd_memory,
+    "pwd": cmd_pwd,
+    "time": cmd_time,
+    "date": cmd_time,
+    "params": cmd_params,
+    "model-info": cmd_model_info,
+    "performance": cmd_performance,
+    "license": cmd_license,
+    "training": cmd_training,
+    "evaluation": cmd_evaluation,
+    "usage": cmd_usage,
+    "version": cmd_version,
+    "config": cmd_config,
+    "capabilities": cmd_capabilities,
+    "environment": cmd_environment,
+    "token-usage": cmd_token_usage,
+    "generation": cmd_generation,
+    "system": cmd_system,
+    "network": cmd_network,
+    "disk": cmd_disk,
+    "process": cmd_process,
+    "cache": cmd_cache,
+    "deps": cmd_deps,
+    "security": cmd_security,
+    "tokenizer": cmd_tokenizer,
+    "debug": cmd_debug,
+    "status": cmd_status,
+    "config-detail": cmd_config_detail,
+    "memory-detail": cmd_memory_detail,
+    "network-detail": cmd_network_detail,
+    "disk-detail": cmd_disk_detail,
+    "process-detail": cmd_process_detail,
+    "cache-detail": cmd_cache_detail,
+    "deps-detail": cmd_deps_detail,
+    "system-overview": cmd_system_overview,
+}
+# Commands taking an argument ("temp 0.7"), looked up by their first word and
+# passed the text after it
+PREFIX_COMMANDS: Dict[str, Callable[[ModelWrapper, str], None]] = {
+    "prompt": cmd_prompt,
+    "export": cmd_export,
+    "model": cmd_model,
+    "switch": cmd_model,
+    "temp": cmd_temp,
+    "topp": cmd_topp,
+    "topk": cmd_topk,
+    "save": cmd_save,
+    "load": cmd_load,
+}
+
+# Handlers that load a model: their progress lines must show before the
+# (many-second) load, so they print straight to the terminal
+UNBUFFERED_COMMANDS: FrozenSet[Callable] = frozenset({cmd_reset, cmd_model})
+
+def run_command(handler: Callable, *args):
+    """
+    Run a CLI command handler with its prints buffered, so the whole panel
+    reaches the terminal in one write instead of one write per line.
+    """
+    if handler in UNBUFFERED_COMMANDS:
+        handler(*args)
+        return
+    buffer = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(buffer):
+            handler(*args)
+    finally:
+        sys.stdout.write(buffer.getvalue())
+        sys.stdout.flush()
+
+def write_panel(data: bytes):
+    """Write a pre-encoded panel in one call, below the text layer when stdout has one."""
+    stream = getattr(sys.stdout, "buffer", None)
+    if stream is None:
+        sys.stdout.write(data.decode("utf-8"))
+        sys.stdout.flush()
+        return
+    # Anything still in the text layer must go out first to keep the order
+    sys.stdout.flush()
+    stream.write(data)
+    stream.flush()
+
+def get_command(prompt: str = "\nYou: ") -> Optional[str]:
+    """
+    Wait for the next line of input; None once stdin is closed. input() sleeps
+    in a blocking read, so an idle REPL uses no CPU and no polling is needed.
+    """
+    try:
+        return input(prompt).strip()
+    except EOFError:
+        return None
+
+def run_cli(model_wrapper: ModelWrapper):
+    sys.stdout.write(
+        "MiniChat CLI — type 'exit' or Ctrl-C to quit.\n"
+        f"Using model: {model_wrapper.model_name} on {model_wrapper.device}\n"
+        f"Temperature: {model_wrapper.temperature}, Top-p: {model_wrapper.top_p}, Top-k: {model_wrapper.top_k}\n"
+        "Commands: 'help', 'clear', 'history', 'settings', 'exit'\n"
+    )
+    
+    try:
+        while True:
+            user = get_command()
+            if user is None:
+                print("\nGoodbye.")
+                break
+            command, _, arg = user.partition(" ")
+            command, arg = command.lower(), arg.strip()
+            if not arg and command in ("exit", "quit"):
+                print("Goodbye.")
+                break
+            if not user:
                 continue
-            if user.lower() == "cache-detail":
-                print("Detailed Cache Information:")
-                try:
-                    # Transformers cache directory
-                    from transformers import file_utils
-                    cache_dir = file_utils.default_cache_path
-                    print("  Transformers Cache:")
-                    print(f"    Directory: {cache_dir}")
-                    
-                    if os.path.exists(cache_dir):
-                        # Cache size
-                        total_size = 0
-                        file_count = 0
-                        model_count = 0
-                        
-                        for root, dirs, files in os.walk(cache_dir):
-                            for file in files:
-                                try:
-                                    file_path = os.path.join(root, file)
-                                    total_size += os.path.getsize(file_path)
-                                    file_count += 1
-                                except (OSError, PermissionError):
-                                    pass
-                            
-                            # Count model directories
-                            for dir_name in dirs:
-                                if any(keyword in dir_name.lower() for keyword in ['model', 'tokenizer', 'config']):
-                                    model_count += 1
-                        
-                        print(f"    Total size: {total_size // (1024**3):.1f} GB")
-                        print(f"    File count: {file_count:,}")
-                        print(f"    Model count: {model_count}")
-                        
-                        # Available space
-                        try:
-                            import psutil
-                            disk_usage = psutil.disk_usage(cache_dir)
-                            print(f"    Available space: {disk_usage.free // (1024**3):.1f} GB")
-                            print(f"    Usage percentage: {(disk_usage.used / disk_usage.total) * 100:.1f}%")
-                        except ImportError:
-                            pass
-                    else:
-                        print("    Directory does not exist")
-                    
-                    # PyTorch cache
-                    if torch.cuda.is_available():
-                        print("  PyTorch CUDA Cache:")
-                        print(f"    Memory allocated: {torch.cuda.memory_allocated(0) // (1024**3):.1f} GB")
-                        print(f"    Memory cached: {torch.cuda.memory_reserved(0) // (1024**3):.1f} GB")
-                        print(f"    Max memory: {torch.cuda.max_memory_allocated(0) // (1024**3):.1f} GB")
-                        
-                        # Cache settings
-                        print("  Cache Settings:")
-                        print(f"    Empty cache on exit: {torch.cuda.empty_cache()}")
-                        print(f"    Memory fraction: {torch.cuda.get_device_properties(0).total_memory // (1024**3):.1f} GB")
-                    
-                    # System temp directory
-                    temp_dir = os.environ.get('TMPDIR', '/tmp')
-                    if os.path.exists(temp_dir):
-                        try:
-                            temp_usage = psutil.disk_usage(temp_dir)
-                            print("  System Temp Directory:")
-                            print(f"    Path: {temp_dir}")
-                            print(f"    Available: {temp_usage.free // (1024**3):.1f} GB")
-                            print(f"    Usage: {(temp_usage.used / temp_usage.total) * 100:.1f}%")
-                        except (ImportError, PermissionError):
-                            pass
-                    
-                except ImportError:
-                    print("  Transformers not available")
-                except Exception as e:
-                    print(f"  Cache detail info unavailable: {e}")
+            # Word commands are the whole input; argument commands are "<word> <arg>"
+            # and get an empty arg (and print their usage) when typed alone
+            panel = STATIC_PANELS.get(command) if not arg else None
+            if panel is not None:
+                write_panel(panel)
                 continue
-            if user.lower() == "deps-detail":
-                print("Detailed Dependencies Information:")
-                try:
-                    import pkg_resources
-                    
-                    # Core dependencies
-                    core_deps = ['torch', 'transformers', 'fastapi', 'uvicorn', 'jinja2']
-                    print("  Core Dependencies:")
-                    for dep in core_deps:
-                        try:
-                            dist = pkg_resources.get_distribution(dep)
-                            print(f"    {dep}: {dist.version}")
-                            print(f"      Location: {dist.location}")
-                            print(f"      Requires: {', '.join(dist.requires()) if dist.requires() else 'None'}")
-                        except pkg_resources.DistributionNotFound:
-                            print(f"    {dep}: Not installed")
-                    
-                    # PyTorch specific info
-                    if 'torch' in [pkg.key for pkg in pkg_resources.working_set]:
-                        print("  PyTorch Details:")
-                        print(f"    Version: {torch.__version__}")
-                        print(f"    CUDA available: {torch.cuda.is_available()}")
-                        if torch.cuda.is_available():
-                            print(f"    CUDA version: {torch.version.cuda}")
-                            print(f"    cuDNN version: {torch.backends.cudnn.version()}")
-                            print(f"    GPU count: {torch.cuda.device_count()}")
-                        print(f"    MPS available: {hasattr(torch.backends, 'mps') and torch.backends.mps.is_available()}")
-                        print(f"    OpenMP available: {torch.backends.openmp.is_available()}")
-                    
-                    # Transformers specific info
-                    if 'transformers' in [pkg.key for pkg in pkg_resources.working_set]:
-                        print("  Transformers Details:")
-                        try:
-                            from transformers import __version__ as tf_version
-                            print(f"    Version: {tf_version}")
-                        except ImportError:
-                            print("    Version: Unknown")
-                    
-                    # FastAPI specific info
-                    if 'fastapi' in [pkg.key for pkg in pkg_resources.working_set]:
-                        print("  FastAPI Details:")
-                        try:
-                            from fastapi import __version__ as fa_version
-                            print(f"    Version: {fa_version}")
-                        except ImportError:
-                            print("    Version: Unknown")
-                    
-                    # System dependencies
-                    print("  System Dependencies:")
-                    try:
-                        import psutil
-                        print(f"    psutil: {psutil.__version__}")
-                    except (ImportError, AttributeError):
-                        print("    psutil: Not available")
-                    
-                    # Python environment
-                    print("  Python Environment:")
-                    print(f"    Python version: {sys.version}")
-                    print(f"    Executable: {sys.executable}")
-                    print(f"    Platform: {platform.platform()}")
-                    print(f"    Architecture: {platform.architecture()}")
-                    
-                except ImportError:
-                    print("  pkg_resources not available")
-                except Exception as e:
-                    print(f"  Dependencies detail info unavailable: {e}")
+            handler = COMMANDS.get(command) if not arg else None
+            if handler is not None:
+                run_command(handler, model_wrapper)
                 continue
-            if user.lower() == "system-overview":
-                print("Comprehensive System Overview:")
-                print("=" * 50)
-                
-                # System information
-                print("  SYSTEM INFORMATION:")
-                print(f"    OS: {platform.system()} {platform.release()}")
-                print(f"    Platform: {platform.platform()}")
-                print(f"    Architecture: {platform.architecture()}")
-                print(f"    Machine: {platform.machine()}")
-                print(f"    Processor: {platform.processor()}")
-                print(f"    Python: {sys.version.split()[0]}")
-                print(f"    Working Directory: {os.getcwd()}")
-                
-                # Hardware information
-                try:
-                    import psutil
-                    print("\n  HARDWARE INFORMATION:")
-                    print(f"    CPU Cores: {psutil.cpu_count()}")
-                    print(f"    CPU Usage: {psutil.cpu_percent(interval=1)}%")
-                    
-                    memory = psutil.virtual_memory()
-                    print(f"    RAM Total: {memory.total // (1024**3):.1f} GB")
-                    print(f"    RAM Used: {memory.used // (1024**3):.1f} GB ({memory.percent}%)")
-                    
-                    disk = psutil.disk_usage('.')
-                    print(f"    Disk Total: {disk.total // (1024**3):.1f} GB")
-                    print(f"    Disk Used: {disk.used // (1024**3):.1f} GB ({(disk.used / disk.total) * 100:.1f}%)")
-                    
-                    if torch.cuda.is_available():
-                        gpu_props = torch.cuda.get_device_properties(0)
-                        print(f"    GPU: {gpu_props.name}")
-                        print(f"    GPU Memory: {gpu_props.total_memory // (1024**3):.1f} GB")
-                except ImportError:
-                    print("\n  HARDWARE INFORMATION: psutil not available")
-                
-                # Model information
-                print("\n  MODEL INFORMATION:")
-                print(f"    Current Model: {model_wrapper.model_name}")
-                print(f"    Device: {model_wrapper.device}")
-                print(f"    Temperature: {model_wrapper.temperature}")
-                print(f"    Top-p: {model_wrapper.top_p}")
-                print(f"    Top-k: {model_wrapper.top_k}")
-                print(f"    Repetition Penalty: {model_wrapper.repetition_penalty}")
-                print(f"    Conversations: {len(model_wrapper.conversation_history)}")
-                
-                # Network information
-                try:
-                    hostname = socket.gethostname()
-                    local_ip = socket.gethostbyname(hostname)
-                    print("\n  NETWORK INFORMATION:")
-                    print(f"    Hostname: {hostname}")
-                    print(f"    Local IP: {local_ip}")
-                    print(f"    Web URL: http://{local_ip}:8000")
-                    print(f"    WebSocket: ws://{local_ip}:8000/ws/chat")
-                except Exception:
-                    print("\n  NETWORK INFORMATION: Unable to retrieve")
-                
-                # Performance summary
-                print("\n  PERFORMANCE SUMMARY:")
-                print(f"    Model Loaded: {'Yes' if model_wrapper.model else 'No'}")
-                print(f"    Tokenizer Loaded: {'Yes' if model_wrapper.tokenizer else 'No'}")
-                print(f"    CUDA Available: {'Yes' if torch.cuda.is_available() else 'No'}")
-                print(f"    MPS Available: {'Yes' if hasattr(torch.backends, 'mps') and torch.backends.mps.is_available() else 'No'}")
-                
-                print("=" * 50)
+            handler = PREFIX_COMMANDS.get(command)
+            if handler is not None:
+                run_command(handler, model_wrapper, arg)
                 continue
             if not safe_check(user):
                 print("Bot: Sorry, I can't help with that.")
                 continue
             
             print("Bot: Thinking...", end="", flush=True)
-            prompt = model_wrapper.get_context_prompt(user)
-            reply = model_wrapper.generate(prompt)
+            reply = model_wrapper.chat(user)
             print("\rBot:", reply)
             
             # Update history
@@ -1770,46 +3160,245 @@ def run_cli(model_wrapper: ModelWrapper):
 # ---------------------------
 # Web (FastAPI) Chat
 # ---------------------------
+class BatchScheduler:
+    """
+    Collects prompts from concurrent WebSocket clients and runs them through
+    the model in batches of up to max_batch_size, waiting at most max_wait_ms
+    for a batch to fill. A prompt that runs alone is streamed token by token
+    to its on_text callback; batched replies are delivered in one piece.
+
+    active_clients, if given, returns how many clients are connected. Each
+    client has at most one prompt in flight, so a batch never waits for more
+    prompts than that, and a lone client's turn starts without any wait.
+    """
+    def __init__(self, model_wrapper: ModelWrapper, max_batch_size: int = MAX_BATCH_SIZE,
+                 max_wait_ms: int = MAX_BATCH_WAIT_MS,
+                 active_clients: Optional[Callable[[], int]] = None):
+        self.model_wrapper = model_wrapper
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.active_clients = active_clients
+        self.queue: Optional[asyncio.Queue] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self.queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    async def submit(self, session: ChatSession, text: str,
+                     on_text: Optional[Callable[[str], None]] = None) -> str:
+        """Queue a user message for a session and wait for its reply."""
+        fut = asyncio.get_running_loop().create_future()
+        await self.queue.put((session, text, on_text, fut))
+        return await fut
+
+    def _stream_one(self, loop, session: ChatSession, text: str, on_text: Callable[[str], None],
+                    fut: asyncio.Future) -> List[str]:
+        """
+        Worker-thread side of a single streamed turn. Stops generating once
+        fut is cancelled (the client went away).
+        """
+        chunks = []
+        with contextlib.closing(self.model_wrapper.chat_stream(text, session)) as stream:
+            for chunk in stream:
+                if fut.cancelled():
+                    break
+                chunks.append(chunk)
+                loop.call_soon_threadsafe(on_text, chunk)
+        return ["".join(chunks).strip()]
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.max_wait
+            batch_size = self.max_batch_size
+            if self.active_clients is not None:
+                batch_size = min(batch_size, self.active_clients())
+            while len(batch) < batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                # Run blocking model generate on the model thread to avoid blocking event loop
+                if len(batch) == 1 and batch[0][2] is not None:
+                    session, text, on_text, fut = batch[0]
+                    replies = await self.model_wrapper.run_model(self._stream_one, loop, session, text, on_text, fut)
+                else:
+                    sessions = [session for session, _, _, _ in batch]
+                    texts = [text for _, text, _, _ in batch]
+                    replies = await self.model_wrapper.run_model(self.model_wrapper.chat_batch, sessions, texts)
+                    for (_, _, on_text, _), reply in zip(batch, replies):
+                        if on_text is not None:
+                            on_text(reply)
+            except Exception as e:
+                for _, _, _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                continue
+            for (_, _, _, fut), reply in zip(batch, replies):
+                if not fut.done():
+                    fut.set_result(reply)
+
+async def send_reply_stream(ws: "WebSocket", deltas: asyncio.Queue):
+    """
+    Forward reply text from deltas to the client until a None arrives. The first
+    chunk is sent immediately; later chunks are coalesced for STREAM_FLUSH_MS
+    to save WebSocket frames.
+    """
+    first = True
+    while True:
+        chunk = await deltas.get()
+        if chunk is None:
+            break
+        done = False
+        if not first:
+            await asyncio.sleep(STREAM_FLUSH_MS / 1000)
+            parts = [chunk]
+            while not deltas.empty():
+                more = deltas.get_nowait()
+                if more is None:
+                    done = True
+                    break
+                parts.append(more)
+            chunk = "".join(parts)
+        first = False
+        if chunk:
+            await ws.send_text(json.dumps({"type": "delta", "text": chunk}))
+        if done:
+            break
+    await ws.send_text(json.dumps({"type": "end"}))
+
+def release_idle_caches(sessions: "OrderedDict[int, ChatSession]", keep: int = MAX_CACHED_SESSIONS):
+    """
+    Drop the KV caches of all but the keep most recently active sessions, so
+    idle clients don't hold GPU memory. Their token ids stay; the next turn
+    prefills from them (starting from the shared system prompt cache).
+    """
+    for session in islice(sessions.values(), max(len(sessions) - keep, 0)):
+        session.past_key_values = None
+
 def create_app(model_wrapper: ModelWrapper):
+    from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+    from fastapi.responses import JSONResponse, Response
     app = FastAPI()
-    # For a single-process simple server we keep a global chat_history per process
-    # In production you'd want per-user session storage, DB, authentication, etc.
-    app.state.chat_history = ""
+    scheduler = BatchScheduler(model_wrapper, active_clients=lambda: len(app.state.sessions))
+    # One ChatSession (token ids + KV cache) per connected client, kept in memory,
+    # least recently active first. In production you'd want persistent session
+    # storage, authentication, etc.
+    app.state.sessions = OrderedDict()
+
+    @app.on_event("startup")
+    async def start_scheduler():
+        scheduler.start()
+
+    @app.on_event("shutdown")
+    async def stop_scheduler():
+        await scheduler.stop()
 
     @app.get("/")
-    def index():
-        if not os.path.exists(CLIENT_HTML_PATH):
-            write_client_html(CLIENT_HTML_PATH)
-        with open(CLIENT_HTML_PATH, "r", encoding="utf-8") as f:
-            return HTMLResponse(f.read())
+    def index(request: Request):
+        gzipped = "gzip" in request.headers.get("accept-encoding", "")
+        etag = _CLIENT_HTML_GZ_ETAG if gzipped else _CLIENT_HTML_ETAG
+        headers = {"Cache-Control": "public, max-age=3600", "Vary": "Accept-Encoding", "ETag": etag}
+        if etag in request.headers.get("if-none-match", ""):
+            return Response(status_code=304, headers=headers)
+        if gzipped:
+            headers["Content-Encoding"] = "gzip"
+            return Response(_CLIENT_HTML_GZ, media_type="text/html", headers=headers)
+        return Response(_CLIENT_HTML_BYTES, media_type="text/html", headers=headers)
+
+    @app.get("/health")
+    def health():
+        if model_wrapper.ready:
+            return {"status": "ready", "model": model_wrapper.model_name}
+        return JSONResponse({"status": "loading", "model": model_wrapper.model_name}, status_code=503)
 
     @app.websocket("/ws/chat")
     async def websocket_chat(ws: WebSocket):
         await ws.accept()
-        print("[INFO] WebSocket client connected.")
+        logger.debug("WebSocket client connected.")
+        session = app.state.sessions[id(ws)] = ChatSession()
+        reply = None
         try:
+            if not model_wrapper.ready:
+                await ws.send_text(json.dumps({"type": "status", "text": "Model is loading, please wait..."}))
+                # On the (idle while loading) model thread, so clients connecting
+                # during the load queue there instead of each holding a pool thread
+                await model_wrapper.run_model(model_wrapper.wait_ready)
+                await ws.send_text(json.dumps({"type": "status", "text": "Model ready"}))
             while True:
                 data = await ws.receive_text()
+                if not data.strip():
+                    # Empty turn: end the (empty) reply without queueing any model work
+                    await ws.send_text(json.dumps({"type": "end"}))
+                    continue
+                app.state.sessions.move_to_end(id(ws))
+                release_idle_caches(app.state.sessions)
+                deltas = asyncio.Queue()
                 if not safe_check(data):
-                    await ws.send_text("SYSTEM: Blocked content.")
+                    deltas.put_nowait("SYSTEM: Blocked content.")
+                    deltas.put_nowait(None)
+                    await send_reply_stream(ws, deltas)
                     continue
-                # Build prompt using stored chat history (process-level)
-                prompt = app.state.chat_history + "\nUser: " + data + "\nAssistant:"
-                # Run blocking model generate in thread pool to avoid blocking event loop
-                reply = await asyncio.to_thread(model_wrapper.generate, prompt)
-                app.state.chat_history += "\nUser: " + data + "\nAssistant: " + reply
-                await ws.send_text(reply)
+                # Batched with other clients' turns by the scheduler; streamed when run alone.
+                # Tokenizing and the reply cache lookup happen there, on the model thread
+                reply = asyncio.ensure_future(scheduler.submit(session, data, deltas.put_nowait))
+                reply.add_done_callback(lambda _: deltas.put_nowait(None))
+                await send_reply_stream(ws, deltas)
+                await reply
         except WebSocketDisconnect:
-            print("[INFO] WebSocket client disconnected.")
+            logger.debug("WebSocket client disconnected.")
         except Exception as e:
-            print("[ERROR] WebSocket error:", e)
+            logger.error(f"WebSocket error: {e}")
             try:
                 await ws.close()
             except Exception:
                 pass
+        finally:
+            if reply is not None:
+                # Stop a reply still being generated for this client
+                reply.cancel()
+            app.state.sessions.pop(id(ws), None)
 
     return app
 
+def build_app() -> "FastAPI":
+    """
+    App factory for multi-worker serving: each uvicorn worker process loads
+    its own model from the settings main() put in MINICHAT_SETTINGS. Chat
+    sessions live in the worker that accepted the WebSocket.
+    """
+    settings = json.loads(os.environ["MINICHAT_SETTINGS"])
+    setup_logging(settings.pop("verbose", False))
+    torch.set_grad_enabled(False)
+    return create_app(ModelWrapper(**settings, background_load=True))
+
+def server_options(verbose: bool = False) -> dict:
+    """uvicorn options shared by single- and multi-worker serving."""
+    # uvloop/httptools come with uvicorn[standard]; fall back to the pure-Python stack without them
+    loop = "uvloop" if importlib.util.find_spec("uvloop") else "asyncio"
+    http = "httptools" if importlib.util.find_spec("httptools") else "h11"
+    ws = "websockets" if importlib.util.find_spec("websockets") else "wsproto"
+    logger.info(f"Event loop: {loop}, HTTP parser: {http}, WebSocket: {ws}")
+    # Token deltas are tiny; per-message deflate costs more CPU than it saves.
+    # Per-request access lines only with --verbose.
+    return dict(log_level="info" if verbose else "warning", loop=loop, http=http, ws=ws,
+                ws_per_message_deflate=False)
+
 # ---------------------------
 # Main / CLI args
 # ---------------------------
@@ -1821,10 +3410,15 @@ def main():
     ap.add_argument("--web", action="store_true", help="Run web server (FastAPI + WebSocket)")
     ap.add_argument("--host", default="0.0.0.0", help="Host for web server")
     ap.add_argument("--port", default=8000, type=int, help="Port for web server")
+    ap.add_argument("--workers", default=int(os.getenv("WORKERS", "1")), type=int,
+                   help="Web server worker processes, each with its own model copy (default: %(default)s)")
+    ap.add_argument("--dump-client", action="store_true",
+                   help=f"Write the web client page to {CLIENT_HTML_PATH} (for debugging); "
+                        "without --web/--cli, just write it and exit")
     ap.add_argument("--version", action="version", version="MiniChat 2.0.0")
     
     # Generation parameters
-    ap.add_argument("--temperature", type=float, default=DEFAULT_TEMPERATURE, help=f"Temperature for generation (default: {DEFAULT_TEMPERATURE})")
+    ap.add_argument("--temperature", type=float, default=DEFAULT_TEMPERATURE, help=f"Temperature for generation, 0 for greedy decoding (default: {DEFAULT_TEMPERATURE})")
     ap.add_argument("--top-p", type=float, default=DEFAULT_TOP_P, help=f"Top-p sampling (default: {DEFAULT_TOP_P})")
     ap.add_argument("--top-k", type=int, default=DEFAULT_TOP_K, help=f"Top-k sampling (default: {DEFAULT_TOP_K})")
     ap.add_argument("--max-tokens", type=int, default=DEFAULT_MAX_NEW_TOKENS, help=f"Maximum new tokens (default: {DEFAULT_MAX_NEW_TOKENS})")
@@ -1832,58 +3426,95 @@ def main():
     
     # Model presets
     ap.add_argument("--preset", choices=list(MODEL_PRESETS.keys()), help="Use a predefined model preset")
+    ap.add_argument("--quantization", "--quant", choices=QUANTIZATION_MODES, default="none",
+                   help="Weight quantization: int8/nf4 need bitsandbytes + CUDA (nf4 is the better fit for "
+                        "large presets such as 'creative'; int8 decodes slower than fp16), "
+                        "int8_dynamic is CPU-only and is what int8 means on CPU (default: none)")
+    ap.add_argument("--dtype", choices=DTYPE_MODES, default="auto",
+                   help="Weight/compute dtype: auto uses bf16 (fp16 without bf16 support) on GPU and fp32 "
+                        "on CPU; bf16 also pays off on CPUs with AVX-512 BF16/AMX (default: auto)")
     
     # Additional features
     ap.add_argument("--verbose", action="store_true", help="Enable verbose logging")
-    ap.add_argument("--save-history", help="Save conversation history to file")
+    ap.add_argument("--save-history", help="Save conversation history to file (*.jsonl: appended as each turn ends)")
     ap.add_argument("--load-history", help="Load conversation history from file")
     ap.add_argument("--system-prompt", choices=["general", "creative", "coding", "professional", "casual"], 
                    default="general", help="System prompt type (default: general)")
     
     args = ap.parse_args()
+    setup_logging(args.verbose)
+    # Inference only; generate calls on worker threads enter inference_mode themselves
+    torch.set_grad_enabled(False)
     
     # Handle model preset
     if args.preset:
         args.model = MODEL_PRESETS[args.preset]
-        print(f"[INFO] Using preset '{args.preset}': {args.model}")
+        logger.info(f"Using preset '{args.preset}': {args.model}")
+    
+    model_settings = dict(
+        model_name=args.model, 
+        device=args.device,
+        temperature=args.temperature,
+        top_p=args.top_p,
+        top_k=args.top_k,
+        repetition_penalty=args.repetition_penalty,
+        system_prompt=args.system_prompt,
+        quantization=args.quantization,
+        dtype=args.dtype
+    )
+    
+    if args.dump_client:
+        # "/" serves the in-memory bytes; the file copy is only for debugging
+        write_client_html(CLIENT_HTML_PATH)
+        if not (args.web or args.cli):
+            # Only the page was asked for, so there is no model to load
+            return 0
+    
+    if args.web:
+        import uvicorn
+    
+    if args.web and args.workers > 1:
+        # Workers are separate processes that build the app (and model) themselves
+        os.environ["MINICHAT_SETTINGS"] = json.dumps(dict(model_settings, verbose=args.verbose))
+        logger.info(f"Starting {args.workers} workers at http://{args.host}:{args.port} ...")
+        module = os.path.splitext(os.path.basename(__file__))[0]
+        uvicorn.run(f"{module}:build_app", factory=True, app_dir=os.path.dirname(os.path.abspath(__file__)),
+                    host=args.host, port=args.port, workers=args.workers, **server_options(args.verbose))
+        return 0
     
     try:
-        mw = ModelWrapper(
-            model_name=args.model, 
-            device=args.device,
-            temperature=args.temperature,
-            top_p=args.top_p,
-            top_k=args.top_k,
-            repetition_penalty=args.repetition_penalty,
-            system_prompt=args.system_prompt
-        )
+        # The web server can accept connections while the weights load
+        mw = ModelWrapper(**model_settings, background_load=args.web)
         
         # Load conversation history if specified
         if args.load_history:
             history = load_conversation_history(args.load_history)
-            mw.conversation_history = history
+            mw.set_history(history)
     except Exception as e:
-        print(f"[ERROR] Failed to initialize model: {e}")
-        print("[INFO] Try using --device cpu if you're having GPU issues")
+        logger.error(f"Failed to initialize model: {e}")
+        logger.info("Try using --device cpu if you're having GPU issues")
         return 1
 
     if args.cli:
+        if args.save_history and args.save_history.endswith(".jsonl"):
+            # Append-only log: each turn is written as it ends, nothing is rewritten at exit
+            mw.history_log = open(args.save_history, "ab")
         try:
             run_cli(mw)
         finally:
             # Save conversation history if specified
-            if args.save_history and mw.conversation_history:
+            if mw.history_log is not None:
+                mw.history_log.close()
+            elif args.save_history and mw.conversation_history:
                 save_conversation_history(mw.conversation_history, args.save_history)
         return 0
 
     if args.web:
-        # Ensure client HTML exists
-        write_client_html(CLIENT_HTML_PATH)
         app = create_app(mw)
         # Run uvicorn programmatically
-        print(f"[INFO] Starting server at http://{args.host}:{args.port} ...")
-        print(f"[INFO] Open http://localhost:{args.port} in your browser")
-        uvicorn.run(app, host=args.host, port=args.port, log_level="info")
+        logger.info(f"Starting server at http://{args.host}:{args.port} ...")
+        logger.info(f"Open http://localhost:{args.port} in your browser")
+        uvicorn.run(app, host=args.host, port=args.port, workers=1, **server_options(args.verbose))
         return 0
 
     # If neither specified, print usage + small interactive prompt
@@ -1893,7 +3524,7 @@ def main():
         run_cli(mw)
         return 0
     except Exception as e:
-        print(f"[ERROR] CLI failed: {e}")
+        logger.error(f"CLI failed: {e}")
         return 1
 
 if __name__ == "__main__":
@@ -6,6 +6,15 @@ Tests basic functionality without loading the full model.
 
 import sys
 import os
+import json
+import time
+import asyncio
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+_tiny_dir = None
+_tiny_wrapper = None
 
 def test_imports():
     """Test that all required modules can be imported."""
@@ -93,6 +102,208 @@ def test_html_generation():
         print(f"✗ HTML generation test failed: {e}")
         return False
 
+def tiny_model_wrapper():
+    """A ModelWrapper over a randomly initialized two-layer GPT-2, built once."""
+    global _tiny_dir, _tiny_wrapper
+    if _tiny_wrapper is None:
+        from tokenizers import Tokenizer, models, trainers, pre_tokenizers, decoders
+        from transformers import PreTrainedTokenizerFast, GPT2Config, GPT2LMHeadModel
+        import torch
+        from mini_chat_all_in_one import ModelWrapper
+
+        tok = Tokenizer(models.BPE())
+        tok.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+        tok.decoder = decoders.ByteLevel()
+        trainer = trainers.BpeTrainer(vocab_size=400, special_tokens=["<|endoftext|>"],
+                                      initial_alphabet=pre_tokenizers.ByteLevel.alphabet())
+        tok.train_from_iterator(["User: hello there\nAssistant: hi, how are you?\n"] * 20, trainer)
+        tokenizer = PreTrainedTokenizerFast(tokenizer_object=tok, eos_token="<|endoftext|>",
+                                            bos_token="<|endoftext|>", unk_token="<|endoftext|>")
+
+        _tiny_dir = tempfile.TemporaryDirectory()
+        tokenizer.save_pretrained(_tiny_dir.name)
+        torch.manual_seed(0)
+        config = GPT2Config(vocab_size=len(tokenizer), n_embd=32, n_head=2, n_layer=2, n_positions=256,
+                            bos_token_id=0, eos_token_id=0)
+        GPT2LMHeadModel(config).save_pretrained(_tiny_dir.name)
+
+        _tiny_wrapper = ModelWrapper(_tiny_dir.name, device="cpu", dtype="fp32")
+    return _tiny_wrapper
+
+class StubModelWrapper:
+    """Stands in for ModelWrapper in BatchScheduler tests, recording its calls."""
+    def __init__(self, stream_chunks=3, chunk_delay=0.0):
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self.stream_chunks = stream_chunks
+        self.chunk_delay = chunk_delay
+        self.batches = []
+        self.streamed = 0
+        self.stream_closed = threading.Event()
+
+    async def run_model(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def chat_batch(self, sessions, texts):
+        self.batches.append(list(texts))
+        return [text.upper() for text in texts]
+
+    def chat_stream(self, text, session):
+        try:
+            for i in range(self.stream_chunks):
+                time.sleep(self.chunk_delay)
+                self.streamed += 1
+                yield f"{text}{i} "
+        finally:
+            self.stream_closed.set()
+
+def test_batch_scheduler():
+    """Test that the scheduler batches concurrent prompts and stops work for a cancelled one."""
+    try:
+        from mini_chat_all_in_one import BatchScheduler, ChatSession
+
+        async def run():
+            # Three clients' prompts queued together run as one chat_batch call
+            stub = StubModelWrapper()
+            scheduler = BatchScheduler(stub, max_wait_ms=200, active_clients=lambda: 3)
+            scheduler.start()
+            replies = await asyncio.gather(*[scheduler.submit(ChatSession(), text) for text in ("a", "b", "c")])
+            assert replies == ["A", "B", "C"], replies
+            assert stub.batches == [["a", "b", "c"]], stub.batches
+
+            # A lone prompt with a callback is streamed instead
+            chunks = []
+            reply = await scheduler.submit(ChatSession(), "x", chunks.append)
+            await asyncio.sleep(0)
+            assert chunks == ["x0 ", "x1 ", "x2 "], chunks
+            assert reply == "x0 x1 x2", reply
+            await scheduler.stop()
+
+            # A client disconnecting mid-stream cancels its turn and closes the stream early
+            stub = StubModelWrapper(stream_chunks=100, chunk_delay=0.01)
+            scheduler = BatchScheduler(stub, active_clients=lambda: 1)
+            scheduler.start()
+            first = asyncio.Event()
+            turn = asyncio.ensure_future(scheduler.submit(ChatSession(), "y", lambda _: first.set()))
+            await first.wait()
+            turn.cancel()
+            assert await asyncio.get_running_loop().run_in_executor(None, stub.stream_closed.wait, 5)
+            assert stub.streamed < 100, stub.streamed
+            await scheduler.stop()
+
+        asyncio.run(run())
+        print("✓ Prompts are batched and cancelled turns stop generating")
+        return True
+
+    except Exception as e:
+        print(f"✗ Batch scheduler test failed: {e!r}")
+        return False
+
+def test_reply_stream():
+    """Test that streamed reply deltas are coalesced and always followed by an end frame."""
+    try:
+        from mini_chat_all_in_one import send_reply_stream
+
+        class FakeWebSocket:
+            def __init__(self):
+                self.frames = []
+
+            async def send_text(self, text):
+                self.frames.append(json.loads(text))
+
+        async def run(chunks):
+            ws, deltas = FakeWebSocket(), asyncio.Queue()
+            for chunk in chunks:
+                deltas.put_nowait(chunk)
+            await send_reply_stream(ws, deltas)
+            return ws.frames
+
+        # The first chunk goes out alone; the rest queued behind it share one frame
+        frames = asyncio.run(run(["Hel", "lo", " there", None]))
+        assert frames == [{"type": "delta", "text": "Hel"},
+                          {"type": "delta", "text": "lo there"},
+                          {"type": "end"}], frames
+        assert asyncio.run(run([None])) == [{"type": "end"}]
+        print("✓ Reply deltas are coalesced and terminated")
+        return True
+
+    except Exception as e:
+        print(f"✗ Reply stream test failed: {e!r}")
+        return False
+
+def test_reply_cache():
+    """Test reply cache hits for repeated greedy turns and invalidation on setting changes."""
+    try:
+        from mini_chat_all_in_one import ChatSession
+
+        wrapper = tiny_model_wrapper()
+        calls = []
+        generate = wrapper._model_generate
+        wrapper._model_generate = lambda **kwargs: (calls.append(1), generate(**kwargs))[1]
+        try:
+            wrapper.temperature = 0.0
+            first = wrapper.chat("hello there", ChatSession(), max_new_tokens=8)
+            again = wrapper.chat("hello there", ChatSession(), max_new_tokens=8)
+            assert again == first and len(calls) == 1, "repeated greedy turn was not a cache hit"
+
+            # A different length limit is a different turn
+            wrapper.chat("hello there", ChatSession(), max_new_tokens=4)
+            assert len(calls) == 2, "shorter max_new_tokens reused a longer reply"
+
+            # Changing a generation setting empties the cache
+            wrapper.top_k = 10
+            wrapper.chat("hello there", ChatSession(), max_new_tokens=8)
+            assert len(calls) == 3, "cache survived a settings change"
+
+            # Sampled replies are never replayed
+            wrapper.temperature = 0.8
+            wrapper.chat("hello there", ChatSession(), max_new_tokens=8)
+            wrapper.chat("hello there", ChatSession(), max_new_tokens=8)
+            assert len(calls) == 5, "sampled reply was cached"
+        finally:
+            del wrapper._model_generate
+
+        print("✓ Reply cache hits and invalidation work")
+        return True
+
+    except Exception as e:
+        print(f"✗ Reply cache test failed: {e!r}")
+        return False
+
+def test_prefix_cache():
+    """Test that a cropped, reused prefix cache generates the same text as a fresh prefill."""
+    try:
+        wrapper = tiny_model_wrapper()
+        wrapper.temperature = 0.0
+        wrapper.top_k = 50
+        shared = "User: hello there\nAssistant: hi, how are you?\n" * 3
+
+        reused_lens = []
+        reuse_prefix = wrapper._reuse_prefix
+        def spy(ids):
+            cache = reuse_prefix(ids)
+            reused_lens.append(cache and cache.get_seq_length())
+            return cache
+        wrapper._reuse_prefix = spy
+        try:
+            wrapper._prefix_cache = None
+            wrapper.generate(shared + "User: hello", max_new_tokens=8)
+            # Diverges before the end of the cached sequence, so the cache is cropped
+            cached_len = wrapper._prefix_cache.get_seq_length()
+            reused = wrapper.generate(shared + "User: hi", max_new_tokens=8)
+        finally:
+            del wrapper._reuse_prefix
+        assert reused_lens[0] is None and 0 < reused_lens[1] < cached_len, (reused_lens, cached_len)
+
+        wrapper._prefix_cache = None
+        fresh = wrapper.generate(shared + "User: hi", max_new_tokens=8)
+        assert reused == fresh, (reused, fresh)
+        print("✓ Reused prefix cache matches a fresh generate")
+        return True
+
+    except Exception as e:
+        print(f"✗ Prefix cache test failed: {e!r}")
+        return False
+
 def main():
     """Run all tests."""
     print("Testing MiniChat setup...\n")
@@ -101,6 +312,10 @@ def main():
         ("Module imports", test_imports),
         ("MiniChat import", test_mini_chat_import),
         ("HTML generation", test_html_generation),
+        ("Batch scheduler", test_batch_scheduler),
+        ("Reply stream", test_reply_stream),
+        ("Reply cache", test_reply_cache),
+        ("Prefix cache", test_prefix_cache),
     ]
     
     passed = 0